@@ -1,6 +1,10 @@
 const { Deck, GeoJsonLayer } = deck;
 
+// Zone outlines from scripts/data_processing/zone_topology.py: the low level paints first, the
+// high level replaces it once loaded; the full GeoJSON is only a fallback for older exports.
 const ZONES_URL = "./data/taxi_zones.geojson";
+const ZONES_LOW_URL = "./data/taxi_zones_low.topo.json";
+const ZONES_HIGH_URL = "./data/taxi_zones_high.topo.json";
 const FORECAST_URLS = [
   "./data/forecast_latest.json",
   "/data/forecast/forecast_latest.json",
@@ -10,10 +14,12 @@ const state = {
   zones: null,
   forecast: null,
   hours: [],
+  zoneIds: [],
+  matrix: [],
+  summary: null,
   selectedHourIndex: 0,
-  lookup: new Map(),
+  zoneIndex: new Map(),
   zoneNameById: new Map(),
-  currentRows: [],
   deck: null,
   maxPred: 1,
   playTimer: null,
@@ -37,6 +43,7 @@ const el = {
   playBtn: document.getElementById("playBtn"),
   hourLabel: document.getElementById("hourLabel"),
   topZones: document.getElementById("topZones"),
+  cityTotal: document.getElementById("cityTotal"),
   tooltip: document.getElementById("mapTooltip"),
   loadingOverlay: document.getElementById("loadingOverlay"),
 };
@@ -90,6 +97,106 @@ async function fetchFirstAvailable(urls) {
   throw new Error("Could not load forecast file from known paths.");
 }
 
+// Quantized, delta-encoded arcs -> absolute lon/lat; rings concatenate arcs (~i = arc i reversed)
+// and drop the junction vertex consecutive arcs share.
+function topologyToGeoJson(topology, name = "zones") {
+  const [sx, sy] = topology.transform.scale;
+  const [tx, ty] = topology.transform.translate;
+  const arcs = topology.arcs.map((arc) => {
+    let x = 0;
+    let y = 0;
+    return arc.map(([dx, dy]) => {
+      x += dx;
+      y += dy;
+      return [x * sx + tx, y * sy + ty];
+    });
+  });
+  const ring = (refs) => {
+    const coords = [];
+    refs.forEach((r, i) => {
+      const arc = r >= 0 ? arcs[r] : arcs[~r].slice().reverse();
+      coords.push(...(i === 0 ? arc : arc.slice(1)));
+    });
+    return coords;
+  };
+  return {
+    type: "FeatureCollection",
+    features: topology.objects[name].geometries.map((g) => ({
+      type: "Feature",
+      properties: g.properties,
+      geometry: {
+        type: g.type,
+        coordinates: g.type === "Polygon" ? g.arcs.map(ring) : g.arcs.map((p) => p.map(ring)),
+      },
+    })),
+  };
+}
+
+async function fetchZones(url) {
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`${url}: ${res.status}`);
+  const data = await res.json();
+  return data.type === "Topology" ? topologyToGeoJson(data) : data;
+}
+
+// Columnar payloads carry hours, zones and a zones x hours matrix; legacy row payloads are
+// pivoted into the same shape once, so changing the hour never scans the prediction list.
+function normalizeForecast(forecast) {
+  if (forecast.format === "columnar") {
+    const zoneIds = forecast.zones.map(Number);
+    const matrix = forecast.predictions;
+    return { hours: forecast.hours, zoneIds, matrix, summary: forecast.summary || summarize(zoneIds, matrix) };
+  }
+  const hours = [...new Set(forecast.predictions.map((p) => p.hour))].sort();
+  const hourIndex = new Map(hours.map((h, i) => [h, i]));
+  const zoneIndex = new Map();
+  const matrix = [];
+  forecast.predictions.forEach((p) => {
+    const zone = Number(p.PULocationID);
+    if (!zoneIndex.has(zone)) {
+      zoneIndex.set(zone, matrix.length);
+      matrix.push(new Array(hours.length).fill(0));
+    }
+    matrix[zoneIndex.get(zone)][hourIndex.get(p.hour)] = Number(p.prediction);
+  });
+  const zoneIds = [...zoneIndex.keys()];
+  return { hours, zoneIds, matrix, summary: forecast.summary || summarize(zoneIds, matrix) };
+}
+
+// Rankings and totals come precomputed in the payload's summary block (forecast_summary in
+// forecast_payload.py); this once-per-load fallback only serves payloads written before it.
+function summarize(zoneIds, matrix) {
+  const hourCount = matrix.length ? matrix[0].length : 0;
+  const topZones = [];
+  const topPredictions = [];
+  const citywideTotals = [];
+  for (let h = 0; h < hourCount; h += 1) {
+    const order = zoneIds.map((_, z) => z).sort((a, b) => matrix[b][h] - matrix[a][h]).slice(0, 5);
+    topZones.push(order.map((z) => zoneIds[z]));
+    topPredictions.push(order.map((z) => matrix[z][h]));
+    citywideTotals.push(matrix.reduce((sum, row) => sum + row[h], 0));
+  }
+  return {
+    top_zones: topZones,
+    top_predictions: topPredictions,
+    citywide_totals: citywideTotals,
+    max_prediction: Math.max(1, ...matrix.map((row) => Math.max(...row))),
+    boroughs: null,
+    borough_totals: null,
+  };
+}
+
+function predictionFor(zone) {
+  const z = state.zoneIndex.get(zone);
+  return z === undefined ? 0 : state.matrix[z][state.selectedHourIndex];
+}
+
+function boroughTotal(borough) {
+  const { boroughs, borough_totals: totals } = state.summary;
+  const b = boroughs ? boroughs.indexOf(borough) : -1;
+  return b < 0 ? null : totals[b][state.selectedHourIndex];
+}
+
 function predictionColor(value) {
   const v = Math.max(0, value || 0);
   if (v < 25) return [67, 150, 185, 210]; // #4396B9
@@ -111,22 +218,24 @@ function formatHourLabel(isoString) {
   });
 }
 
-function setList(root, rows) {
+function setList(root, zones, predictions) {
   root.innerHTML = "";
-  rows.forEach((r) => {
+  zones.forEach((zone, i) => {
     const li = document.createElement("li");
-    const zoneName = state.zoneNameById.get(Number(r.PULocationID)) || `Zone ${r.PULocationID}`;
-    const trips = Math.round(r.prediction).toLocaleString("en-US");
+    const zoneName = state.zoneNameById.get(Number(zone)) || `Zone ${zone}`;
+    const trips = Math.round(predictions[i]).toLocaleString("en-US");
     li.textContent = `${zoneName}: ${trips} trips`;
     root.appendChild(li);
   });
 }
 
 function updateStats(hour) {
-  const rows = state.currentRows;
-  const sorted = [...rows].sort((a, b) => b.prediction - a.prediction);
+  const h = state.selectedHourIndex;
   el.hourLabel.textContent = formatHourLabel(hour);
-  setList(el.topZones, sorted.slice(0, 5));
+  setList(el.topZones, state.summary.top_zones[h].slice(0, 5), state.summary.top_predictions[h]);
+  if (el.cityTotal) {
+    el.cityTotal.textContent = `Citywide: ${Math.round(state.summary.citywide_totals[h]).toLocaleString("en-US")} trips`;
+  }
 }
 
 function renderMap() {
@@ -142,12 +251,12 @@ function renderMap() {
     getLineColor: [222, 236, 250, 210],
     getFillColor: (f) => {
       const zone = Number(f.properties.PULocationID);
-      const pred = state.lookup.get(zone) || 0;
+      const pred = predictionFor(zone);
       return predictionColor(pred);
     },
     getElevation: (f) => {
       const zone = Number(f.properties.PULocationID);
-      const pred = state.lookup.get(zone) || 0;
+      const pred = predictionFor(zone);
       return Math.sqrt(pred) * 35;
     },
     updateTriggers: {
@@ -165,12 +274,14 @@ function renderMap() {
       }
 
       const zone = Number(object.properties.PULocationID);
-      const pred = state.lookup.get(zone) || 0;
+      const pred = predictionFor(zone);
       const zoneName = object.properties.zone || `Zone ${zone}`;
+      const borough = boroughTotal(object.properties.borough);
       el.tooltip.innerHTML = `
         <div class="tooltip-title">${zoneName}</div>
         <div class="tooltip-row">TLC Zone: ${zone}</div>
         <div class="tooltip-row">Predicted trips: ${Math.round(pred)}</div>
+        ${borough === null ? "" : `<div class="tooltip-row">${object.properties.borough}: ${Math.round(borough).toLocaleString("en-US")} trips</div>`}
       `;
 
       el.tooltip.style.display = "block";
@@ -193,10 +304,6 @@ function renderMap() {
 function updateHour(index) {
   state.selectedHourIndex = Number(index);
   const hour = state.hours[state.selectedHourIndex];
-  const rows = state.forecast.predictions.filter((p) => p.hour === hour);
-  state.currentRows = rows;
-  state.lookup = new Map(rows.map((r) => [Number(r.PULocationID), Number(r.prediction)]));
-  state.maxPred = Math.max(1, ...rows.map((r) => Number(r.prediction)));
   el.hourSlider.value = String(state.selectedHourIndex);
   updateStats(hour);
   renderMap();
@@ -231,13 +338,19 @@ async function init() {
   }
 
   const [zonesRes, forecast] = await Promise.all([
-    fetch(ZONES_URL).then((r) => r.json()),
+    fetchZones(ZONES_LOW_URL).catch(() => fetchZones(ZONES_URL)),
     fetchFirstAvailable(FORECAST_URLS),
   ]);
 
   state.zones = zonesRes;
   state.forecast = forecast;
-  state.hours = [...new Set(forecast.predictions.map((p) => p.hour))].sort();
+  const { hours, zoneIds, matrix, summary } = normalizeForecast(forecast);
+  state.hours = hours;
+  state.zoneIds = zoneIds;
+  state.matrix = matrix;
+  state.summary = summary;
+  state.maxPred = Math.max(1, summary.max_prediction);
+  state.zoneIndex = new Map(zoneIds.map((zone, z) => [zone, z]));
   state.zoneNameById = new Map(
     state.zones.features.map((f) => [
       Number(f.properties.PULocationID),
@@ -293,6 +406,15 @@ async function init() {
   updateHour(0);
   hideLoading();
 
+  fetchZones(ZONES_HIGH_URL)
+    .then((zones) => {
+      state.zones = zones;
+      renderMap();
+    })
+    .catch(() => {
+      // keep the low level
+    });
+
   window.addEventListener("resize", () => {
     const mobile = isMobileViewport();
     const next = mobile
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from compiled_model import compile_booster, default_compiled_dir, load_compiled, save_compiled  # noqa: E402
+from generate_forecast import (  # noqa: E402
+    BASELINE_DEFAULT,
+    BASELINE_META_DEFAULT,
+    FEATURE_COLS,
+    MODEL_DEFAULT,
+    TIMEZONE_DEFAULT,
+    build_inference_frame,
+    make_dummy_weather,
+    next_top_of_hour,
+)
+
+
+def timed(fn, repeats: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare LightGBM vs compiled NumPy tree inference.")
+    parser.add_argument("--model-path", default=MODEL_DEFAULT)
+    parser.add_argument("--compiled-dir", default="", help="Compiled arrays (default: <model>_compiled).")
+    parser.add_argument("--baseline-path", default=BASELINE_DEFAULT)
+    parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT)
+    parser.add_argument("--horizon-hours", type=int, default=48)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--atol", type=float, default=1e-9, help="Max allowed abs diff in raw score.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    import lightgbm as lgb
+
+    import_s = time.perf_counter() - t0
+
+    compiled_dir = Path(args.compiled_dir) if args.compiled_dir else default_compiled_dir(args.model_path)
+    tmp_dir = None
+    if not compiled_dir.exists():
+        tmp_dir = tempfile.TemporaryDirectory()
+        compiled_dir = Path(tmp_dir.name) / "compiled"
+        save_compiled(*compile_booster(lgb.Booster(model_file=args.model_path)), compiled_dir)
+
+    baseline_lookup = pd.read_csv(args.baseline_path)
+    meta = json.loads(Path(args.baseline_meta).read_text())
+    zone_ids = np.array(meta["zone_ids"], dtype=int)
+    start_hour = next_top_of_hour(datetime.now(ZoneInfo(TIMEZONE_DEFAULT)))
+    weather_df = make_dummy_weather(start_hour, args.horizon_hours)
+    X = build_inference_frame(zone_ids, weather_df, baseline_lookup, float(meta["baseline_global_mean"]))[
+        FEATURE_COLS
+    ]
+
+    lgb_load_s, booster = timed(lambda: lgb.Booster(model_file=args.model_path), args.repeats)
+    lgb_pred_s, lgb_pred = timed(lambda: booster.predict(X), args.repeats)
+    cmp_load_s, compiled = timed(lambda: load_compiled(compiled_dir), args.repeats)
+    cmp_pred_s, cmp_pred = timed(lambda: compiled.predict(X), args.repeats)
+
+    max_diff = float(np.max(np.abs(lgb_pred - cmp_pred)))
+    print("rows:", len(X), "trees:", compiled.meta["num_trees"], "nodes:", compiled.meta["num_nodes"])
+    print(f"{'path':<10} {'load_s':>10} {'predict_s':>10}")
+    print(f"{'lightgbm':<10} {lgb_load_s:>10.4f} {lgb_pred_s:>10.4f}   (import {import_s:.3f}s)")
+    print(f"{'compiled':<10} {cmp_load_s:>10.4f} {cmp_pred_s:>10.4f}")
+    print("max_abs_diff:", max_diff)
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    if max_diff > args.atol:
+        raise SystemExit(f"Compiled predictions differ from Booster.predict by {max_diff} > {args.atol}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from generate_forecast import (  # noqa: E402
+    BASELINE_DEFAULT,
+    BASELINE_META_DEFAULT,
+    CAT_COLS,
+    FEATURES_DEFAULT,
+    TIMEZONE_DEFAULT,
+    baseline_matrix,
+    build_inference_frame,
+    load_serving_baseline,
+    next_top_of_hour,
+)
+
+
+def merge_inference_frame(zone_ids, weather_df, baseline_lookup, baseline_global_mean) -> pd.DataFrame:
+    """The previous cross-join + merge implementation, kept here as the reference."""
+    hours = weather_df[["hour"]].copy()
+    hours["hour"] = pd.to_datetime(hours["hour"])
+    hours["hour_of_day"] = hours["hour"].dt.hour
+    hours["day_of_week"] = hours["hour"].dt.dayofweek
+    hours["month"] = hours["hour"].dt.month.astype(int)
+    hours["day_of_year"] = hours["hour"].dt.dayofyear.astype(int)
+    hours["week_of_year"] = hours["hour"].dt.isocalendar().week.astype(int)
+    hours["week_hour"] = hours["day_of_week"] * 24 + hours["hour_of_day"]
+    hours["is_weekend"] = (hours["day_of_week"] >= 5).astype(int)
+    hours["is_holiday"] = 0
+
+    zones = pd.DataFrame({"PULocationID": zone_ids})
+    zones["_k"] = 1
+    hours["_k"] = 1
+    df = zones.merge(hours, on="_k", how="inner").drop(columns=["_k"])
+    df = df.merge(weather_df, on="hour", how="left")
+    df["is_rain"] = (df["precipitation"] > 0).astype(int)
+    df = df.merge(baseline_lookup, on=["PULocationID", "week_hour"], how="left")
+    df["baseline_week_hour_mean"] = df["baseline_week_hour_mean"].fillna(baseline_global_mean)
+
+    for col in CAT_COLS:
+        df[col] = df[col].astype("category")
+    return df
+
+
+def synthetic_weather(start_hour: datetime, periods: int, freq: str) -> pd.DataFrame:
+    hours = pd.date_range(start=start_hour, periods=periods, freq=freq)
+    t = (hours - hours[0]) / pd.Timedelta(hours=1)
+    t = np.asarray(t, dtype=np.float64)
+    return pd.DataFrame(
+        {
+            "hour": hours,
+            "temperature": 8 + 6 * np.sin(2 * np.pi * (t - 5) / 24),
+            "relative_humidity": np.clip(65 + 20 * np.cos(2 * np.pi * (t - 2) / 24), 20, 100),
+            "precipitation": np.where((t % 24 >= 14) & (t % 24 <= 17), 0.2, 0.0),
+            "wind_speed": np.clip(14 + 3 * np.sin(2 * np.pi * (t + 3) / 24), 0, None),
+        }
+    )
+
+
+def decoded(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for col in CAT_COLS:
+        out[col] = np.asarray(out[col]).astype(np.int64)
+    return out
+
+
+def timed(fn, repeats: int) -> tuple[float, object]:
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare merge-based vs gather-based inference frame builds.")
+    parser.add_argument("--baseline-path", default=BASELINE_DEFAULT)
+    parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT)
+    parser.add_argument("--features-path", default=FEATURES_DEFAULT)
+    parser.add_argument(
+        "--cases",
+        default="48h:1h,168h:1h,168h:15min,168h:5min",
+        help="Comma-separated <horizon>:<step> grids to build.",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    # The merge reference needs the long CSV table, so skip the binary artifact here.
+    baseline_lookup, global_mean, zone_ids, source = load_serving_baseline(
+        args.baseline_path, args.baseline_meta, args.features_path, baseline_bin=""
+    )
+    start_hour = next_top_of_hour(datetime.now(ZoneInfo(TIMEZONE_DEFAULT)))
+    print(f"zones: {len(zone_ids)}  baseline: {source}")
+
+    matrix_s, matrix = timed(lambda: baseline_matrix(baseline_lookup, zone_ids, global_mean), args.repeats)
+    print(f"baseline_matrix (built once per process): {matrix_s * 1000:.1f} ms")
+
+    print(f"{'grid':<14} {'rows':>9} {'merge_ms':>10} {'gather_ms':>10} {'speedup':>8}  identical")
+    for case in args.cases.split(","):
+        horizon, step = case.split(":")
+        periods = int(pd.Timedelta(horizon) / pd.Timedelta(step))
+        weather_df = synthetic_weather(start_hour, periods, step)
+
+        merge_s, ref = timed(
+            lambda: merge_inference_frame(zone_ids, weather_df, baseline_lookup, global_mean), args.repeats
+        )
+        gather_s, new = timed(lambda: build_inference_frame(zone_ids, weather_df, matrix, global_mean), args.repeats)
+        try:
+            pd.testing.assert_frame_equal(decoded(ref), decoded(new), check_dtype=False)
+            identical = True
+        except AssertionError:
+            identical = False
+        print(
+            f"{case:<14} {len(new):>9} {merge_s * 1000:>10.1f} {gather_s * 1000:>10.1f} "
+            f"{merge_s / gather_s:>7.1f}x  {identical}"
+        )
+        if not identical:
+            raise SystemExit(f"{case}: gather-based frame differs from the merge reference.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "serve"))
+sys.path.insert(0, str(ROOT / "training" / "tree_based_models"))
+
+from compiled_model import CompiledModel, compile_booster  # noqa: E402
+from generate_forecast import CAT_COLS, FEATURE_COLS, WEEK_HOURS, build_inference_frame  # noqa: E402
+from metrics import mae, smape  # noqa: E402
+
+
+OUT_DEFAULT = "data/reports/model_inference_benchmarks.csv"
+FORECAST_BATCH = 263 * 48
+NUMERIC_COLS = [c for c in FEATURE_COLS if c not in CAT_COLS]
+START = datetime(2024, 1, 1)
+
+
+def synthetic_weather(start: datetime, n_hours: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Diurnal temperature/humidity/wind with random multi-hour rain spells."""
+    t = np.arange(n_hours, dtype=np.float64)
+    day = t / 24
+    rain = np.zeros(n_hours)
+    for s in rng.choice(n_hours, size=max(1, n_hours // 40), replace=False):
+        rain[s : s + rng.integers(2, 8)] = rng.gamma(1.5, 0.8)
+    return pd.DataFrame(
+        {
+            "hour": pd.date_range(start, periods=n_hours, freq="h"),
+            "temperature": 4 + 10 * np.sin(2 * np.pi * (day - 30) / 365) + 5 * np.sin(2 * np.pi * (t - 9) / 24)
+            + rng.normal(0, 1.5, n_hours),
+            "relative_humidity": np.clip(65 + 20 * np.cos(2 * np.pi * (t - 2) / 24) + 10 * (rain > 0), 20, 100),
+            "precipitation": rain,
+            "wind_speed": np.clip(12 + 4 * np.sin(2 * np.pi * (t + 3) / 24) + rng.normal(0, 2, n_hours), 0, None),
+        }
+    )
+
+
+def synthetic_counts(weather: pd.DataFrame, n_zones: int, rng: np.random.Generator) -> np.ndarray:
+    """Poisson trip counts [zone, hour]: zone scale x zone-group week-hour profile x weather effects."""
+    hours = weather["hour"]
+    week_hour = (hours.dt.dayofweek * 24 + hours.dt.hour).to_numpy()
+    scale = rng.lognormal(1.5, 1.2, n_zones)
+    wh = np.arange(WEEK_HOURS)
+    hod, dow = wh % 24, wh // 24
+    commute = np.exp(-((hod - 8) ** 2) / 6) + np.exp(-((hod - 18) ** 2) / 8)
+    nightlife = np.exp(-(((hod - 23) % 24 - 1) ** 2) / 10) * (1 + (dow >= 4))
+    base = 0.3 + 0.4 * np.sin(np.pi * hod / 24) ** 2
+    profiles = np.stack([base + commute * (dow < 5), base + nightlife, base + 0.5 * (dow >= 5)])
+    group = rng.integers(0, len(profiles), n_zones)
+    weather_effect = (
+        1
+        - 0.25 * np.tanh(weather["precipitation"].to_numpy())
+        + 0.01 * np.clip(weather["temperature"].to_numpy() - 10, -15, 15)
+    )
+    expected = scale[:, None] * profiles[group][:, week_hour] * weather_effect[None, :]
+    return rng.poisson(expected).astype(np.float64)
+
+
+def make_dataset(n_zones: int, train_days: int, val_days: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    n_train, n_hours = train_days * 24, (train_days + val_days) * 24
+    weather = synthetic_weather(START, n_hours, rng)
+    counts = synthetic_counts(weather, n_zones, rng)
+    zone_ids = np.arange(1, n_zones + 1)
+
+    # Train-only week_hour baseline, as in prepare_split; it is both a feature and the lookup model.
+    week_hour = (weather["hour"].dt.dayofweek * 24 + weather["hour"].dt.hour).to_numpy()
+    sums = np.zeros((n_zones, WEEK_HOURS))
+    seen = np.zeros(WEEK_HOURS)
+    np.add.at(sums.T, week_hour[:n_train], counts[:, :n_train].T)
+    np.add.at(seen, week_hour[:n_train], 1)
+    global_mean = float(counts[:, :n_train].mean())
+    baseline = np.where(seen > 0, sums / np.maximum(seen, 1), global_mean)
+
+    X = build_inference_frame(zone_ids, weather, baseline, global_mean)
+    is_train = np.tile(np.arange(n_hours) < n_train, n_zones)
+    y = counts.ravel()
+    return {
+        "zone_ids": zone_ids,
+        "baseline": baseline,
+        "global_mean": global_mean,
+        "X_train": X.loc[is_train, FEATURE_COLS],
+        "y_train": y[is_train],
+        "X_val": X.loc[~is_train, FEATURE_COLS],
+        "y_val": y[~is_train],
+    }
+
+
+def batch_frame(data: dict, rows: int) -> pd.DataFrame:
+    """First `rows` rows of a zone-major grid covering enough future hours; 12,624 = one 48h forecast."""
+    n_zones = len(data["zone_ids"])
+    n_hours = -(-rows // n_zones)
+    weather = synthetic_weather(START, n_hours, np.random.default_rng(1))
+    X = build_inference_frame(data["zone_ids"], weather, data["baseline"], data["global_mean"])[FEATURE_COLS]
+    if rows % n_zones:
+        # Keep every zone in the batch: take hour-major rows when the batch is not whole hours.
+        order = np.arange(len(X)).reshape(n_zones, n_hours).T.ravel()[:rows]
+        X = X.iloc[np.sort(order)]
+    return X.reset_index(drop=True)
+
+
+class LookupModel:
+    """week_hour lookup baseline: one gather from the dense [zone, week_hour] train means."""
+
+    def __init__(self, baseline: np.ndarray):
+        self.baseline = baseline
+
+    def predict(self, X: pd.DataFrame, threads: int = 1) -> np.ndarray:
+        return self.baseline[X["PULocationID"].cat.codes.to_numpy(), X["week_hour"].cat.codes.to_numpy()]
+
+
+class LightGBMModel:
+    def __init__(self, booster):
+        self.booster = booster
+
+    def predict(self, X: pd.DataFrame, threads: int = 1) -> np.ndarray:
+        return np.expm1(self.booster.predict(X, num_threads=threads))
+
+
+class CompiledLightGBMModel:
+    """The NumPy tree arrays generate_forecast serves; single-threaded by construction."""
+
+    def __init__(self, booster):
+        self.model = CompiledModel(*compile_booster(booster))
+
+    def predict(self, X: pd.DataFrame, threads: int = 1) -> np.ndarray:
+        return np.expm1(self.model.predict(X))
+
+
+class XGBoostModel:
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, X: pd.DataFrame, threads: int = 1) -> np.ndarray:
+        self.model.set_params(n_jobs=threads)
+        return np.expm1(self.model.predict(X))
+
+
+class RidgeModel:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict(self, X: pd.DataFrame, threads: int = 1) -> np.ndarray:
+        from threadpoolctl import threadpool_limits
+
+        with threadpool_limits(limits=threads):
+            return self.pipeline.predict(X)
+
+
+def train_models(data: dict, names: list[str], trees: int, threads: int) -> dict[str, tuple[object, float]]:
+    """Small models of each family on the synthetic split; returns name -> (model, train seconds)."""
+    X_train, y_train, X_val, y_val = data["X_train"], data["y_train"], data["X_val"], data["y_val"]
+    models = {}
+    if "lookup" in names:
+        models["lookup"] = (LookupModel(data["baseline"]), 0.0)
+    if "lightgbm" in names or "lightgbm_compiled" in names:
+        from lightgbm_week_hour import fit_model
+
+        start = time.perf_counter()
+        booster, _ = fit_model(
+            X_train,
+            pd.Series(y_train),
+            X_val,
+            pd.Series(y_val),
+            n_estimators=trees,
+            learning_rate=0.1,
+            n_jobs=threads,
+            verbose=-1,
+        )
+        train_s = time.perf_counter() - start
+        if "lightgbm" in names:
+            models["lightgbm"] = (LightGBMModel(booster), train_s)
+        if "lightgbm_compiled" in names:
+            models["lightgbm_compiled"] = (CompiledLightGBMModel(booster), train_s)
+    if "xgboost" in names:
+        import xgboost as xgb
+
+        # xgboost_week_hour.py settings with fewer, shallower trees.
+        model = xgb.XGBRegressor(
+            n_estimators=trees,
+            learning_rate=0.1,
+            max_depth=8,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            objective="reg:squarederror",
+            tree_method="hist",
+            enable_categorical=True,
+            n_jobs=threads,
+            random_state=0,
+        )
+        start = time.perf_counter()
+        model.fit(X_train, np.log1p(y_train), verbose=False)
+        models["xgboost"] = (XGBoostModel(model), time.perf_counter() - start)
+    if "ridge" in names:
+        from sklearn.compose import ColumnTransformer
+        from sklearn.linear_model import Ridge
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        # ridge_regression.py's layout: one-hot categoricals, scaled numerics, raw-count target.
+        pipeline = Pipeline(
+            steps=[
+                (
+                    "pre",
+                    ColumnTransformer(
+                        transformers=[
+                            ("num", StandardScaler(), NUMERIC_COLS),
+                            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=True), CAT_COLS),
+                        ]
+                    ),
+                ),
+                ("ridge", Ridge(alpha=1.0)),
+            ]
+        )
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        models["ridge"] = (RidgeModel(pipeline), time.perf_counter() - start)
+    return models
+
+
+def accuracy(y_true: np.ndarray, y_pred: np.ndarray) -> tuple[float, float]:
+    return mae(y_true, y_pred), smape(y_true, y_pred)
+
+
+def time_predict(model, X: pd.DataFrame, threads: int, repeats: int) -> np.ndarray:
+    model.predict(X, threads)  # warm-up: thread pools, lazy encoders, page faults
+    seconds = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.predict(X, threads)
+        seconds[i] = time.perf_counter() - start
+    return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch inference throughput and latency across model families.")
+    parser.add_argument("--models", default="lookup,ridge,lightgbm,lightgbm_compiled,xgboost")
+    parser.add_argument(
+        "--batch-sizes",
+        default=f"{FORECAST_BATCH},100000,1000000",
+        help=f"Rows per predict call; {FORECAST_BATCH} is one 48h x 263-zone forecast.",
+    )
+    parser.add_argument("--threads", default="1,2,4", help="Prediction thread counts.")
+    parser.add_argument("--zones", type=int, default=263)
+    parser.add_argument("--train-days", type=int, default=56)
+    parser.add_argument("--val-days", type=int, default=7)
+    parser.add_argument("--trees", type=int, default=200, help="Boosting rounds for LightGBM / XGBoost.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=OUT_DEFAULT)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.models.split(",") if n.strip()]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    thread_counts = [int(t) for t in args.threads.split(",")]
+    cpu_count = os.cpu_count() or 1
+    if max(thread_counts) > cpu_count:
+        print(f"note: {cpu_count} CPUs; thread counts above that measure oversubscription")
+
+    data = make_dataset(args.zones, args.train_days, args.val_days, args.seed)
+    print(f"synthetic data: {len(data['X_train']):,} train rows, {len(data['X_val']):,} validation rows")
+    models = train_models(data, names, args.trees, cpu_count)
+
+    rows = []
+    batches = {size: batch_frame(data, size) for size in batch_sizes}
+    for name, (model, train_s) in models.items():
+        val_mae, val_smape = accuracy(data["y_val"], model.predict(data["X_val"], cpu_count))
+        print(f"{name}: trained in {train_s:.1f}s  MAE {val_mae:.3f}  sMAPE {val_smape:.4f}")
+        # The lookup and compiled paths ignore threads; time them once per batch size.
+        model_threads = thread_counts if name in ("lightgbm", "xgboost", "ridge") else thread_counts[:1]
+        for size, X in batches.items():
+            for threads in model_threads:
+                seconds = time_predict(model, X, threads, args.repeats)
+                p50 = float(np.median(seconds))
+                rows.append(
+                    {
+                        "model": name,
+                        "batch_rows": size,
+                        "threads": threads,
+                        "latency_ms_p50": p50 * 1000,
+                        "latency_ms_min": float(seconds.min()) * 1000,
+                        "rows_per_s": size / p50,
+                        "MAE": val_mae,
+                        "sMAPE": val_smape,
+                        "train_s": train_s,
+                        "repeats": args.repeats,
+                        "cpu_count": cpu_count,
+                    }
+                )
+
+    results = pd.DataFrame(rows)
+    print(f"{'model':<18} {'rows':>9} {'threads':>7} {'p50_ms':>10} {'min_ms':>10} {'rows/s':>12} {'MAE':>8}")
+    for r in results.itertuples():
+        print(
+            f"{r.model:<18} {r.batch_rows:>9} {r.threads:>7} {r.latency_ms_p50:>10.2f} "
+            f"{r.latency_ms_min:>10.2f} {r.rows_per_s:>12,.0f} {r.MAE:>8.3f}"
+        )
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    results.to_csv(out_path, index=False)
+    print("saved:", out_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q)) if samples else float("nan")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the local forecast service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--mix",
+        default="hour=0.6,zone=0.35,forecast=0.05",
+        help="Endpoint weights: hour, zone, forecast.",
+    )
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    probe = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    probe.request("GET", "/forecast")
+    full = json.loads(probe.getresponse().read())
+    probe.close()
+    if full.get("format") == "columnar":
+        hours, zones = full["hours"], full["zones"]
+    else:
+        hours = sorted({p["hour"] for p in full["predictions"]})
+        zones = sorted({p["PULocationID"] for p in full["predictions"]})
+
+    weights = dict(item.split("=") for item in args.mix.split(","))
+    names = list(weights)
+    probs = np.array([float(weights[n]) for n in names])
+    probs = probs / probs.sum()
+    rng = random.Random(0)
+    plan = rng.choices(names, weights=probs.tolist(), k=args.requests)
+
+    local = threading.local()
+    latencies: dict[str, list[float]] = {n: [] for n in names}
+    errors = 0
+    lock = threading.Lock()
+
+    def one(kind: str) -> None:
+        nonlocal errors
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        if kind == "hour":
+            path = f"/forecast/hour/{rng.randrange(len(hours))}"
+        elif kind == "zone":
+            path = f"/forecast/zone/{rng.choice(zones)}"
+        else:
+            path = "/forecast"
+        start = time.perf_counter()
+        local.conn.request("GET", path)
+        resp = local.conn.getresponse()
+        resp.read()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[kind].append(elapsed)
+            if resp.status != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, plan))
+    wall = time.perf_counter() - start
+
+    all_samples = [s for samples in latencies.values() for s in samples]
+    print(f"requests: {len(all_samples)}  concurrency: {args.concurrency}  errors: {errors}")
+    print(f"throughput: {len(all_samples) / wall:.1f} req/s")
+    print(f"{'endpoint':<10} {'n':>6} {'p50_ms':>8} {'p99_ms':>8}")
+    for name in names + ["all"]:
+        samples = all_samples if name == "all" else latencies[name]
+        print(f"{name:<10} {len(samples):>6} {percentile_ms(samples, 50):>8.2f} {percentile_ms(samples, 99):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+
+def hourly_payload(latitude: float, longitude: float, timezone_name: str, forecast_days: int) -> dict:
+    """Deterministic Open-Meteo-shaped response: local-midnight hourly series, varied by point."""
+    start = datetime.now(ZoneInfo(timezone_name)).replace(hour=0, minute=0, second=0, microsecond=0)
+    n = 24 * forecast_days
+    t = np.arange(n)
+    shift = (latitude * 10 + longitude) % 3
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "timezone": timezone_name,
+        "hourly": {
+            "time": [(start + timedelta(hours=int(i))).strftime("%Y-%m-%dT%H:%M") for i in t],
+            "temperature_2m": np.round(8 + shift + 6 * np.sin(2 * np.pi * (t - 5) / 24), 1).tolist(),
+            "relative_humidity_2m": np.round(np.clip(65 + 20 * np.cos(2 * np.pi * (t - 2) / 24), 20, 100)).tolist(),
+            "precipitation": np.where((t % 24 >= 14) & (t % 24 <= 17), 0.2, 0.0).tolist(),
+            "wind_speed_10m": np.round(14 + 3 * np.sin(2 * np.pi * (t + 3) / 24), 1).tolist(),
+        },
+    }
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    fail_rate: float = 0.0,
+    down_after: int = -1,
+    quiet: bool = False,
+) -> ThreadingHTTPServer:
+    """Stub server (not yet serving); port 0 picks a free port.
+
+    server.stub counts requests (served, in_flight, max_in_flight); set server.stub["down"] to
+    answer 503 to everything, as during an outage.
+    """
+    lock = threading.Lock()
+    stub = {"served": 0, "in_flight": 0, "max_in_flight": 0, "down": False}
+    rng = random.Random(0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            with lock:
+                stub["served"] += 1
+                stub["in_flight"] += 1
+                stub["max_in_flight"] = max(stub["max_in_flight"], stub["in_flight"])
+                n = stub["served"]
+                fail = stub["down"] or rng.random() < fail_rate or (0 <= down_after < n)
+            try:
+                time.sleep(latency_ms / 1000)
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if fail or url.path != "/v1/forecast":
+                    status, body = (503, {"error": "unavailable"}) if fail else (404, {"error": "not found"})
+                else:
+                    status, body = 200, hourly_payload(
+                        float(query["latitude"]),
+                        float(query["longitude"]),
+                        query.get("timezone", "UTC"),
+                        int(query.get("forecast_days", 3)),
+                    )
+            finally:
+                with lock:
+                    stub["in_flight"] -= 1
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format: str, *args) -> None:
+            if not quiet:
+                print(f"[stub] {self.command} {self.path[:80]} -> {args[1] if len(args) > 1 else ''}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.stub = stub
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Open-Meteo forecast API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response.")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503.")
+    parser.add_argument("--down-after", type=int, default=-1, help="Answer 503 to every request after this many.")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.fail_rate, args.down_after)
+    print(f"Open-Meteo stub on http://{args.host}:{args.port}/v1/forecast")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
 import argparse
-from pathlib import Path 
+import sys
+from pathlib import Path
 
 import pandas as pd
 from pandas.tseries.holiday import USFederalHolidayCalendar
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
 
 def load_concat(paths: list[str]) -> pd.DataFrame:
     frames = [pd.read_parquet(p) for p in paths]
@@ -39,32 +44,40 @@ def main() -> None:
         action="store_true",
         help="Forward-fill missing weather hours after merging.",
     )
+    add_trace_args(parser)
     args = parser.parse_args()
 
-    tlc = load_concat(args.tlc)
-    weather = load_concat(args.weather)
-
-    tlc["hour"] = pd.to_datetime(tlc["hour"], errors="coerce")
-    weather["hour"] = pd.to_datetime(weather["hour"], errors="coerce")
-
-    if tlc["hour"].isna().any():
-        tlc = tlc.dropna(subset=["hour"])
-    if weather["hour"].isna().any():
-        weather = weather.dropna(subset=["hour"])
-
-    df = tlc.merge(weather, on="hour", how="left")
-    if args.ffill_weather:
-        weather_cols = [c for c in weather.columns if c != "hour"]
-        df = df.sort_values(["PULocationID", "hour"])
-        df[weather_cols] = df.groupby("PULocationID")[weather_cols].ffill()
-
-    df = add_time_features(df)
-    df = add_holiday_flag(df)
-
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(out_path, index=False)
-    print("saved:", out_path, "rows:", len(df))
+    with Tracer.from_args("build_features", args):
+        with stage("read") as st:
+            tlc = load_concat(args.tlc)
+            weather = load_concat(args.weather)
+            st.rows_out = len(tlc) + len(weather)
+
+        tlc["hour"] = pd.to_datetime(tlc["hour"], errors="coerce")
+        weather["hour"] = pd.to_datetime(weather["hour"], errors="coerce")
+
+        if tlc["hour"].isna().any():
+            tlc = tlc.dropna(subset=["hour"])
+        if weather["hour"].isna().any():
+            weather = weather.dropna(subset=["hour"])
+
+        with stage("merge weather", rows_in=len(tlc)) as st:
+            df = tlc.merge(weather, on="hour", how="left")
+            if args.ffill_weather:
+                weather_cols = [c for c in weather.columns if c != "hour"]
+                df = df.sort_values(["PULocationID", "hour"])
+                df[weather_cols] = df.groupby("PULocationID")[weather_cols].ffill()
+            st.rows_out = len(df)
+
+        with stage("calendar features", rows_in=len(df)):
+            df = add_time_features(df)
+            df = add_holiday_flag(df)
+
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with stage("write", rows_in=len(df)):
+            df.to_parquet(out_path, index=False)
+        print("saved:", out_path, "rows:", len(df))
 
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
+import json
 from pathlib import Path
 
 import geopandas as gpd
 
+from zone_topology import LEVELS_DIR_DEFAULT, REPORT_DEFAULT, export_levels, source_row, write_report
+
 INPUT_SHP = "data/raw/taxi_zones/taxi_zones.shp"
 OUTPUT_GEOJSON = "frontend/public/data/taxi_zones.geojson"
+OUTPUT_LOOKUP = "data/serving/zone_lookup.csv"
 
 def main() -> None:
     shp_path = Path(INPUT_SHP)
@@ -26,10 +30,21 @@ def main() -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     gdf.to_file(out_path, driver="GeoJSON")
 
+    # Attribute-only lookup (zone -> borough) for training shards and serving rollups.
+    lookup_path = Path(OUTPUT_LOOKUP)
+    lookup_path.parent.mkdir(parents=True, exist_ok=True)
+    gdf[keep_cols].drop_duplicates("PULocationID").sort_values("PULocationID").to_csv(lookup_path, index=False)
+
     print("saved:", out_path)
+    print("saved:", lookup_path)
     print("rows:", len(gdf))
     print("columns:", list(gdf.columns))
 
+    # Simplified, quantized TopoJSON levels the frontend loads coarsest first.
+    geojson = json.loads(out_path.read_text())
+    rows = [source_row(out_path, geojson)] + export_levels(geojson, LEVELS_DIR_DEFAULT)
+    write_report(rows, REPORT_DEFAULT)
+
 
 if __name__ == "__main__":
     main()
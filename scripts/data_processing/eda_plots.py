@@ -1,16 +1,15 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.ticker import FuncFormatter
 
-df = pd.read_parquet("data/processed/features_hourly.parquet")
+from rollups import ROLLUP_DEFAULT, read_rollup, update_rollups
 
-# Citywide hourly total
-city = df.groupby("hour")["trip_count"].sum().reset_index()
+# Fold any newly built feature hours into the rollup store; a no-op when nothing is new.
+update_rollups(ROLLUP_DEFAULT)
 
-# Daily total
-daily = city.set_index("hour").resample("D").sum()
-daily = daily[(daily.index >= "2023-01-01") & (daily.index < "2024-01-01")]
+# Citywide daily totals and daily mean weather
+daily = read_rollup(ROLLUP_DEFAULT, level="citywide", grain="day", start="2023-01-01", end="2024-01-01")
+daily = daily.rename(columns={"trips": "trip_count"})
 
 plt.style.use("dark_background")
 fig, ax = plt.subplots(figsize=(10, 6))
@@ -26,9 +25,7 @@ plt.tight_layout()
 plt.savefig("data/reports/citywide_timeserie1.png")
 
 # Two-panel: trips (top) and weather (bottom)
-weather = df.groupby("hour")[["temperature", "precipitation"]].mean().reset_index()
-daily_weather = weather.set_index("hour").resample("D").mean()
-daily_weather = daily_weather[(daily_weather.index >= "2023-01-01") & (daily_weather.index < "2024-01-01")]
+daily_weather = daily[["temperature", "precipitation"]]
 
 plt.style.use("dark_background")
 fig, (ax1, ax2) = plt.subplots(
@@ -1,9 +1,14 @@
 import argparse
+import sys
 from collections import defaultdict
 from pathlib import Path
 
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
 
 def expand_paths(values: list[str]) -> list[Path]:
     paths: list[Path] = []
@@ -18,6 +23,26 @@ def expand_paths(values: list[str]) -> list[Path]:
     return paths
 
 
+def hourly_counts(
+    df: pd.DataFrame,
+    pickup_col: str,
+    start_ts: pd.Timestamp | None = None,
+    end_ts: pd.Timestamp | None = None,
+) -> pd.Series:
+    """Trips per (hour, PULocationID) for one frame of trip records; unparseable rows are dropped."""
+    df = df[[pickup_col, "PULocationID"]].copy()
+    df[pickup_col] = pd.to_datetime(df[pickup_col], errors="coerce")
+    df["PULocationID"] = pd.to_numeric(df["PULocationID"], errors="coerce")
+    df = df.dropna(subset=[pickup_col, "PULocationID"])
+    if start_ts is not None:
+        df = df[df[pickup_col] >= start_ts]
+    if end_ts is not None:
+        df = df[df[pickup_col] < end_ts]
+    df["hour"] = df[pickup_col].dt.floor("h")
+    df["PULocationID"] = df["PULocationID"].astype(int)
+    return df.groupby(["hour", "PULocationID"]).size()
+
+
 def aggregate_counts(
     paths: list[Path],
     pickup_col: str,
@@ -29,18 +54,13 @@ def aggregate_counts(
         if not path.exists():
             raise FileNotFoundError(path)
         print("reading:", path)
-        df = pd.read_parquet(path, columns=[pickup_col, "PULocationID"])
-        df[pickup_col] = pd.to_datetime(df[pickup_col], errors="coerce")
-        df["PULocationID"] = pd.to_numeric(df["PULocationID"], errors="coerce")
-        df = df.dropna(subset=[pickup_col, "PULocationID"])
-        if start_ts is not None:
-            df = df[df[pickup_col] >= start_ts]
-        if end_ts is not None:
-            df = df[df[pickup_col] < end_ts]
-        df["hour"] = df[pickup_col].dt.floor("h")
-        grouped = df.groupby(["hour", "PULocationID"]).size()
-        for (hour, puloc), cnt in grouped.items():
-            counts[(hour, int(puloc))] += int(cnt)
+        with stage(f"aggregate {path.name}") as st:
+            df = pd.read_parquet(path, columns=[pickup_col, "PULocationID"])
+            st.rows_in = len(df)
+            grouped = hourly_counts(df, pickup_col, start_ts, end_ts)
+            for (hour, puloc), cnt in grouped.items():
+                counts[(hour, int(puloc))] += int(cnt)
+            st.rows_out = len(grouped)
     return counts
 
 
@@ -84,39 +104,46 @@ def main() -> None:
         action="store_true",
         help="If output exists, append and re-aggregate to sum counts.",
     )
+    add_trace_args(parser)
     args = parser.parse_args()
 
-    paths = expand_paths(args.inputs)
-    if not paths:
-        raise ValueError("No parquet files found.")
-
-    start_ts = pd.to_datetime(args.start) if args.start else None
-    end_ts = pd.to_datetime(args.end) if args.end else None
-
-    counts = aggregate_counts(paths, args.pickup_col, start_ts, end_ts)
-    df = counts_to_frame(counts)
-    if df.empty:
-        raise ValueError("Aggregation result is empty.")
-
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    if args.append and out_path.exists():
-        existing = pd.read_parquet(out_path)
-        df = pd.concat([existing, df], ignore_index=True)
-        df = (
-            df.groupby(["hour", "PULocationID"], as_index=False)["trip_count"]
-            .sum()
-            .sort_values(["hour", "PULocationID"])
-            .reset_index(drop=True)
-        )
-
-    print("rows:", len(df))
-    print("hour_range:", df["hour"].min(), "to", df["hour"].max())
-    print("zones:", df["PULocationID"].nunique())
-
-    df.to_parquet(out_path, index=False)
-    print("saved:", out_path)
+    with Tracer.from_args("ingest_tlc", args):
+        paths = expand_paths(args.inputs)
+        if not paths:
+            raise ValueError("No parquet files found.")
+
+        start_ts = pd.to_datetime(args.start) if args.start else None
+        end_ts = pd.to_datetime(args.end) if args.end else None
+
+        with stage("aggregate", rows_in=len(paths)) as st:
+            counts = aggregate_counts(paths, args.pickup_col, start_ts, end_ts)
+            df = counts_to_frame(counts)
+            st.rows_out = len(df)
+        if df.empty:
+            raise ValueError("Aggregation result is empty.")
+
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if args.append and out_path.exists():
+            with stage("append", rows_in=len(df)) as st:
+                existing = pd.read_parquet(out_path)
+                df = pd.concat([existing, df], ignore_index=True)
+                df = (
+                    df.groupby(["hour", "PULocationID"], as_index=False)["trip_count"]
+                    .sum()
+                    .sort_values(["hour", "PULocationID"])
+                    .reset_index(drop=True)
+                )
+                st.rows_out = len(df)
+
+        print("rows:", len(df))
+        print("hour_range:", df["hour"].min(), "to", df["hour"].max())
+        print("zones:", df["PULocationID"].nunique())
+
+        with stage("write", rows_in=len(df)):
+            df.to_parquet(out_path, index=False)
+        print("saved:", out_path)
 
 
 if __name__ == "__main__":
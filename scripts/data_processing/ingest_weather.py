@@ -1,8 +1,13 @@
 import argparse
+import sys
 from pathlib import Path
 
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
 # GHCNh hourly station files are available via HTTPS.
 GHCNH_BASE_URL = "https://www.ncei.noaa.gov/oa/global-historical-climatology-network"
 
@@ -66,11 +71,15 @@ def read_station_hourly(
     print("station_url:", station_id, url)
 
     kept: list[pd.DataFrame] = []
-    for chunk in pd.read_csv(url, sep="|", usecols=USE_COLS, chunksize=chunksize):
-        chunk["datetime"] = parse_datetime_frame(chunk)
-        mask = (chunk["datetime"] >= start_ts) & (chunk["datetime"] <= end_ts)
-        if mask.any():
-            kept.append(chunk.loc[mask].copy())
+    with stage(f"read {station_id}") as st:
+        st.rows_in = 0
+        for chunk in pd.read_csv(url, sep="|", usecols=USE_COLS, chunksize=chunksize):
+            st.rows_in += len(chunk)
+            chunk["datetime"] = parse_datetime_frame(chunk)
+            mask = (chunk["datetime"] >= start_ts) & (chunk["datetime"] <= end_ts)
+            if mask.any():
+                kept.append(chunk.loc[mask].copy())
+        st.rows_out = sum(len(k) for k in kept)
 
     if not kept:
         return pd.DataFrame(columns=USE_COLS + ["datetime"])
@@ -92,53 +101,57 @@ def main() -> None:
         default=200000,
         help="Rows per read chunk (keep modest to limit memory).",
     )
+    add_trace_args(parser)
     args = parser.parse_args()
 
-    start_ts = pd.to_datetime(f"{args.start} 00:00")
-    end_ts = pd.to_datetime(f"{args.end} 23:59")
-
-    station_ids = [s.strip() for s in args.stations.split(",") if s.strip()]
-    if not station_ids:
-        raise ValueError("No stations provided.")
-
-    frames: list[pd.DataFrame] = []
-    for station_id in station_ids:
-        df_station = read_station_hourly(station_id, start_ts, end_ts, args.chunksize)
-        if not df_station.empty:
-            frames.append(df_station)
-
-    if not frames:
-        raise ValueError("No data found for the provided stations and date range.")
-
-    df = pd.concat(frames, ignore_index=True)
-
-    print("shape:", df.shape)
-    print("cols:", df.columns.tolist())
-    print(df.head())
-
-    # Standardize columns
-    df.columns = [c.lower() for c in df.columns]
-
-    for col in [
-        "temperature",
-        "dew_point_temperature",
-        "station_level_pressure",
-        "sea_level_pressure",
-        "wind_speed",
-        "wind_gust",
-        "precipitation",
-        "relative_humidity",
-    ]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    df["is_rain"] = (df["precipitation"] > 0).astype(int)
-
-    print("datetime_range:", df["datetime"].min(), "to", df["datetime"].max())
-
-    out_path = OUT_DIR / f"weather_hourly_{args.start}_to_{args.end}.parquet"
-    df.to_parquet(out_path, index=False)
-    print("saved:", out_path, "rows:", len(df))
+    with Tracer.from_args("ingest_weather", args):
+        start_ts = pd.to_datetime(f"{args.start} 00:00")
+        end_ts = pd.to_datetime(f"{args.end} 23:59")
+
+        station_ids = [s.strip() for s in args.stations.split(",") if s.strip()]
+        if not station_ids:
+            raise ValueError("No stations provided.")
+
+        frames: list[pd.DataFrame] = []
+        for station_id in station_ids:
+            df_station = read_station_hourly(station_id, start_ts, end_ts, args.chunksize)
+            if not df_station.empty:
+                frames.append(df_station)
+
+        if not frames:
+            raise ValueError("No data found for the provided stations and date range.")
+
+        df = pd.concat(frames, ignore_index=True)
+
+        print("shape:", df.shape)
+        print("cols:", df.columns.tolist())
+        print(df.head())
+
+        # Standardize columns
+        df.columns = [c.lower() for c in df.columns]
+
+        with stage("clean", rows_in=len(df)):
+            for col in [
+                "temperature",
+                "dew_point_temperature",
+                "station_level_pressure",
+                "sea_level_pressure",
+                "wind_speed",
+                "wind_gust",
+                "precipitation",
+                "relative_humidity",
+            ]:
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors="coerce")
+
+            df["is_rain"] = (df["precipitation"] > 0).astype(int)
+
+        print("datetime_range:", df["datetime"].min(), "to", df["datetime"].max())
+
+        out_path = OUT_DIR / f"weather_hourly_{args.start}_to_{args.end}.parquet"
+        with stage("write", rows_in=len(df)):
+            df.to_parquet(out_path, index=False)
+        print("saved:", out_path, "rows:", len(df))
 
 
 if __name__ == "__main__":
@@ -1,8 +1,13 @@
 import argparse
+import sys
 from pathlib import Path
 
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
 
 def expand_paths(values: list[str]) -> list[Path]:
     paths: list[Path] = []
@@ -32,32 +37,37 @@ def main() -> None:
         default="",
         help="Output directory (default: same folder as input).",
     )
+    add_trace_args(parser)
     args = parser.parse_args()
 
-    paths = expand_paths(args.inputs)
-    if not paths:
-        raise ValueError("No parquet files found.")
+    with Tracer.from_args("normalize_hvfhv", args):
+        paths = expand_paths(args.inputs)
+        if not paths:
+            raise ValueError("No parquet files found.")
 
-    out_dir = Path(args.outdir) if args.outdir else None
-    if out_dir:
-        out_dir.mkdir(parents=True, exist_ok=True)
+        out_dir = Path(args.outdir) if args.outdir else None
+        if out_dir:
+            out_dir.mkdir(parents=True, exist_ok=True)
 
-    for in_path in paths:
-        if not in_path.exists():
-            raise FileNotFoundError(in_path)
-        out_path = (
-            out_dir / (in_path.stem + "_normalized.parquet")
-            if out_dir
-            else in_path.with_name(in_path.stem + "_normalized.parquet")
-        )
+        for in_path in paths:
+            if not in_path.exists():
+                raise FileNotFoundError(in_path)
+            out_path = (
+                out_dir / (in_path.stem + "_normalized.parquet")
+                if out_dir
+                else in_path.with_name(in_path.stem + "_normalized.parquet")
+            )
 
-        df = pd.read_parquet(in_path)
-        if "pickup_datetime" not in df.columns:
-            raise ValueError(f"Expected column 'pickup_datetime' not found in {in_path}")
+            with stage(f"normalize {in_path.name}") as st:
+                df = pd.read_parquet(in_path)
+                st.rows_in = len(df)
+                if "pickup_datetime" not in df.columns:
+                    raise ValueError(f"Expected column 'pickup_datetime' not found in {in_path}")
 
-        df = df.rename(columns={"pickup_datetime": "tpep_pickup_datetime"})
-        df.to_parquet(out_path, index=False)
-        print("saved:", out_path)
+                df = df.rename(columns={"pickup_datetime": "tpep_pickup_datetime"})
+                df.to_parquet(out_path, index=False)
+                st.rows_out = len(df)
+            print("saved:", out_path)
 
 
 if __name__ == "__main__":
@@ -1,25 +1,40 @@
+from pathlib import Path
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
+# Written by scripts/training/evaluate_models.py.
 DATA_PATH = "data/reports/model_benchmarks.csv"
 OUT_PATH = "data/reports/model_benchmarks.png"
+# Written by scripts/benchmarks/benchmark_model_inference.py.
+INFERENCE_PATH = "data/reports/model_inference_benchmarks.csv"
+INFERENCE_OUT_PATH = "data/reports/model_latency_accuracy.png"
+FORECAST_BATCH = 263 * 48
 
 BG = "#111111"
 GRID = "#5a5a5a"
 TEXT = "#e5e5e5"
 DOT1 = "#d9d9d9"
 DOT2 = "#9fb2ff"
+LINES = ["#d9d9d9", "#9fb2ff", "#ffb38a", "#8fd19e", "#e59fe0", "#f2e394"]
 
 
-def main() -> None:
+def style_axes(*axes) -> None:
+    for ax in axes:
+        ax.set_facecolor(BG)
+        ax.tick_params(axis="x", colors=TEXT)
+        ax.tick_params(axis="y", colors=TEXT)
+        for spine in ax.spines.values():
+            spine.set_color("#3a3a3a")
+
+
+def plot_accuracy() -> None:
     df = pd.read_csv(DATA_PATH)
     df = df.dropna(subset=["Model", "MAE", "sMAPE"])
 
     plt.style.use("dark_background")
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(9, 7), sharex=False)
     fig.patch.set_facecolor(BG)
-    ax1.set_facecolor(BG)
-    ax2.set_facecolor(BG)
 
     df_mae = df.sort_values("MAE", ascending=True)
     ax1.hlines(df_mae["Model"], 0, df_mae["MAE"], color=GRID, alpha=0.45, linewidth=2)
@@ -35,16 +50,62 @@ def main() -> None:
     ax2.set_xlabel("sMAPE")
     ax2.grid(color=GRID, alpha=0.25, axis="x")
 
-    for ax in (ax1, ax2):
-        ax.tick_params(axis="x", colors=TEXT)
-        ax.tick_params(axis="y", colors=TEXT)
-        for spine in ax.spines.values():
-            spine.set_color("#3a3a3a")
-
+    style_axes(ax1, ax2)
     plt.tight_layout()
     plt.savefig(OUT_PATH, dpi=200, facecolor=fig.get_facecolor())
     print(f"saved: {OUT_PATH}")
 
 
+def plot_latency_accuracy() -> None:
+    """Validation MAE vs forecast-batch latency, and throughput vs batch size, per model family."""
+    df = pd.read_csv(INFERENCE_PATH)
+    # Best thread count per (model, batch): what serving would configure.
+    best = df.loc[df.groupby(["model", "batch_rows"])["latency_ms_p50"].idxmin()]
+    batch = FORECAST_BATCH if FORECAST_BATCH in set(best["batch_rows"]) else int(best["batch_rows"].min())
+    forecast = best[best["batch_rows"] == batch]
+
+    plt.style.use("dark_background")
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(13, 5.5))
+    fig.patch.set_facecolor(BG)
+
+    ax1.scatter(forecast["latency_ms_p50"], forecast["MAE"], s=80, color=DOT2, zorder=3)
+    for r in forecast.itertuples():
+        ax1.annotate(
+            f"{r.model} ({r.threads}t)",
+            (r.latency_ms_p50, r.MAE),
+            textcoords="offset points",
+            xytext=(6, 6),
+            color=TEXT,
+            fontsize=9,
+        )
+    ax1.set_xscale("log")
+    ax1.set_title(f"Accuracy vs latency ({batch:,}-row batch)")
+    ax1.set_xlabel("p50 predict latency (ms, log)")
+    ax1.set_ylabel("validation MAE")
+    ax1.grid(color=GRID, alpha=0.25)
+
+    for color, (model, rows) in zip(LINES * 2, best.groupby("model")):
+        rows = rows.sort_values("batch_rows")
+        ax2.plot(rows["batch_rows"], rows["rows_per_s"], marker="o", color=color, label=model)
+    ax2.set_xscale("log")
+    ax2.set_yscale("log")
+    ax2.set_title("Throughput by batch size (best thread count)")
+    ax2.set_xlabel("rows per predict call (log)")
+    ax2.set_ylabel("rows / second (log)")
+    ax2.grid(color=GRID, alpha=0.25)
+    ax2.legend(facecolor=BG, edgecolor="#3a3a3a", fontsize=9)
+
+    style_axes(ax1, ax2)
+    plt.tight_layout()
+    plt.savefig(INFERENCE_OUT_PATH, dpi=200, facecolor=fig.get_facecolor())
+    print(f"saved: {INFERENCE_OUT_PATH}")
+
+
+def main() -> None:
+    plot_accuracy()
+    if Path(INFERENCE_PATH).exists():
+        plot_latency_accuracy()
+
+
 if __name__ == "__main__":
     main()
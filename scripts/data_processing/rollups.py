@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+from zone_lookup import UNKNOWN_BOROUGH, ZONE_LOOKUP_DEFAULT, zone_boroughs  # noqa: E402
+
+
+FEATURES_DEFAULT = "data/processed/features_hourly.parquet"
+ROLLUP_DEFAULT = "data/processed/rollups.parquet"
+STATE_KEY = b"rollups"
+KEYS = ["level", "key", "grain", "period"]
+WEATHER_COLS = ["temperature", "precipitation", "relative_humidity", "wind_speed"]
+# Everything stored is a sum or a count, so a day split across two updates merges by adding.
+SUM_COLS = ["trips", "zone_hours"] + [f"{c}_{s}" for c in WEATHER_COLS for s in ("sum", "n")]
+
+
+def load_store(path: str | Path) -> tuple[pd.DataFrame, dict]:
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame(columns=KEYS + SUM_COLS), {"watermark": None}
+    table = pq.read_table(path)
+    state = json.loads((table.schema.metadata or {}).get(STATE_KEY, b"{}"))
+    state.setdefault("watermark", None)
+    return table.to_pandas(), state
+
+
+def save_store(path: str | Path, store: pd.DataFrame, state: dict) -> None:
+    """Rollups and watermark land in one os.replace, so an interrupted update never double-counts hours."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(store, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), STATE_KEY: json.dumps(state).encode()})
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        # Small row groups per (level, grain) keep filtered reads to the slice a chart needs.
+        pq.write_table(table, tmp, row_group_size=50_000)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def load_new_hours(features_path: str | Path, watermark: pd.Timestamp | None) -> pd.DataFrame:
+    filters = [("hour", ">", watermark)] if watermark is not None else None
+    df = pd.read_parquet(features_path, columns=["hour", "PULocationID", "trip_count"] + WEATHER_COLS, filters=filters)
+    df["hour"] = pd.to_datetime(df["hour"])
+    return df
+
+
+def hourly_rollups(df: pd.DataFrame, boroughs: dict[int, str]) -> pd.DataFrame:
+    """Citywide and per-borough sums for each hour; weather is one series, so it is averaged per hour."""
+    weather = df.groupby("hour")[WEATHER_COLS].mean()
+    df = df.assign(borough=df["PULocationID"].map(boroughs).fillna(UNKNOWN_BOROUGH))
+    parts = []
+    for level, by in (("citywide", None), ("borough", "borough")):
+        keys = ["hour"] if by is None else ["hour", by]
+        grouped = df.groupby(keys, sort=False)["trip_count"].agg(trips="sum", zone_hours="size").reset_index()
+        grouped["key"] = "all" if by is None else grouped.pop(by)
+        grouped["level"] = level
+        parts.append(grouped)
+    out = pd.concat(parts, ignore_index=True).rename(columns={"hour": "period"})
+    hour_weather = weather.reindex(out["period"])
+    for col in WEATHER_COLS:
+        values = hour_weather[col].to_numpy()
+        out[f"{col}_sum"] = np.nan_to_num(values)
+        out[f"{col}_n"] = (~np.isnan(values)).astype(np.int64)
+    out["grain"] = "hour"
+    out["trips"] = out["trips"].astype(np.int64)
+    return out[KEYS + SUM_COLS]
+
+
+def daily_rollups(hourly: pd.DataFrame) -> pd.DataFrame:
+    daily = hourly.assign(period=hourly["period"].dt.floor("D"), grain="day")
+    return daily.groupby(KEYS, as_index=False, sort=False)[SUM_COLS].sum()
+
+
+def merge_rollups(store: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    if store.empty:
+        merged = new
+    else:
+        merged = pd.concat([store, new], ignore_index=True).groupby(KEYS, as_index=False, sort=False)[SUM_COLS].sum()
+    return merged.sort_values(["grain", "level", "key", "period"]).reset_index(drop=True)
+
+
+def update_rollups(
+    store_path: str | Path = ROLLUP_DEFAULT,
+    features_path: str | Path = FEATURES_DEFAULT,
+    zone_lookup: str = ZONE_LOOKUP_DEFAULT,
+    rebuild: bool = False,
+) -> tuple[pd.DataFrame, dict, int]:
+    """Fold hours past the watermark into the store; returns (store, state, new hour count)."""
+    store, state = (pd.DataFrame(columns=KEYS + SUM_COLS), {"watermark": None}) if rebuild else load_store(store_path)
+    watermark = pd.Timestamp(state["watermark"]) if state["watermark"] else None
+    with stage("read new hours") as st:
+        df = load_new_hours(features_path, watermark)
+        st.rows_out = len(df)
+    if df.empty:
+        return store, state, 0
+    with stage("aggregate", rows_in=len(df)) as st:
+        hourly = hourly_rollups(df, zone_boroughs(zone_lookup))
+        store = merge_rollups(store, pd.concat([hourly, daily_rollups(hourly)], ignore_index=True))
+        st.rows_out = len(store)
+    new_hours = int(df["hour"].nunique())
+    state = {
+        "watermark": df["hour"].max().isoformat(),
+        "source": str(features_path),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with stage("write"):
+        save_store(store_path, store, state)
+    return store, state, new_hours
+
+
+def read_rollup(
+    path: str | Path = ROLLUP_DEFAULT,
+    level: str = "citywide",
+    grain: str = "day",
+    key: str | None = "all",
+    start: str | None = None,
+    end: str | None = None,
+) -> pd.DataFrame:
+    """One slice of the store indexed by period: trips, zone_hours and mean weather.
+
+    key=None keeps every key of the level (e.g. all boroughs) as a column of the frame.
+    """
+    filters = [("level", "=", level), ("grain", "=", grain)]
+    if key is not None:
+        filters.append(("key", "=", key))
+    if start:
+        filters.append(("period", ">=", pd.Timestamp(start)))
+    if end:
+        filters.append(("period", "<", pd.Timestamp(end)))
+    df = pd.read_parquet(path, filters=filters)
+    for col in WEATHER_COLS:
+        df[col] = df[f"{col}_sum"] / df[f"{col}_n"].where(df[f"{col}_n"] > 0)
+    df = df[["key", "period", "trips", "zone_hours"] + WEATHER_COLS].sort_values(["key", "period"])
+    if key is not None:
+        return df.drop(columns="key").set_index("period")
+    return df.set_index(["period", "key"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Incrementally maintain citywide/borough hourly and daily rollups.")
+    parser.add_argument("--features-path", default=FEATURES_DEFAULT)
+    parser.add_argument("--store", default=ROLLUP_DEFAULT, help="Rollup parquet (holds the watermark).")
+    parser.add_argument("--zone-lookup", default=ZONE_LOOKUP_DEFAULT)
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the watermark and rebuild from all hours.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("rollups", args):
+        start = time.perf_counter()
+        store, state, new_hours = update_rollups(args.store, args.features_path, args.zone_lookup, args.rebuild)
+        if not new_hours:
+            print("no hours after watermark", state["watermark"])
+            return
+        print(f"new hours: {new_hours}  store rows: {len(store):,}  ({time.perf_counter() - start:.2f}s)")
+        print("watermark:", state["watermark"])
+        print("saved:", args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from ingest_tlc import hourly_counts  # noqa: E402
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
+
+DROP_DIR_DEFAULT = "data/stream/tlc"
+OUT_DEFAULT = "data/processed/tlc_hourly_zone_live.parquet"
+STATE_KEY = b"stream_tlc"
+PICKUP_COLS = ["tpep_pickup_datetime", "lpep_pickup_datetime", "pickup_datetime"]
+LATENESS_HOURS_DEFAULT = 6
+SETTLE_SECONDS_DEFAULT = 2.0
+SCHEMA = pa.schema([("hour", pa.timestamp("us")), ("PULocationID", pa.int64()), ("trip_count", pa.int64())])
+
+
+def empty_state() -> dict:
+    return {"watermark": None, "max_event_hour": None, "files": [], "batches": 0, "late_rows_dropped": 0}
+
+
+def load_table(path: str | Path) -> tuple[pa.Table, dict]:
+    path = Path(path)
+    if not path.exists():
+        return SCHEMA.empty_table(), empty_state()
+    table = pq.read_table(path)
+    state = {**empty_state(), **json.loads((table.schema.metadata or {}).get(STATE_KEY, b"{}"))}
+    return table.select(SCHEMA.names).cast(SCHEMA), state
+
+
+def commit(path: str | Path, table: pa.Table, state: dict) -> None:
+    """Counts and stream state land in one os.replace: readers see the old table or the new one, never a mix."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = table.replace_schema_metadata({STATE_KEY: json.dumps(state).encode()})
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def pending_files(drop_dir: str | Path, done: set[str], settle_s: float) -> list[Path]:
+    """Parquet files not yet ingested, oldest first.
+
+    Producers should write to a dot-prefixed or .tmp name and rename into place; files modified in
+    the last settle_s seconds are left for the next poll in case a producer writes in place.
+    """
+    now = time.time()
+    files = []
+    for path in Path(drop_dir).glob("*.parquet"):
+        if path.name.startswith(".") or path.name in done:
+            continue
+        mtime = path.stat().st_mtime
+        if now - mtime >= settle_s:
+            files.append((mtime, path.name, path))
+    return [path for _, _, path in sorted(files)]
+
+
+def read_batch(paths: list[Path], pickup_col: str) -> pd.Series:
+    """Trips per (hour, PULocationID) summed over every file of the micro-batch."""
+    parts = []
+    for path in paths:
+        names = pq.read_schema(path).names
+        col = next((c for c in [pickup_col] + PICKUP_COLS if c in names), None)
+        if col is None:
+            raise ValueError(f"{path}: no pickup datetime column (tried {pickup_col}, {', '.join(PICKUP_COLS)})")
+        parts.append(hourly_counts(pd.read_parquet(path, columns=[col, "PULocationID"]), col))
+    counts = pd.concat(parts)
+    return counts.groupby(level=["hour", "PULocationID"]).sum()
+
+
+def apply_batch(table: pa.Table, state: dict, counts: pd.Series, lateness_hours: int) -> tuple[pa.Table, dict, int]:
+    """Fold one micro-batch into the hourly table; returns (table, state, late rows dropped).
+
+    The watermark trails the newest event hour by lateness_hours. Hours before it are final, so
+    trips that arrive for them are dropped and counted instead of changing closed hours. The monthly
+    ingest_tlc.py run is what reconciles them.
+    """
+    watermark = pd.Timestamp(state["watermark"]) if state["watermark"] else None
+    late = 0
+    if watermark is not None and len(counts):
+        is_late = counts.index.get_level_values("hour") < watermark
+        late = int(counts[is_late].sum())
+        counts = counts[~is_late]
+    if len(counts):
+        batch = counts.rename("trip_count").reset_index()
+        first_hour = batch["hour"].min()
+        # Only the tail of the table from the batch's first hour can change; the rest is reused as is.
+        hours = table.column("hour").to_pandas()
+        keep = table.filter(pa.array((hours < first_hour).to_numpy()))
+        tail = table.filter(pa.array((hours >= first_hour).to_numpy())).to_pandas()
+        merged = (
+            pd.concat([tail, batch], ignore_index=True)
+            .groupby(["hour", "PULocationID"], as_index=False)["trip_count"]
+            .sum()
+            .sort_values(["hour", "PULocationID"])
+        )
+        table = pa.concat_tables([keep, pa.Table.from_pandas(merged, schema=SCHEMA, preserve_index=False)])
+        max_hour = batch["hour"].max()
+        if state["max_event_hour"]:
+            max_hour = max(max_hour, pd.Timestamp(state["max_event_hour"]))
+        new_watermark = max_hour - pd.Timedelta(hours=lateness_hours)
+        # The watermark only moves forward, even if a batch holds nothing but old hours.
+        if watermark is not None:
+            new_watermark = max(new_watermark, watermark)
+        state = {**state, "max_event_hour": max_hour.isoformat(), "watermark": new_watermark.isoformat()}
+    state = {**state, "late_rows_dropped": state["late_rows_dropped"] + late}
+    return table, state, late
+
+
+def run_once(args: argparse.Namespace) -> int:
+    """Ingest every settled pending file as micro-batches of up to --max-files; returns files ingested."""
+    table, state = load_table(args.out)
+    # Names of files that were deleted from the drop dir are forgotten, so the state stays bounded.
+    present = {p.name for p in Path(args.drop_dir).glob("*.parquet")}
+    done = set(state["files"]) & present
+    files = pending_files(args.drop_dir, done, args.settle_seconds)
+    ingested = 0
+    for start in range(0, len(files), args.max_files):
+        batch_files = files[start : start + args.max_files]
+        with stage("micro-batch", rows_in=len(batch_files)) as st:
+            counts = read_batch(batch_files, args.pickup_col)
+            table, state, late = apply_batch(table, state, counts, args.lateness_hours)
+            done |= {p.name for p in batch_files}
+            state = {
+                **state,
+                "files": sorted(done),
+                "batches": state["batches"] + 1,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            commit(args.out, table, state)
+            st.rows_out = len(counts)
+        ingested += len(batch_files)
+        print(
+            f"batch {state['batches']}: {len(batch_files)} file(s), {int(counts.sum()):,} trips "
+            f"({late:,} late dropped), watermark {state['watermark']}, table rows {table.num_rows:,}"
+        )
+    return ingested
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Fold trip parquet files landing in a drop directory into hourly zone counts, one micro-batch at a time."
+    )
+    parser.add_argument("--drop-dir", default=DROP_DIR_DEFAULT, help="Directory the feed writes parquet files into.")
+    parser.add_argument("--out", default=OUT_DEFAULT, help="Hourly counts parquet (also holds the stream state).")
+    parser.add_argument("--pickup-col", default=PICKUP_COLS[0], help="Pickup datetime column (falls back to known names).")
+    parser.add_argument(
+        "--lateness-hours",
+        type=int,
+        default=LATENESS_HOURS_DEFAULT,
+        help="How far the watermark trails the newest pickup hour; older trips are dropped as late.",
+    )
+    parser.add_argument("--max-files", type=int, default=50, help="Files per micro-batch (one commit each).")
+    parser.add_argument("--settle-seconds", type=float, default=SETTLE_SECONDS_DEFAULT)
+    parser.add_argument("--watch", action="store_true", help="Keep polling the drop directory instead of exiting.")
+    parser.add_argument("--interval", type=float, default=10.0, help="Poll interval in seconds with --watch.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("stream_tlc", args):
+        Path(args.drop_dir).mkdir(parents=True, exist_ok=True)
+        while True:
+            ingested = run_once(args)
+            if not args.watch:
+                if not ingested:
+                    print("no new files in", args.drop_dir)
+                break
+            try:
+                time.sleep(args.interval)
+            except KeyboardInterrupt:
+                break
+        print("saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import csv
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+
+
+ZONES_GEOJSON_DEFAULT = "frontend/public/data/taxi_zones.geojson"
+LEVELS_DIR_DEFAULT = "frontend/public/data"
+REPORT_DEFAULT = "data/reports/zone_geometry_levels.csv"
+# Shared grid the topology is built on (~0.06 m across NYC); every level snaps down from it.
+BASE_QUANTIZATION = 10_000_000
+# name -> (simplification tolerance in degrees, output grid steps across the bbox).
+# 1e-4 degrees is ~10 m at NYC's latitude.
+LEVELS = {
+    "high": (0.00002, 200_000),
+    "medium": (0.0001, 50_000),
+    "low": (0.0004, 10_000),
+}
+PARSE_REPEATS = 5
+
+
+def level_path(out_dir: str | Path, level: str) -> Path:
+    return Path(out_dir) / f"taxi_zones_{level}.topo.json"
+
+
+def feature_rings(geometry: dict) -> list[list[np.ndarray]]:
+    """Polygon or MultiPolygon GeoJSON geometry -> list of polygons, each a list of (n, 2) rings."""
+    polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+    return [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon] for polygon in polygons]
+
+
+def quantize(polygons: list[list[list[np.ndarray]]], bbox: np.ndarray, n: int) -> list[list[list[np.ndarray]]]:
+    """Snap rings onto an integer grid so coordinates shared by neighbours compare equal.
+
+    One step size for both axes (n steps across the wider side) keeps tolerances isotropic.
+    """
+    scale = (n - 1) / max(float(np.max(bbox[2:] - bbox[:2])), 1e-12)
+    out = []
+    for feature in polygons:
+        feature_out = []
+        for polygon in feature:
+            rings = []
+            for ring in polygon:
+                q = np.rint((ring - bbox[:2]) * scale).astype(np.int64)
+                q = q[np.r_[True, np.any(q[1:] != q[:-1], axis=1)]]
+                if len(q) and np.any(q[0] != q[-1]):
+                    q = np.vstack([q, q[:1]])
+                if len(q) >= 4:
+                    rings.append(q)
+            if rings:
+                feature_out.append(rings)
+        out.append(feature_out)
+    return out
+
+
+def _canonical(arc: np.ndarray) -> tuple[bytes, bool]:
+    """Key shared by an arc and its reverse, plus whether `arc` is the reversed form of the key."""
+    if np.array_equal(arc[0], arc[-1]):
+        # Closed rings: orientation and start point are arbitrary, so rotate to the smallest vertex.
+        forward = _rotate_min(arc)
+        backward = _rotate_min(arc[::-1])
+    else:
+        forward, backward = arc, arc[::-1]
+    fb, bb = forward.tobytes(), backward.tobytes()
+    return (fb, False) if fb <= bb else (bb, True)
+
+
+def _rotate_min(ring: np.ndarray) -> np.ndarray:
+    body = ring[:-1]
+    start = int(np.lexsort((body[:, 1], body[:, 0]))[0])
+    body = np.roll(body, -start, axis=0)
+    return np.vstack([body, body[:1]])
+
+
+def build_topology(polygons: list[list[list[np.ndarray]]]) -> tuple[list[np.ndarray], list[list[list[list[int]]]]]:
+    """Cut rings into arcs at junctions and store each shared border once.
+
+    A vertex is a junction when it has different neighbours in different rings (where two zones'
+    shared border starts or ends). Returns (arcs, refs); refs mirror `polygons` with each ring
+    replaced by arc indices, ~i marking arc i traversed backwards (TopoJSON convention).
+    """
+    rings = [ring for feature in polygons for polygon in feature for ring in polygon]
+    bodies = [ring[:-1] for ring in rings]
+    points = np.concatenate(bodies)
+    _, point_id = np.unique(points, axis=0, return_inverse=True)
+    point_id = point_id.ravel()
+    prev_id = np.concatenate([np.roll(point_id[o : o + len(b)], 1) for o, b in zip(_offsets(bodies), bodies)])
+    next_id = np.concatenate([np.roll(point_id[o : o + len(b)], -1) for o, b in zip(_offsets(bodies), bodies)])
+    lo, hi = np.minimum(prev_id, next_id), np.maximum(prev_id, next_id)
+
+    order = np.argsort(point_id, kind="stable")
+    sorted_id = point_id[order]
+    starts = np.flatnonzero(np.r_[True, sorted_id[1:] != sorted_id[:-1]])
+    counts = np.diff(np.r_[starts, len(sorted_id)])
+    first_lo = np.repeat(lo[order][starts], counts)
+    first_hi = np.repeat(hi[order][starts], counts)
+    differs = (lo[order] != first_lo) | (hi[order] != first_hi)
+    junction = np.zeros(int(point_id.max()) + 1, dtype=bool)
+    np.logical_or.at(junction, sorted_id, differs)
+
+    arcs: list[np.ndarray] = []
+    index: dict[bytes, int] = {}
+
+    def add_arc(arc: np.ndarray) -> int:
+        key, reversed_ = _canonical(arc)
+        if key not in index:
+            index[key] = len(arcs)
+            arcs.append(arc[::-1].copy() if reversed_ else arc)
+        return ~index[key] if reversed_ else index[key]
+
+    ring_refs = []
+    for offset, body in zip(_offsets(bodies), bodies):
+        cuts = np.flatnonzero(junction[point_id[offset : offset + len(body)]])
+        if len(cuts) == 0:
+            ring_refs.append([add_arc(np.vstack([body, body[:1]]))])
+            continue
+        body = np.roll(body, -int(cuts[0]), axis=0)
+        closed = np.vstack([body, body[:1]])
+        cuts = np.r_[cuts - cuts[0], len(body)]
+        ring_refs.append([add_arc(closed[a : b + 1]) for a, b in zip(cuts[:-1], cuts[1:])])
+
+    refs, i = [], 0
+    for feature in polygons:
+        feature_refs = []
+        for polygon in feature:
+            feature_refs.append(ring_refs[i : i + len(polygon)])
+            i += len(polygon)
+        refs.append(feature_refs)
+    return arcs, refs
+
+
+def _offsets(bodies: list[np.ndarray]) -> list[int]:
+    return np.r_[0, np.cumsum([len(b) for b in bodies])[:-1]].astype(int).tolist()
+
+
+def simplify_arc(arc: np.ndarray, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker keeping both endpoints, so shared junctions never move between neighbours."""
+    if tolerance <= 0 or len(arc) <= 2:
+        return arc
+    pts = arc.astype(np.float64)
+    if np.array_equal(arc[0], arc[-1]):
+        # Closed arc: anchor on the vertex farthest from the start so the ring keeps some area.
+        far = int(np.argmax(np.hypot(*(pts - pts[0]).T)))
+        if far == 0:
+            return arc
+        keep = np.zeros(len(arc), dtype=bool)
+        keep[[0, far, len(arc) - 1]] = True
+        stack = [(0, far), (far, len(arc) - 1)]
+    else:
+        keep = np.zeros(len(arc), dtype=bool)
+        keep[[0, -1]] = True
+        stack = [(0, len(arc) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = pts[b] - pts[a]
+        rel = pts[a + 1 : b] - pts[a]
+        norm = np.hypot(*seg)
+        dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm if norm else np.hypot(*rel.T)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            keep[a + 1 + i] = True
+            stack.extend([(a, a + 1 + i), (a + 1 + i, b)])
+    return arc[keep]
+
+
+def simplify_topology(arcs: list[np.ndarray], refs, tolerance: float) -> list[np.ndarray]:
+    simplified = [simplify_arc(arc, tolerance) for arc in arcs]
+    # A ring whose arcs all flatten to straight lines has no area left; those arcs stay unsimplified.
+    for feature in refs:
+        for polygon in feature:
+            for ring in polygon:
+                if sum(len(simplified[r if r >= 0 else ~r]) - 1 for r in ring) < 3:
+                    for r in ring:
+                        simplified[r if r >= 0 else ~r] = arcs[r if r >= 0 else ~r]
+    return simplified
+
+
+def encode_topojson(
+    arcs: list[np.ndarray], refs, properties: list[dict], bbox: np.ndarray, base_n: int, n: int
+) -> dict:
+    """TopoJSON with arcs requantized to an n-step grid and delta-encoded."""
+    factor = (n - 1) / (base_n - 1)
+    encoded = []
+    for arc in arcs:
+        q = np.rint(arc * factor).astype(np.int64)
+        keep = np.r_[True, np.any(q[1:] != q[:-1], axis=1)]
+        keep[-1] = True
+        q = q[keep]
+        encoded.append(np.vstack([q[:1], np.diff(q, axis=0)]).tolist())
+    geometries = []
+    for feature, props in zip(refs, properties):
+        if len(feature) == 1:
+            geometries.append({"type": "Polygon", "arcs": feature[0], "properties": props})
+        else:
+            geometries.append({"type": "MultiPolygon", "arcs": feature, "properties": props})
+    step = float(np.max(bbox[2:] - bbox[:2])) / (n - 1)
+    return {
+        "type": "Topology",
+        "bbox": [round(float(v), 7) for v in bbox],
+        "transform": {
+            "scale": [step, step],
+            "translate": [float(t) for t in bbox[:2]],
+        },
+        "objects": {"zones": {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": encoded,
+    }
+
+
+def decode_topojson(topology: dict, name: str = "zones") -> dict:
+    """TopoJSON -> GeoJSON FeatureCollection; the same steps app.js runs in the browser."""
+    scale = np.asarray(topology["transform"]["scale"])
+    translate = np.asarray(topology["transform"]["translate"])
+    arcs = [np.cumsum(np.asarray(arc, dtype=np.float64), axis=0) * scale + translate for arc in topology["arcs"]]
+
+    def ring(refs: list[int]) -> list[list[float]]:
+        parts = [arcs[r] if r >= 0 else arcs[~r][::-1] for r in refs]
+        # Consecutive arcs share their junction vertex; drop the repeat.
+        return np.vstack([parts[0]] + [p[1:] for p in parts[1:]]).tolist()
+
+    features = []
+    for geom in topology["objects"][name]["geometries"]:
+        if geom["type"] == "Polygon":
+            coords = [ring(r) for r in geom["arcs"]]
+        else:
+            coords = [[ring(r) for r in polygon] for polygon in geom["arcs"]]
+        features.append({"type": "Feature", "properties": geom["properties"], "geometry": {"type": geom["type"], "coordinates": coords}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+def parse_ms(raw: bytes, decode) -> float:
+    """Median ms to parse (and decode, for TopoJSON) a payload, the cost before first paint."""
+    times = []
+    for _ in range(PARSE_REPEATS):
+        start = time.perf_counter()
+        decode(json.loads(raw))
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def export_levels(
+    geojson: dict,
+    out_dir: str | Path = LEVELS_DIR_DEFAULT,
+    levels: dict[str, tuple[float, int]] = LEVELS,
+) -> list[dict]:
+    """Write one TopoJSON file per level of detail; returns one report row per level."""
+    features = geojson["features"]
+    properties = [f["properties"] for f in features]
+    polygons = [feature_rings(f["geometry"]) for f in features]
+    all_points = np.concatenate([ring for feature in polygons for polygon in feature for ring in polygon])
+    bbox = np.r_[all_points.min(axis=0), all_points.max(axis=0)]
+
+    start = time.perf_counter()
+    with stage("build topology") as st:
+        quantized = quantize(polygons, bbox, BASE_QUANTIZATION)
+        arcs, refs = build_topology(quantized)
+        st.rows_out = len(arcs)
+    build_s = time.perf_counter() - start
+    source_vertices = sum(len(ring) for feature in quantized for polygon in feature for ring in polygon)
+    print(f"topology: {len(arcs):,} arcs from {source_vertices:,} ring vertices ({build_s:.2f}s)")
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base_step = float(np.max(bbox[2:] - bbox[:2])) / (BASE_QUANTIZATION - 1)
+    rows = []
+    for name, (tolerance, n) in levels.items():
+        with stage(f"level {name}", rows_in=source_vertices):
+            simplified = simplify_topology(arcs, refs, tolerance / base_step)
+            topology = encode_topojson(simplified, refs, properties, bbox, BASE_QUANTIZATION, n)
+            raw = json.dumps(topology, separators=(",", ":")).encode()
+            path = level_path(out_dir, name)
+            path.write_bytes(raw)
+        rows.append(
+            {
+                "level": name,
+                "tolerance_deg": tolerance,
+                "quantization": n,
+                "arcs": len(topology["arcs"]),
+                "vertices": sum(len(a) for a in topology["arcs"]),
+                "bytes": len(raw),
+                "gzip_bytes": len(gzip.compress(raw)),
+                "parse_ms": round(parse_ms(raw, decode_topojson), 2),
+                "path": str(path),
+            }
+        )
+    return rows
+
+
+def source_row(path: str | Path, geojson: dict) -> dict:
+    raw = Path(path).read_bytes()
+    vertices = sum(
+        len(ring) for f in geojson["features"] for polygon in feature_rings(f["geometry"]) for ring in polygon
+    )
+    return {
+        "level": "source",
+        "tolerance_deg": 0.0,
+        "quantization": "",
+        "arcs": "",
+        "vertices": vertices,
+        "bytes": len(raw),
+        "gzip_bytes": len(gzip.compress(raw)),
+        "parse_ms": round(parse_ms(raw, lambda obj: obj), 2),
+        "path": str(path),
+    }
+
+
+def write_report(rows: list[dict], path: str | Path = REPORT_DEFAULT) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    for r in rows:
+        print(
+            f"{r['level']:>7}  {r['vertices']:>8,} vertices  {r['bytes'] / 1024:>8.1f} KiB"
+            f"  {r['gzip_bytes'] / 1024:>7.1f} KiB gz  {r['parse_ms']:>7.1f} ms parse"
+        )
+    print("saved:", path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export simplified, quantized TopoJSON levels of the taxi zones.")
+    parser.add_argument("--geojson", default=ZONES_GEOJSON_DEFAULT, help="Full-precision zones GeoJSON.")
+    parser.add_argument("--out-dir", default=LEVELS_DIR_DEFAULT)
+    parser.add_argument("--report", default=REPORT_DEFAULT)
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("zone_topology", args):
+        geojson = json.loads(Path(args.geojson).read_text())
+        rows = [source_row(args.geojson, geojson)] + export_levels(geojson, args.out_dir)
+        write_report(rows, args.report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "serve"))
+
+from model_registry import atomic_write_text, file_sha256  # noqa: E402
+
+
+STATE_DEFAULT = "data/pipeline/state.json"
+LOG_DIR_DEFAULT = "data/pipeline/logs"
+SCRIPTS = "scripts"
+
+# Each stage declares the paths it reads and writes; edges come from outputs feeding inputs.
+# {name} placeholders are filled from VARS (override with --var name=value).
+VARS = {
+    "python": sys.executable,
+    "tlc_raw": "data/raw/tlc",
+    "hvfhv_raw": "data/raw/fhvhv",
+    "hvfhv_normalized": "data/interim/hvfhv_normalized",
+    "weather_start": "2023-01-01",
+    "weather_end": "2025-12-31",
+    "tlc_hourly": "data/processed/tlc_hourly_zone.parquet",
+    "weather_raw": "data/raw/weather_hourly/weather_hourly_{weather_start}_to_{weather_end}.parquet",
+    "weather_hourly": "data/processed/weather_hourly.parquet",
+    "features": "data/processed/features_hourly.parquet",
+    "rollups": "data/processed/rollups.parquet",
+    "baseline_bin": "data/serving/baseline_week_hour.bin",
+    "model": "models/lightgbm_week_hour_latest.txt",
+    "forecast": "data/forecast/forecast_latest.json",
+    "zones_geojson": "frontend/public/data/taxi_zones.geojson",
+}
+PIPELINE = [
+    {
+        "name": "normalize_hvfhv",
+        "cmd": "{python} scripts/data_processing/normalize_hvfhv.py --inputs {hvfhv_raw} --outdir {hvfhv_normalized}",
+        "inputs": ["{hvfhv_raw}"],
+        "outputs": ["{hvfhv_normalized}"],
+    },
+    {
+        "name": "ingest_tlc",
+        "cmd": "{python} scripts/data_processing/ingest_tlc.py --inputs {tlc_raw} {hvfhv_normalized} --out {tlc_hourly}",
+        "inputs": ["{tlc_raw}", "{hvfhv_normalized}"],
+        "outputs": ["{tlc_hourly}"],
+    },
+    {
+        "name": "ingest_weather",
+        "cmd": "{python} scripts/data_processing/ingest_weather.py --start {weather_start} --end {weather_end}",
+        "inputs": [],
+        "outputs": ["{weather_raw}"],
+    },
+    {
+        "name": "aggregate_weather_hourly",
+        "cmd": "{python} scripts/data_processing/aggregate_weather_hourly.py --infile {weather_raw} --outfile {weather_hourly}",
+        "inputs": ["{weather_raw}"],
+        "outputs": ["{weather_hourly}"],
+    },
+    {
+        "name": "build_features",
+        "cmd": "{python} scripts/data_processing/build_features.py --tlc {tlc_hourly} --weather {weather_hourly} "
+        "--out {features} --ffill-weather",
+        "inputs": ["{tlc_hourly}", "{weather_hourly}"],
+        "outputs": ["{features}"],
+    },
+    {
+        "name": "rollups",
+        "cmd": "{python} scripts/data_processing/rollups.py --features-path {features} --store {rollups}",
+        "inputs": ["{features}"],
+        "outputs": ["{rollups}"],
+    },
+    {
+        "name": "zone_topology",
+        "cmd": "{python} scripts/data_processing/zone_topology.py --geojson {zones_geojson}",
+        "inputs": ["{zones_geojson}"],
+        "outputs": [
+            "frontend/public/data/taxi_zones_high.topo.json",
+            "frontend/public/data/taxi_zones_medium.topo.json",
+            "frontend/public/data/taxi_zones_low.topo.json",
+        ],
+    },
+    {
+        "name": "build_serving_baseline",
+        "cmd": "{python} scripts/serve/build_serving_baseline.py --features-path {features} --bin-out {baseline_bin}",
+        "inputs": ["{features}"],
+        "outputs": ["{baseline_bin}"],
+    },
+    {
+        "name": "train",
+        "cmd": "{python} scripts/training/tree_based_models/lightgbm_week_hour.py --features-path {features}",
+        "inputs": ["{features}"],
+        "outputs": ["{model}"],
+    },
+    {
+        "name": "generate_forecast",
+        "cmd": "{python} scripts/serve/generate_forecast.py --out {forecast} --model-path {model} "
+        "--baseline-bin {baseline_bin}",
+        "inputs": ["{model}", "{baseline_bin}"],
+        "outputs": ["{forecast}"],
+        # Forecasts start at the next hour and pull live weather, so identical inputs are not a reason to skip.
+        "always": True,
+    },
+]
+
+
+def expand(template: str, variables: dict[str, str]) -> str:
+    # Variables may reference each other (weather_raw uses the dates), so expand until stable.
+    for _ in range(5):
+        expanded = template.format(**variables)
+        if expanded == template:
+            break
+        template = expanded
+    return template
+
+
+def resolve_stages(spec: list[dict], variables: dict[str, str]) -> dict[str, dict]:
+    stages = {}
+    for raw in spec:
+        stage = {
+            "name": raw["name"],
+            "cmd": expand(raw["cmd"], variables),
+            "inputs": [expand(p, variables) for p in raw.get("inputs", [])],
+            "outputs": [expand(p, variables) for p in raw.get("outputs", [])],
+            "always": bool(raw.get("always", False)),
+        }
+        if stage["name"] in stages:
+            raise ValueError(f"Duplicate stage name: {stage['name']}")
+        stages[stage["name"]] = stage
+    producers = {}
+    for stage in stages.values():
+        for out in stage["outputs"]:
+            if out in producers:
+                raise ValueError(f"{out} is written by both {producers[out]} and {stage['name']}")
+            producers[out] = stage["name"]
+    for stage in stages.values():
+        deps = set(raw_deps(stage, producers))
+        deps.update(next(s for s in spec if s["name"] == stage["name"]).get("after", []))
+        deps.discard(stage["name"])
+        stage["deps"] = sorted(deps)
+    topo_order(stages)
+    return stages
+
+
+def raw_deps(stage: dict, producers: dict[str, str]):
+    """Stages whose outputs are (or contain) one of this stage's inputs."""
+    for path in stage["inputs"]:
+        p = Path(path)
+        for out, producer in producers.items():
+            o = Path(out)
+            if p == o or o in p.parents or p in o.parents:
+                yield producer
+
+
+def topo_order(stages: dict[str, dict]) -> list[str]:
+    order, state = [], {}
+
+    def visit(name: str, chain: tuple[str, ...]) -> None:
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "active":
+            raise ValueError("Pipeline cycle: " + " -> ".join(chain + (name,)))
+        state[name] = "active"
+        for dep in stages[name]["deps"]:
+            if dep not in stages:
+                raise ValueError(f"{name} depends on unknown stage {dep}")
+            visit(dep, chain + (name,))
+        state[name] = "done"
+        order.append(name)
+
+    for name in stages:
+        visit(name, ())
+    return order
+
+
+class HashCache:
+    """Content hashes keyed by (size, mtime_ns), so unchanged multi-GB inputs are not re-read every run."""
+
+    def __init__(self, entries: dict | None = None):
+        self.entries = entries or {}
+
+    def file(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path)
+        cached = self.entries.get(key)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+        digest = file_sha256(path)
+        self.entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+        return digest
+
+    def path(self, path: str | Path) -> str | None:
+        """Hash of a file, or of every file under a directory (names included); None when missing."""
+        path = Path(path)
+        if path.is_file():
+            return self.file(path)
+        if not path.is_dir():
+            return None
+        digest = hashlib.sha256()
+        for child in sorted(p for p in path.rglob("*") if p.is_file() and not p.name.startswith(".")):
+            digest.update(str(child.relative_to(path)).encode())
+            digest.update(self.file(child).encode())
+        return digest.hexdigest()
+
+
+def script_paths(cmd: str) -> list[str]:
+    return [tok for tok in shlex.split(cmd) if tok.endswith(".py") and tok.startswith(SCRIPTS + "/")]
+
+
+def stage_key(stage: dict, hashes: HashCache) -> tuple[str, dict[str, str | None]]:
+    """Digest of the command line, the scripts it runs and every input's content."""
+    inputs = {path: hashes.path(path) for path in stage["inputs"] + script_paths(stage["cmd"])}
+    digest = hashlib.sha256(stage["cmd"].encode())
+    for path, value in sorted(inputs.items()):
+        digest.update(f"{path}={value}".encode())
+    return digest.hexdigest(), inputs
+
+
+def up_to_date(stage: dict, key: str, record: dict | None, hashes: HashCache) -> bool:
+    if stage["always"] or not record or record.get("key") != key:
+        return False
+    # Outputs deleted or edited since the recorded run force a rerun too.
+    return all(hashes.path(out) == record["outputs"].get(out) for out in stage["outputs"])
+
+
+def run_stage(stage: dict, log_dir: Path, env: dict) -> tuple[int, float]:
+    log_path = log_dir / f"{stage['name']}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    with log_path.open("w") as log:
+        log.write(f"$ {stage['cmd']}\n")
+        log.flush()
+        proc = subprocess.run(shlex.split(stage["cmd"]), stdout=log, stderr=subprocess.STDOUT, env=env)
+    return proc.returncode, time.perf_counter() - start
+
+
+def critical_path(stages: dict[str, dict], seconds: dict[str, float]) -> tuple[float, list[str]]:
+    """Longest chain of dependent stage durations: the floor on wall time however many workers run."""
+    finish, via = {}, {}
+    for name in topo_order(stages):
+        deps = stages[name]["deps"]
+        prev = max(deps, key=lambda d: finish[d]) if deps else None
+        finish[name] = seconds.get(name, 0.0) + (finish[prev] if prev else 0.0)
+        via[name] = prev
+    end = max(finish, key=finish.get)
+    chain = [end]
+    while via[chain[-1]]:
+        chain.append(via[chain[-1]])
+    return finish[end], chain[::-1]
+
+
+def parse_vars(pairs: list[str]) -> dict[str, str]:
+    out = {}
+    for pair in pairs:
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"--var expects name=value, got {pair!r}")
+        out[name.strip()] = value.strip()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the data -> features -> model -> forecast pipeline as a DAG.")
+    parser.add_argument("--spec", default="", help="JSON with {\"vars\": {...}, \"stages\": [...]} replacing the built-in pipeline.")
+    parser.add_argument("--var", action="append", default=[], help="Override a pipeline variable, e.g. tlc_raw=data/raw/2024.")
+    parser.add_argument("--only", default="", help="Comma-separated stages to run, plus whatever they depend on.")
+    parser.add_argument("--force", default="", help="Comma-separated stages to rerun even when up to date ('all' for every stage).")
+    parser.add_argument("--jobs", type=int, default=2, help="Stages run concurrently (independent branches only).")
+    parser.add_argument("--state", default=STATE_DEFAULT, help="Stage keys, output hashes and the file hash cache.")
+    parser.add_argument("--log-dir", default=LOG_DIR_DEFAULT, help="One log file per stage.")
+    parser.add_argument("--dry-run", action="store_true", help="Print what would run or be skipped.")
+    args = parser.parse_args()
+
+    variables = dict(VARS)
+    spec = PIPELINE
+    if args.spec:
+        custom = json.loads(Path(args.spec).read_text())
+        variables.update(custom.get("vars", {}))
+        spec = custom["stages"]
+    variables.update(parse_vars(args.var))
+    stages = resolve_stages(spec, variables)
+
+    if args.only:
+        wanted = set()
+        pending = [s.strip() for s in args.only.split(",") if s.strip()]
+        while pending:
+            name = pending.pop()
+            if name not in stages:
+                raise SystemExit(f"Unknown stage: {name}")
+            if name not in wanted:
+                wanted.add(name)
+                pending.extend(stages[name]["deps"])
+        stages = {name: stage for name, stage in stages.items() if name in wanted}
+    forced = set(stages) if args.force == "all" else {s.strip() for s in args.force.split(",") if s.strip()}
+
+    state_path = Path(args.state)
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    records = state.get("stages", {})
+    hashes = HashCache(state.get("file_hashes"))
+    env = dict(os.environ)
+
+    order = topo_order(stages)
+    status: dict[str, str] = {}
+    seconds: dict[str, float] = {}
+    running = {}
+    wall_start = time.perf_counter()
+
+    def save_state() -> None:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"stages": records, "file_hashes": hashes.entries, "updated_at": datetime.now(timezone.utc).isoformat()}
+        atomic_write_text(state_path, json.dumps(payload, indent=2))
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while len(status) < len(order):
+            for name in order:
+                if name in status or name in running.values():
+                    continue
+                deps = stages[name]["deps"]
+                if any(status.get(d) in ("failed", "blocked") for d in deps):
+                    status[name] = "blocked"
+                    print(f"[blocked] {name}: upstream failed")
+                    continue
+                if not all(d in status for d in deps) or len(running) >= max(1, args.jobs):
+                    continue
+                if args.dry_run and any(status[d] == "would run" for d in deps):
+                    status[name] = "would run"
+                    print(f"[run]     {name}: after {', '.join(d for d in deps if status[d] == 'would run')}")
+                    continue
+                # Keys are computed only once upstream stages finish, so they see the new outputs.
+                key, _ = stage_key(stages[name], hashes)
+                stages[name]["key"] = key
+                if name not in forced and up_to_date(stages[name], key, records.get(name), hashes):
+                    status[name] = "skipped"
+                    seconds[name] = 0.0
+                    print(f"[skip]    {name}: inputs and parameters unchanged")
+                    continue
+                if args.dry_run:
+                    status[name] = "would run"
+                    print(f"[run]     {name}: {stages[name]['cmd']}")
+                    continue
+                print(f"[start]   {name}")
+                running[pool.submit(run_stage, stages[name], Path(args.log_dir), env)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                code, elapsed = future.result()
+                seconds[name] = elapsed
+                if code != 0:
+                    status[name] = "failed"
+                    print(f"[failed]  {name} (exit {code}, {elapsed:.1f}s) see {Path(args.log_dir) / (name + '.log')}")
+                    continue
+                status[name] = "ran"
+                # Outputs are hashed now so later edits or deletions are detected.
+                records[name] = {
+                    "key": stages[name]["key"],
+                    "outputs": {out: hashes.path(out) for out in stages[name]["outputs"]},
+                    "seconds": elapsed,
+                    "finished_at": datetime.now(timezone.utc).isoformat(),
+                }
+                save_state()
+                print(f"[done]    {name} ({elapsed:.1f}s)")
+    wall_s = time.perf_counter() - wall_start
+    if not args.dry_run:
+        save_state()
+
+    cp_s, chain = critical_path(stages, seconds)
+    print()
+    print(f"{'stage':<26} {'status':<10} {'seconds':>9}  deps")
+    for name in order:
+        print(f"{name:<26} {status[name]:<10} {seconds.get(name, 0.0):>9.1f}  {', '.join(stages[name]['deps'])}")
+    busy_s = sum(seconds.values())
+    print(f"wall: {wall_s:.1f}s  stage time: {busy_s:.1f}s  critical path: {cp_s:.1f}s")
+    print("critical path:", " -> ".join(f"{n} ({seconds.get(n, 0.0):.1f}s)" for n in chain))
+    if any(s in ("failed", "blocked") for s in status.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from forecast_archive import ARCHIVE_DEFAULT, ARCHIVE_PREFIX, MAX_HORIZON_HOURS, archive_start
+from instrumentation import Tracer, add_trace_args, stage
+from zone_lookup import UNKNOWN_BOROUGH, ZONE_LOOKUP_DEFAULT, zone_boroughs
+
+
+ACTUALS_DEFAULT = "data/processed/tlc_hourly_zone.parquet"
+STORE_DEFAULT = "data/monitoring/forecast_accuracy.parquet"
+STATE_KEY = b"accuracy_monitor"
+LEVELS = ["citywide", "borough", "zone", "hours_ahead"]
+SUM_COLS = ["n", "abs_err", "smape", "actual", "pred"]
+SUMMARY_HOURS_AHEAD = [1, 3, 6, 12, 24, 36, 48]
+
+
+def pending_archives(archive_dir: str | Path, watermark: pd.Timestamp | None, latest: pd.Timestamp) -> list[Path]:
+    """Archives that can cover an hour in (watermark, latest]; chosen by file name, nothing is opened."""
+    paths = []
+    for path in sorted(Path(archive_dir).glob(f"{ARCHIVE_PREFIX}*.npz")):
+        try:
+            start = pd.Timestamp(archive_start(path))
+        except ValueError:
+            continue
+        if start > latest:
+            continue
+        if watermark is not None and start + pd.Timedelta(hours=MAX_HORIZON_HOURS) <= watermark:
+            continue
+        paths.append(path)
+    return paths
+
+
+def load_store(path: str | Path) -> tuple[pd.DataFrame, dict]:
+    """Daily sufficient statistics and the monitor state kept in the same file's metadata."""
+    path = Path(path)
+    if not path.exists():
+        empty = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "level": [], "key": []})
+        for col in SUM_COLS:
+            empty[col] = pd.Series(dtype=np.float64)
+        return empty, {"watermark": None, "archives_scored": 0}
+    table = pq.read_table(path)
+    state = json.loads((table.schema.metadata or {}).get(STATE_KEY, b"{}"))
+    state.setdefault("watermark", None)
+    state.setdefault("archives_scored", 0)
+    return table.to_pandas(), state
+
+
+def save_store(path: str | Path, store: pd.DataFrame, state: dict) -> None:
+    """Stats and watermark are committed together by one os.replace, so a crash never double-counts hours."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(store, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), STATE_KEY: json.dumps(state).encode()})
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def load_new_actuals(path: str | Path, watermark: pd.Timestamp | None) -> pd.DataFrame:
+    filters = [("hour", ">", watermark)] if watermark is not None else None
+    df = pd.read_parquet(path, columns=["hour", "PULocationID", "trip_count"], filters=filters)
+    df["hour"] = pd.to_datetime(df["hour"])
+    return df
+
+
+def actual_matrix(actuals: pd.DataFrame) -> tuple[pd.DatetimeIndex, np.ndarray]:
+    """Dense [PULocationID, hour] actual counts over the newly available hours; absent rows are zero trips."""
+    new_hours = pd.DatetimeIndex(np.sort(actuals["hour"].unique()))
+    zones = actuals["PULocationID"].to_numpy(dtype=np.int64)
+    dense = np.zeros((int(zones.max()) + 1, len(new_hours)), dtype=np.float64)
+    np.add.at(dense, (zones, new_hours.get_indexer(actuals["hour"])), actuals["trip_count"].to_numpy(dtype=np.float64))
+    return new_hours, dense
+
+
+def score_archive(path: Path, new_hours: pd.DatetimeIndex, actual: np.ndarray) -> pd.DataFrame | None:
+    """Long frame of per zone-hour errors for the archive's hours that just gained actuals."""
+    with np.load(path) as data:
+        hours = pd.DatetimeIndex(data["hours"])
+        cols = new_hours.get_indexer(hours)
+        scored = np.flatnonzero(cols >= 0)
+        if not scored.size:
+            return None
+        zone_ids = data["zone_ids"].astype(np.int64)
+        pred = data["predictions"][:, scored].astype(np.float64)
+    in_actuals = zone_ids < actual.shape[0]
+    act = np.zeros_like(pred)
+    act[in_actuals] = actual[zone_ids[in_actuals]][:, cols[scored]]
+    abs_err = np.abs(pred - act)
+    denom = np.abs(pred) + np.abs(act)
+    smape = np.divide(2 * abs_err, denom, out=np.zeros_like(abs_err), where=denom > 0)
+    n_zones, n_hours = pred.shape
+    return pd.DataFrame(
+        {
+            "date": np.tile(hours[scored].normalize().to_numpy(), n_zones),
+            "zone": np.repeat(zone_ids, n_hours),
+            "hours_ahead": np.tile(scored + 1, n_zones),
+            "abs_err": abs_err.ravel(),
+            "smape": smape.ravel(),
+            "actual": act.ravel(),
+            "pred": pred.ravel(),
+        }
+    )
+
+
+def daily_stats(errors: pd.DataFrame, boroughs: dict[int, str]) -> pd.DataFrame:
+    """Sum errors per (date, level, key); sums stay additive so later runs merge by adding."""
+    errors["n"] = 1.0
+    errors["citywide"] = "all"
+    errors["borough"] = errors["zone"].map(boroughs).fillna(UNKNOWN_BOROUGH)
+    parts = []
+    for level in LEVELS:
+        grouped = errors.groupby(["date", level], sort=False)[SUM_COLS].sum().reset_index()
+        grouped = grouped.rename(columns={level: "key"})
+        grouped["key"] = grouped["key"].astype(str)
+        grouped.insert(1, "level", level)
+        parts.append(grouped)
+    return pd.concat(parts, ignore_index=True)
+
+
+def merge_stats(store: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    merged = pd.concat([store, new], ignore_index=True) if len(store) else new
+    return merged.groupby(["date", "level", "key"], as_index=False)[SUM_COLS].sum().sort_values(["date", "level", "key"])
+
+
+def accuracy_table(store: pd.DataFrame, since: pd.Timestamp | None = None) -> pd.DataFrame:
+    """MAE / sMAPE / bias per (level, key) over the stored days from `since`."""
+    window = store if since is None else store[store["date"] >= since]
+    sums = window.groupby(["level", "key"], as_index=False)[SUM_COLS].sum()
+    sums["mae"] = sums["abs_err"] / sums["n"]
+    sums["smape"] = sums["smape"] / sums["n"] * 100
+    sums["bias_pct"] = (sums["pred"] - sums["actual"]) / sums["actual"].clip(lower=1) * 100
+    return sums[["level", "key", "n", "mae", "smape", "bias_pct"]]
+
+
+def print_accuracy(table: pd.DataFrame, title: str) -> None:
+    print(title)
+    print(f"  {'level':<12} {'key':<16} {'n':>9} {'MAE':>8} {'sMAPE%':>8} {'bias%':>7}")
+    for level in ["citywide", "borough", "hours_ahead"]:
+        rows = table[table["level"] == level]
+        if level == "hours_ahead":
+            rows = rows[rows["key"].astype(int).isin(SUMMARY_HOURS_AHEAD)]
+            rows = rows.assign(order=rows["key"].astype(int)).sort_values("order")
+        for r in rows.itertuples():
+            print(f"  {r.level:<12} {r.key:<16} {int(r.n):>9} {r.mae:>8.2f} {r.smape:>8.1f} {r.bias_pct:>+7.1f}")
+    zones = table[table["level"] == "zone"].nlargest(5, "mae")
+    for r in zones.itertuples():
+        print(f"  {'worst zone':<12} {r.key:<16} {int(r.n):>9} {r.mae:>8.2f} {r.smape:>8.1f} {r.bias_pct:>+7.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score archived forecasts against newly ingested hourly actuals.")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DEFAULT, help="Archive written by generate_forecast.py.")
+    parser.add_argument("--actuals", default=ACTUALS_DEFAULT, help="Hourly zone counts from ingest_tlc.py.")
+    parser.add_argument("--store", default=STORE_DEFAULT, help="Daily accuracy store (parquet; holds the watermark).")
+    parser.add_argument("--zone-lookup", default=ZONE_LOOKUP_DEFAULT)
+    parser.add_argument("--window-days", type=int, default=7, help="Recent window for the printed summary.")
+    parser.add_argument("--summary-out", default="", help="Optional JSON with recent and all-time accuracy.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("accuracy_monitor", args):
+        store, state = load_store(args.store)
+        watermark = pd.Timestamp(state["watermark"]) if state["watermark"] else None
+        with stage("read actuals") as st:
+            actuals = load_new_actuals(args.actuals, watermark)
+            st.rows_out = len(actuals)
+        if actuals.empty:
+            print("no actuals after watermark", watermark)
+        else:
+            new_hours, actual = actual_matrix(actuals)
+            archives = pending_archives(args.archive_dir, watermark, new_hours[-1])
+            with stage("score archives", rows_in=len(archives)) as st:
+                frames = [f for f in (score_archive(p, new_hours, actual) for p in archives) if f is not None]
+                st.rows_out = sum(len(f) for f in frames)
+            if frames:
+                try:
+                    boroughs = zone_boroughs(args.zone_lookup)
+                except FileNotFoundError as exc:
+                    print(f"{exc}; borough rows are all {UNKNOWN_BOROUGH}")
+                    boroughs = {}
+                with stage("aggregate", rows_in=st.rows_out) as st:
+                    new_stats = daily_stats(pd.concat(frames, ignore_index=True), boroughs)
+                    store = merge_stats(store, new_stats)
+                    st.rows_out = len(store)
+            state = {
+                "watermark": new_hours[-1].isoformat(),
+                "archives_scored": state["archives_scored"] + len(frames),
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }
+            # Hours at or before the watermark are never joined again; late archives for them are ignored.
+            with stage("save store"):
+                save_store(args.store, store, state)
+            scored_cells = sum(len(f) for f in frames)
+            print(f"new actual hours: {len(new_hours)} ({new_hours[0]} to {new_hours[-1]})")
+            print(f"archives scored: {len(frames)} of {len(archives)} candidates  zone-hours: {scored_cells:,}")
+            print("watermark:", state["watermark"])
+
+        if store.empty:
+            print("no scored forecasts yet")
+            return
+        recent_since = store["date"].max() - pd.Timedelta(days=args.window_days - 1)
+        recent = accuracy_table(store, recent_since)
+        print_accuracy(recent, f"last {args.window_days} days (from {recent_since.date()}):")
+        if args.summary_out:
+            summary = {
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "watermark": state["watermark"],
+                "window_days": args.window_days,
+                "recent": recent.to_dict(orient="records"),
+                "all_time": accuracy_table(store).to_dict(orient="records"),
+            }
+            out_path = Path(args.summary_out)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_text(json.dumps(summary, indent=2))
+            print("saved:", out_path)
+
+
+if __name__ == "__main__":
+    main()
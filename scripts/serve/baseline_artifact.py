@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+
+BASELINE_BIN_DEFAULT = "data/serving/baseline_week_hour.bin"
+MAGIC = b"RCBASEL\0"
+FORMAT_VERSION = 1
+WEEK_HOURS = 168
+ALIGN = 64
+# magic, format version, header length
+PREAMBLE = struct.Struct("<8sII")
+
+
+class ServingBaseline:
+    """Dense [zone, week_hour] float32 baseline; cells never seen in training are NaN."""
+
+    def __init__(self, zone_ids: np.ndarray, values: np.ndarray, global_mean: float, header: dict | None = None):
+        self.zone_ids = zone_ids
+        self.values = values
+        self.global_mean = float(global_mean)
+        self.header = header or {}
+
+    def matrix(self) -> np.ndarray:
+        """Serving view with missing cells filled by the global mean (matches the CSV merge + fillna)."""
+        return np.where(np.isnan(self.values), np.float32(self.global_mean), self.values)
+
+    def to_frame(self):
+        import pandas as pd
+
+        zone_idx, week_hour = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame(
+            {
+                "PULocationID": self.zone_ids[zone_idx].astype(np.int64),
+                "week_hour": week_hour.astype(np.int64),
+                "baseline_week_hour_mean": self.values[zone_idx, week_hour].astype(np.float64),
+            }
+        )
+
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+def _layout(header_len: int, n_zones: int) -> tuple[int, int]:
+    zones_offset = PREAMBLE.size + header_len
+    zones_offset += _pad(zones_offset)
+    values_offset = zones_offset + 4 * n_zones
+    values_offset += _pad(values_offset)
+    return zones_offset, values_offset
+
+
+def write_baseline(
+    path: str | Path,
+    zone_ids,
+    values: np.ndarray,
+    global_mean: float,
+    source: str = "",
+) -> dict:
+    zone_ids = np.ascontiguousarray(zone_ids, dtype="<i4")
+    values = np.ascontiguousarray(values, dtype="<f4")
+    if values.shape != (len(zone_ids), WEEK_HOURS):
+        raise ValueError(f"Expected values of shape ({len(zone_ids)}, {WEEK_HOURS}), got {values.shape}.")
+    payload_hash = hashlib.sha256(zone_ids.tobytes() + values.tobytes()).hexdigest()
+    header = {
+        "format_version": FORMAT_VERSION,
+        "n_zones": int(len(zone_ids)),
+        "week_hours": WEEK_HOURS,
+        "baseline_global_mean": float(global_mean),
+        "missing_cells": int(np.isnan(values).sum()),
+        "sha256": payload_hash,
+        "source": source,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    zones_offset, values_offset = _layout(len(header_bytes), len(zone_ids))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            fh.write(header_bytes)
+            fh.write(b"\0" * (zones_offset - fh.tell()))
+            fh.write(zone_ids.tobytes())
+            fh.write(b"\0" * (values_offset - fh.tell()))
+            fh.write(values.tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return header
+
+
+def _read_header(path: str | Path) -> tuple[dict, int]:
+    with open(path, "rb") as fh:
+        magic, version, header_len = PREAMBLE.unpack(fh.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a serving baseline artifact.")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported baseline format version {version} (expected {FORMAT_VERSION}).")
+        return json.loads(fh.read(header_len)), header_len
+
+
+def read_header(path: str | Path) -> dict:
+    return _read_header(path)[0]
+
+
+def load_baseline(path: str | Path = BASELINE_BIN_DEFAULT, verify: bool = True) -> ServingBaseline:
+    """Memory-maps the arrays; verify re-hashes the payload (~0.1 ms for 263 zones)."""
+    header, header_len = _read_header(path)
+    n_zones = header["n_zones"]
+    zones_offset, values_offset = _layout(header_len, n_zones)
+    zone_ids = np.memmap(path, dtype="<i4", mode="r", offset=zones_offset, shape=(n_zones,))
+    values = np.memmap(path, dtype="<f4", mode="r", offset=values_offset, shape=(n_zones, header["week_hours"]))
+    if verify:
+        digest = hashlib.sha256(zone_ids.tobytes() + values.tobytes()).hexdigest()
+        if digest != header["sha256"]:
+            raise ValueError(f"{path}: checksum mismatch ({digest} != {header['sha256']}).")
+    return ServingBaseline(zone_ids, values, header["baseline_global_mean"], header)
+
+
+def dense_from_frame(baseline_lookup, zone_ids) -> np.ndarray:
+    """Long (PULocationID, week_hour, baseline_week_hour_mean) table -> [zone, 168] float32 with NaN gaps."""
+    import pandas as pd
+
+    values = np.full((len(zone_ids), WEEK_HOURS), np.nan, dtype=np.float32)
+    zone_pos = pd.Index(zone_ids).get_indexer(baseline_lookup["PULocationID"])
+    week_hour = baseline_lookup["week_hour"].to_numpy(dtype=np.int64)
+    keep = zone_pos >= 0
+    values[zone_pos[keep], week_hour[keep]] = baseline_lookup["baseline_week_hour_mean"].to_numpy()[keep]
+    return values
@@ -2,8 +2,12 @@ import argparse
 import json
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from baseline_artifact import BASELINE_BIN_DEFAULT, dense_from_frame, load_baseline, write_baseline
+from instrumentation import Tracer, add_trace_args, stage
+
 
 FEATURES_DEFAULT = "data/processed/features_hourly.parquet"
 BASELINE_OUT = "data/serving/baseline_week_hour_mean.csv"
@@ -34,28 +38,61 @@ def build_baseline(df: pd.DataFrame) -> tuple[pd.DataFrame, float, list[int]]:
 def main() -> None:
     parser = argparse.ArgumentParser(description="Build serving baseline artifacts.")
     parser.add_argument("--features-path", default=FEATURES_DEFAULT)
+    parser.add_argument("--bin-out", default=BASELINE_BIN_DEFAULT, help="Binary memory-mapped baseline.")
     parser.add_argument("--baseline-out", default=BASELINE_OUT)
     parser.add_argument("--meta-out", default=META_OUT)
+    parser.add_argument("--export-csv", action="store_true", help="Also write the human-readable CSV + meta JSON.")
+    parser.add_argument(
+        "--from-csv",
+        action="store_true",
+        help="Convert existing --baseline-out / --meta-out files instead of reading features.",
+    )
+    add_trace_args(parser)
     args = parser.parse_args()
 
-    df = pd.read_parquet(args.features_path, columns=["hour", "PULocationID", "trip_count"])
-    baseline, global_mean, zone_ids = build_baseline(df)
+    with Tracer.from_args("build_serving_baseline", args):
+        if args.from_csv:
+            baseline = pd.read_csv(args.baseline_out)
+            meta = json.loads(Path(args.meta_out).read_text())
+            global_mean, zone_ids = float(meta["baseline_global_mean"]), meta["zone_ids"]
+            source = args.baseline_out
+        else:
+            with stage("read features") as st:
+                df = pd.read_parquet(args.features_path, columns=["hour", "PULocationID", "trip_count"])
+                st.rows_out = len(df)
+            with stage("build baseline", rows_in=len(df)) as st:
+                baseline, global_mean, zone_ids = build_baseline(df)
+                st.rows_out = len(baseline)
+            source = args.features_path
 
-    baseline_path = Path(args.baseline_out)
-    baseline_path.parent.mkdir(parents=True, exist_ok=True)
-    baseline.to_csv(baseline_path, index=False)
+        with stage("write binary"):
+            header = write_baseline(args.bin_out, zone_ids, dense_from_frame(baseline, zone_ids), global_mean, source)
+        # Read back through the serving loader so a bad artifact fails here, not in the forecast job.
+        with stage("verify"):
+            loaded = load_baseline(args.bin_out).to_frame()
+        merged = baseline.merge(loaded, on=["PULocationID", "week_hour"], suffixes=("", "_bin"))
+        if len(merged) != len(baseline):
+            raise ValueError(f"Binary baseline has {len(loaded)} cells, expected {len(baseline)}.")
+        max_diff = np.max(np.abs(merged["baseline_week_hour_mean"] - merged["baseline_week_hour_mean_bin"]))
+        size_kib = Path(args.bin_out).stat().st_size / 1024
+        print("saved:", args.bin_out, f"({size_kib:.1f} KiB, sha256 {header['sha256'][:12]})")
+        print(f"float32 round-trip max abs diff: {max_diff:.2e}")
 
-    meta = {
-        "baseline_global_mean": global_mean,
-        "zone_ids": zone_ids,
-    }
-    meta_path = Path(args.meta_out)
-    meta_path.parent.mkdir(parents=True, exist_ok=True)
-    meta_path.write_text(json.dumps(meta, indent=2))
+        if args.export_csv and not args.from_csv:
+            baseline_path = Path(args.baseline_out)
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline.to_csv(baseline_path, index=False)
 
-    print("saved:", baseline_path)
-    print("saved:", meta_path)
-    print("zones:", len(zone_ids))
+            meta = {
+                "baseline_global_mean": global_mean,
+                "zone_ids": zone_ids,
+            }
+            meta_path = Path(args.meta_out)
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            meta_path.write_text(json.dumps(meta, indent=2))
+            print("saved:", baseline_path)
+            print("saved:", meta_path)
+        print("zones:", len(zone_ids))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,290 @@
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+ARRAY_NAMES = [
+    "tree_root",
+    "split_feature",
+    "threshold",
+    "decision",
+    "missing_type",
+    "default_left",
+    "left_child",
+    "right_child",
+    "cat_offset",
+    "cat_nwords",
+    "cat_bits",
+    "leaf_value",
+]
+
+# Node decision / missing-value codes, mirroring LightGBM's tree semantics.
+DECISION_NUMERICAL = 0
+DECISION_CATEGORICAL = 1
+MISSING_CODES = {"None": 0, "Zero": 1, "NaN": 2}
+ZERO_THRESHOLD = 1e-35
+
+IDENTITY_OBJECTIVES = {"regression", "regression_l1", "huber", "fair", "quantile", "mape"}
+EXP_OBJECTIVES = {"poisson", "gamma", "tweedie"}
+
+# Rows x trees evaluated per chunk; keeps the node-index matrix around 32 MB.
+CELLS_PER_CHUNK = 4_000_000
+
+
+def _is_categorical_info(info) -> bool:
+    # LightGBM >= 4 dumps {"min_value", "max_value", "values"}; older versions dump "[min:max]" or "a:b:c".
+    if isinstance(info, dict):
+        return bool(info.get("values"))
+    return info not in ("none", "") and not str(info).startswith("[")
+
+
+def _category_bitset(threshold: str) -> np.ndarray:
+    cats = np.array([int(c) for c in str(threshold).split("||")], dtype=np.int64)
+    words = np.zeros(int(cats.max()) // 32 + 1, dtype=np.uint32)
+    np.bitwise_or.at(words, cats // 32, (np.uint32(1) << (cats % 32).astype(np.uint32)))
+    return words
+
+
+def compile_booster(booster) -> tuple[dict[str, np.ndarray], dict]:
+    """Flatten a LightGBM booster into node/leaf arrays plus a JSON-safe header."""
+    dump = booster.dump_model()
+    objective = str(dump.get("objective", "regression")).split()[0]
+    if dump.get("num_class", 1) != 1:
+        raise ValueError("Only single-output boosters can be compiled.")
+    if objective not in IDENTITY_OBJECTIVES | EXP_OBJECTIVES:
+        raise ValueError(f"Unsupported objective for compiled inference: {objective}")
+
+    split_feature: list[int] = []
+    threshold: list[float] = []
+    decision: list[int] = []
+    missing_type: list[int] = []
+    default_left: list[bool] = []
+    left_child: list[int] = []
+    right_child: list[int] = []
+    cat_offset: list[int] = []
+    cat_nwords: list[int] = []
+    cat_words: list[np.ndarray] = []
+    leaf_value: list[float] = []
+    tree_root: list[int] = []
+    n_cat_words = 0
+
+    def add(node: dict) -> int:
+        nonlocal n_cat_words
+        if "leaf_value" in node:
+            leaf_value.append(float(node["leaf_value"]))
+            return -len(leaf_value)
+
+        idx = len(split_feature)
+        split_feature.append(int(node["split_feature"]))
+        missing_type.append(MISSING_CODES[node.get("missing_type", "None")])
+        default_left.append(bool(node.get("default_left", False)))
+        if node["decision_type"] == "==":
+            words = _category_bitset(node["threshold"])
+            decision.append(DECISION_CATEGORICAL)
+            threshold.append(0.0)
+            cat_offset.append(n_cat_words)
+            cat_nwords.append(len(words))
+            cat_words.append(words)
+            n_cat_words += len(words)
+        else:
+            decision.append(DECISION_NUMERICAL)
+            threshold.append(float(node["threshold"]))
+            cat_offset.append(0)
+            cat_nwords.append(0)
+        left_child.append(0)
+        right_child.append(0)
+        left_child[idx] = add(node["left_child"])
+        right_child[idx] = add(node["right_child"])
+        return idx
+
+    for tree in dump["tree_info"]:
+        tree_root.append(add(tree["tree_structure"]))
+
+    arrays = {
+        "tree_root": np.array(tree_root, dtype=np.int32),
+        "split_feature": np.array(split_feature, dtype=np.int32),
+        "threshold": np.array(threshold, dtype=np.float64),
+        "decision": np.array(decision, dtype=np.uint8),
+        "missing_type": np.array(missing_type, dtype=np.uint8),
+        "default_left": np.array(default_left, dtype=np.bool_),
+        "left_child": np.array(left_child, dtype=np.int32),
+        "right_child": np.array(right_child, dtype=np.int32),
+        "cat_offset": np.array(cat_offset, dtype=np.int32),
+        "cat_nwords": np.array(cat_nwords, dtype=np.int32),
+        "cat_bits": (
+            np.concatenate(cat_words) if cat_words else np.zeros(0, dtype=np.uint32)
+        ).astype(np.uint32),
+        "leaf_value": np.array(leaf_value, dtype=np.float64),
+    }
+
+    feature_names = list(dump["feature_names"])
+    cat_features = [
+        i for i, info in enumerate(dump.get("feature_infos", {}).get(name, "") for name in feature_names)
+        if _is_categorical_info(info)
+    ]
+    pandas_categorical = dump.get("pandas_categorical")
+    categories = None
+    if pandas_categorical:
+        categories = {feature_names[i]: list(cats) for i, cats in zip(cat_features, pandas_categorical)}
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "objective": objective,
+        "feature_names": feature_names,
+        "categorical_features": [feature_names[i] for i in cat_features],
+        "categories": categories,
+        "num_trees": len(tree_root),
+        "num_nodes": len(split_feature),
+        "num_leaves": len(leaf_value),
+    }
+    return arrays, meta
+
+
+def save_compiled(arrays: dict[str, np.ndarray], meta: dict, out_dir: Path) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(out_dir / f"{name}.npy", arrays[name])
+    (out_dir / META_FILE).write_text(json.dumps(meta, indent=2, default=str))
+
+
+class CompiledModel:
+    """Vectorized NumPy evaluator over arrays produced by `compile_booster`."""
+
+    def __init__(self, arrays: dict[str, np.ndarray], meta: dict):
+        self.meta = meta
+        self.feature_names: list[str] = meta["feature_names"]
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+        self._exp_output = meta["objective"] in EXP_OBJECTIVES
+
+        # Per-node routing for missing values, precomputed so the hot loop only gathers.
+        numerical = self.decision == DECISION_NUMERICAL
+        missing = self.missing_type
+        nan_as_zero = numerical & (missing == MISSING_CODES["None"])
+        self._nan_left = np.where(nan_as_zero, 0.0 <= self.threshold, numerical & self.default_left)
+        self._zero_default = numerical & (missing == MISSING_CODES["Zero"])
+        self._has_zero_missing = bool(self._zero_default.any())
+        self._has_categorical = bool((~numerical).any())
+        self._category_index: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for name, cats in (meta.get("categories") or {}).items():
+            values = np.asarray(cats)
+            order = np.argsort(values, kind="stable")
+            self._category_index[name] = (values[order], order)
+
+    def _encode_column(self, name: str, values) -> np.ndarray:
+        col = np.asarray(values)
+        if name not in self._category_index:
+            return col.astype(np.float64, copy=False)
+        # Same remapping LightGBM applies to pandas categoricals: value -> training code, unseen -> NaN.
+        sorted_cats, order = self._category_index[name]
+        pos = np.searchsorted(sorted_cats, col)
+        pos_clipped = np.minimum(pos, len(sorted_cats) - 1)
+        found = (pos < len(sorted_cats)) & (sorted_cats[pos_clipped] == col)
+        return np.where(found, order[pos_clipped], np.nan).astype(np.float64)
+
+    def encode(self, X) -> np.ndarray:
+        """Build the float64 feature matrix from a DataFrame or a mapping of columns."""
+        if isinstance(X, np.ndarray):
+            return np.ascontiguousarray(X, dtype=np.float64)
+        columns = []
+        for name in self.feature_names:
+            col = X[name]
+            if hasattr(col, "cat"):
+                numeric = col.cat.categories.dtype.kind in "iuf"
+                col = col.to_numpy(dtype=np.float64 if numeric else object, na_value=np.nan)
+            columns.append(self._encode_column(name, col))
+        return np.column_stack(columns) if columns else np.zeros((0, 0))
+
+    def _predict_chunk(self, Xc: np.ndarray) -> np.ndarray:
+        n_rows, n_features = Xc.shape
+        n_trees = len(self.tree_root)
+        x_flat = Xc.ravel()
+        cur = np.tile(self.tree_root, n_rows)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        active = np.flatnonzero(cur >= 0)
+        while active.size:
+            nodes = cur[active]
+            fval = x_flat[row_base[active] + self.split_feature[nodes]]
+            go_left = fval <= self.threshold[nodes]
+
+            is_nan = np.isnan(fval)
+            if is_nan.any():
+                go_left[is_nan] = self._nan_left[nodes[is_nan]]
+            if self._has_zero_missing:
+                use_default = self._zero_default[nodes] & (np.abs(fval) <= ZERO_THRESHOLD)
+                go_left[use_default] = self.default_left[nodes[use_default]]
+
+            if self._has_categorical:
+                cat_mask = self.decision[nodes] == DECISION_CATEGORICAL
+                if cat_mask.any():
+                    go_left[cat_mask] = self._category_decision(nodes[cat_mask], fval[cat_mask])
+
+            nxt = np.where(go_left, self.left_child[nodes], self.right_child[nodes])
+            cur[active] = nxt
+            active = active[nxt >= 0]
+
+        leaves = (-cur - 1).reshape(n_rows, n_trees)
+        return self.leaf_value[leaves].sum(axis=1)
+
+    def _category_decision(self, nodes: np.ndarray, fval: np.ndarray) -> np.ndarray:
+        # NaN and negative codes go right; otherwise left iff the code's bit is set.
+        ok = ~np.isnan(fval)
+        code = np.where(ok, fval, -1).astype(np.int64)
+        word = code >> 5
+        ok &= (code >= 0) & (word < self.cat_nwords[nodes])
+        bits = np.zeros(len(nodes), dtype=np.uint32)
+        bits[ok] = self.cat_bits[self.cat_offset[nodes[ok]] + word[ok]]
+        shift = np.where(ok, code & 31, 0).astype(np.uint32)
+        return ok & (((bits >> shift) & np.uint32(1)) == 1)
+
+    def predict(self, X) -> np.ndarray:
+        Xc = self.encode(X)
+        chunk = max(1, CELLS_PER_CHUNK // max(1, len(self.tree_root)))
+        raw = np.empty(Xc.shape[0], dtype=np.float64)
+        for start in range(0, Xc.shape[0], chunk):
+            raw[start : start + chunk] = self._predict_chunk(Xc[start : start + chunk])
+        return np.exp(raw) if self._exp_output else raw
+
+
+def load_compiled(model_dir: str | Path, mmap: bool = True) -> CompiledModel:
+    model_dir = Path(model_dir)
+    meta = json.loads((model_dir / META_FILE).read_text())
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compiled model version in {model_dir}: {meta.get('format_version')}")
+    mode = "r" if mmap else None
+    arrays = {name: np.load(model_dir / f"{name}.npy", mmap_mode=mode) for name in ARRAY_NAMES}
+    model = CompiledModel(arrays, meta)
+    # Where the arrays came from, so caches can key on what is actually served.
+    model.model_dir = model_dir
+    return model
+
+
+def default_compiled_dir(model_path: str | Path) -> Path:
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + "_compiled")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile a LightGBM text model into NumPy tree arrays.")
+    parser.add_argument("--model-path", required=True, help="LightGBM text model path.")
+    parser.add_argument("--out-dir", default="", help="Output directory (default: <model>_compiled).")
+    args = parser.parse_args()
+
+    import lightgbm as lgb
+
+    booster = lgb.Booster(model_file=args.model_path)
+    arrays, meta = compile_booster(booster)
+    out_dir = Path(args.out_dir) if args.out_dir else default_compiled_dir(args.model_path)
+    save_compiled(arrays, meta, out_dir)
+
+    print("saved:", out_dir)
+    print("trees:", meta["num_trees"], "nodes:", meta["num_nodes"], "leaves:", meta["num_leaves"])
+    print("categorical:", meta["categorical_features"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+TOP_K_DEFAULT = 3
+BATCH_ROWS_DEFAULT = 4096
+BUDGET_MS_DEFAULT = 1500
+PROBE_ROWS = 64
+VALUE_DECIMALS = 4
+
+
+def contribution_boosters(model, model_path: str) -> tuple[object, str]:
+    """(booster or ShardedModel of boosters, source) able to run pred_contrib for the served model.
+
+    Compiled tree arrays carry no contribution path, so their source LightGBM file is loaded instead;
+    it encodes the same trees, so the contributions add up to the served predictions.
+    """
+    if hasattr(model, "models") or hasattr(model, "num_trees"):
+        return model, "served model"
+    import lightgbm as lgb
+
+    return lgb.Booster(model_file=model_path), f"{Path(model_path).name} (compiled model source)"
+
+
+def _predict_contrib(booster, X, threads: int) -> np.ndarray:
+    if hasattr(booster, "models"):
+        # Sharded: every shard shares the feature layout, only the trees (and bias) differ.
+        zones = np.asarray(X["PULocationID"], dtype=np.float64).astype(np.int64)
+        shards = booster.route(zones)
+        out = None
+        for shard in np.unique(shards):
+            idx = np.flatnonzero(shards == shard)
+            part = booster.models[shard].predict(X.iloc[idx], pred_contrib=True, num_threads=threads)
+            if out is None:
+                out = np.empty((len(X), part.shape[1]), dtype=np.float64)
+            out[idx] = part
+        return out
+    return booster.predict(X, pred_contrib=True, num_threads=threads)
+
+
+def top_contributions(
+    booster,
+    X,
+    priority: np.ndarray,
+    k: int = TOP_K_DEFAULT,
+    batch_rows: int = BATCH_ROWS_DEFAULT,
+    threads: int = 0,
+    budget_s: float = BUDGET_MS_DEFAULT / 1000,
+    started: float | None = None,
+) -> dict:
+    """Top-k features by |log-space contribution| per row, computed in batches under a time budget.
+
+    Rows are explained in `priority` order (highest first); rows the budget cannot pay for keep feature
+    index -1, so a slow host or a large model degrades to explaining only the busiest zone-hours.
+    `started` (a time.perf_counter() value) is when the budget began; callers pass it so loading the
+    booster and building X count against the budget too. No rows are explained once it is spent.
+    """
+    threads = threads or os.cpu_count() or 1
+    n_rows = len(priority)
+    order = np.argsort(-np.asarray(priority, dtype=np.float64), kind="stable")
+    result = unexplained(n_rows, k, threads)
+    features, values, bias = result["features"], result["values"], result["bias"]
+    start = time.perf_counter() if started is None else started
+    explained = 0
+    # TreeSHAP cost per row depends on tree count, leaves and depth, so a small probe batch measures it
+    # and later batches are sized to what the remaining budget can still pay for.
+    size = min(PROBE_ROWS, batch_rows) if time.perf_counter() - start < budget_s else 0
+    while explained < n_rows and size > 0:
+        idx = order[explained : explained + size]
+        batch_start = time.perf_counter()
+        contrib = _predict_contrib(booster, X.iloc[idx], threads)
+        row_s = (time.perf_counter() - batch_start) / len(idx)
+        # Last column is the expected value (bias); the rest line up with the feature columns.
+        feat = contrib[:, :-1]
+        top = np.argpartition(-np.abs(feat), min(k, feat.shape[1] - 1), axis=1)[:, :k]
+        top_vals = np.take_along_axis(feat, top, axis=1)
+        rank = np.argsort(-np.abs(top_vals), axis=1)
+        features[idx] = np.take_along_axis(top, rank, axis=1)
+        values[idx] = np.take_along_axis(top_vals, rank, axis=1)
+        bias[idx] = contrib[:, -1]
+        explained += len(idx)
+        remaining_s = budget_s - (time.perf_counter() - start)
+        size = min(batch_rows, int(remaining_s / max(row_s, 1e-9)))
+    return {
+        **result,
+        "rows_explained": explained,
+        "truncated": explained < n_rows,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def unexplained(n_rows: int, k: int = TOP_K_DEFAULT, threads: int = 0) -> dict:
+    """top_contributions result with no row explained, for when setup already spent the budget."""
+    return {
+        "features": np.full((n_rows, k), -1, dtype=np.int16),
+        "values": np.zeros((n_rows, k), dtype=np.float32),
+        "bias": np.full(n_rows, np.nan, dtype=np.float32),
+        "rows_explained": 0,
+        "truncated": n_rows > 0,
+        "seconds": 0.0,
+        "threads": threads or os.cpu_count() or 1,
+    }
+
+
+def contrib_path(out_path: str | Path) -> Path:
+    out_path = Path(out_path)
+    return out_path.with_name(out_path.stem + "_contrib.json")
+
+
+def contrib_payload(header: dict, hours: list[str], zone_ids, feature_cols: list[str], result: dict) -> dict:
+    """Zone-major like the columnar forecast: top_features[z][h * k + j] is zone z, hour h, rank j.
+
+    Values are log1p-space contributions; bias[z] plus all of a row's contributions (not just the top k)
+    is its raw prediction.
+    """
+    n_zones, n_hours = len(zone_ids), len(hours)
+    k = result["features"].shape[1]
+    # Rows of a zone share one model (and so one bias); unexplained rows are NaN.
+    zone_bias = [
+        next((round(float(b), VALUE_DECIMALS) for b in row if np.isfinite(b)), None)
+        for row in result["bias"].reshape(n_zones, n_hours)
+    ]
+    return {
+        **header,
+        "format": "contrib_top_k",
+        "k": k,
+        "features": list(feature_cols),
+        "hours": hours,
+        "zones": [int(z) for z in zone_ids],
+        "bias": zone_bias,
+        "top_features": result["features"].reshape(n_zones, n_hours * k).tolist(),
+        "top_values": np.round(result["values"].reshape(n_zones, n_hours * k).astype(np.float64), VALUE_DECIMALS).tolist(),
+    }
+
+
+def write_contributions(out_path: str | Path, payload: dict) -> Path:
+    path = contrib_path(out_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(json.dumps(payload, separators=(",", ":")).encode())
+    return path
@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+
+ARCHIVE_DEFAULT = "data/forecast/archive"
+ARCHIVE_PREFIX = "forecast_"
+ARCHIVE_TIME_FORMAT = "%Y%m%dT%H"
+# Open-Meteo serves at most 16 days, so no archived forecast reaches further than this past its first
+# hour: an archive whose start is this far before an hour cannot cover it, which lets readers skip
+# files by name without opening them.
+MAX_HORIZON_HOURS = 16 * 24
+
+
+def archive_forecast(
+    archive_dir: str | Path,
+    header: dict,
+    hours,
+    zone_ids: np.ndarray,
+    matrix: np.ndarray,
+    model_matrix: np.ndarray | None = None,
+    keep_days: float = 0,
+) -> Path:
+    """Compact copy of a served forecast for later scoring, keyed by its first (local) target hour.
+
+    Hours are stored as naive local time, the same clock as the TLC pickup timestamps. A rerun for the
+    same origin replaces the earlier file. When the served matrix was nowcast-corrected, model_matrix
+    keeps the uncorrected model output so nowcast.py measures residuals against the model itself.
+    keep_days > 0 also deletes archives that start more than keep_days before this one.
+    """
+    local_hours = np.array([h.replace(tzinfo=None) for h in hours], dtype="datetime64[s]")
+    first = local_hours[0].astype(datetime)
+    path = Path(archive_dir) / f"{ARCHIVE_PREFIX}{first.strftime(ARCHIVE_TIME_FORMAT)}.npz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {k: header.get(k) for k in ("generated_at", "timezone", "model_run_id", "weather_source")}
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        arrays = {
+            "hours": local_hours,
+            "zone_ids": np.asarray(zone_ids, dtype=np.int32),
+            "predictions": np.asarray(matrix, dtype=np.int32),
+            "meta": np.array(json.dumps(meta)),
+        }
+        if model_matrix is not None:
+            arrays["model_predictions"] = np.asarray(model_matrix, dtype=np.int32)
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    if keep_days > 0:
+        prune_archives(archive_dir, first - timedelta(days=keep_days))
+    return path
+
+
+def prune_archives(archive_dir: str | Path, before: datetime) -> list[Path]:
+    """Delete archives starting before `before` (naive local); chosen by file name, nothing is opened."""
+    removed = []
+    for path in Path(archive_dir).glob(f"{ARCHIVE_PREFIX}*.npz"):
+        try:
+            start = archive_start(path)
+        except ValueError:
+            continue
+        if start < before:
+            path.unlink(missing_ok=True)
+            removed.append(path)
+    return sorted(removed)
+
+
+def archive_start(path: Path) -> datetime:
+    return datetime.strptime(path.stem[len(ARCHIVE_PREFIX) :], ARCHIVE_TIME_FORMAT)
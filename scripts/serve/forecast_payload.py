@@ -0,0 +1,187 @@
+import gzip
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+PAYLOAD_FORMATS = ("columnar", "rows")
+COMPRESSIONS = ("gzip", "brotli")
+SUMMARY_TOP_K_DEFAULT = 5
+
+
+def forecast_summary(zone_ids, matrix: np.ndarray, zone_borough: dict[int, str] | None, k: int = SUMMARY_TOP_K_DEFAULT) -> dict:
+    """Per-hour rankings and totals computed once here, so clients index instead of aggregate.
+
+    top_zones[h] / top_predictions[h] are hour h's k busiest zones, highest first;
+    borough_totals[b][h] follows `boroughs`; max_prediction spans every zone-hour (color scale).
+    """
+    zone_ids = np.asarray(zone_ids)
+    k = min(k, len(zone_ids))
+    by_hour = matrix.T
+    # argpartition picks each hour's top k in O(zones); only those k are then sorted.
+    top = np.argpartition(-by_hour, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(by_hour, top, axis=1), axis=1, kind="stable"), axis=1)
+    summary = {
+        "top_k": k,
+        "top_zones": zone_ids[top].astype(int).tolist(),
+        "top_predictions": np.take_along_axis(by_hour, top, axis=1).tolist(),
+        "citywide_totals": matrix.sum(axis=0).tolist(),
+        "hour_max": matrix.max(axis=0).tolist(),
+        "max_prediction": int(matrix.max()),
+        "boroughs": None,
+        "borough_totals": None,
+    }
+    if zone_borough is not None:
+        names, codes = np.unique([zone_borough.get(int(z), "Unknown") for z in zone_ids], return_inverse=True)
+        totals = np.zeros((len(names), matrix.shape[1]), dtype=matrix.dtype)
+        np.add.at(totals, codes.ravel(), matrix)
+        summary["boroughs"] = names.tolist()
+        summary["borough_totals"] = totals.tolist()
+    return summary
+
+
+def hour_summary(summary: dict, h: int) -> dict:
+    """Hour h's slice of forecast_summary, for per-hour shards."""
+    out = {
+        "top_zones": summary["top_zones"][h],
+        "top_predictions": summary["top_predictions"][h],
+        "citywide_total": summary["citywide_totals"][h],
+        "hour_max": summary["hour_max"][h],
+        "max_prediction": summary["max_prediction"],
+    }
+    if summary["boroughs"] is not None:
+        out["boroughs"] = summary["boroughs"]
+        out["borough_totals"] = [row[h] for row in summary["borough_totals"]]
+    return out
+
+
+def columnar_payload(
+    header: dict, hours: list[str], zone_ids, matrix: np.ndarray, bounds=None, summary: dict | None = None
+) -> dict:
+    """hours + zones + a zones x hours integer matrix; predictions[z][h] is zone z at hour h."""
+    payload = {
+        **header,
+        "format": "columnar",
+        "hours": hours,
+        "zones": [int(z) for z in zone_ids],
+        "predictions": matrix.tolist(),
+    }
+    if bounds is not None:
+        payload["p10"] = bounds[0].tolist()
+        payload["p90"] = bounds[1].tolist()
+    if summary is not None:
+        payload["summary"] = summary
+    return payload
+
+
+def row_payload(
+    header: dict, hours: list[str], zone_ids, matrix: np.ndarray, bounds=None, summary: dict | None = None
+) -> dict:
+    """Legacy format: one {hour, PULocationID, prediction} object per zone-hour, zone-major."""
+    rows = []
+    for z, zone in enumerate(zone_ids):
+        for h, hour in enumerate(hours):
+            row = {"hour": hour, "PULocationID": int(zone), "prediction": int(matrix[z, h])}
+            if bounds is not None:
+                row["p10"] = int(bounds[0][z, h])
+                row["p90"] = int(bounds[1][z, h])
+            rows.append(row)
+    payload = {**header, "predictions": rows}
+    if summary is not None:
+        payload["summary"] = summary
+    return payload
+
+
+def dumps(payload: dict, fmt: str) -> bytes:
+    # The row format keeps its historical pretty-printing; the columnar format is written compact.
+    if fmt == "rows":
+        return json.dumps(payload, indent=2).encode()
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def write_hour_shards(
+    out_dir: str | Path, header: dict, hours: list[str], zone_ids, matrix, bounds=None, summary: dict | None = None
+) -> list[Path]:
+    """One small file per hour plus index.json, so a client fetches only the hour it shows."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    zones = [int(z) for z in zone_ids]
+    paths = []
+    for h, hour in enumerate(hours):
+        shard = {"hour": hour, "zones": zones, "predictions": matrix[:, h].tolist()}
+        if bounds is not None:
+            shard["p10"] = bounds[0][:, h].tolist()
+            shard["p90"] = bounds[1][:, h].tolist()
+        if summary is not None:
+            shard["summary"] = hour_summary(summary, h)
+        path = out_dir / f"hour_{h:03d}.json"
+        path.write_bytes(json.dumps(shard, separators=(",", ":")).encode())
+        paths.append(path)
+    index = {**header, "hours": hours, "files": [p.name for p in paths]}
+    index_path = out_dir / "index.json"
+    index_path.write_text(json.dumps(index, separators=(",", ":")))
+    return [index_path] + paths
+
+
+def resolve_compressions(spec: str) -> list[str]:
+    """Parse a comma-separated list; brotli is dropped (with one notice) when the package is missing."""
+    methods = [m.strip() for m in spec.split(",") if m.strip()]
+    for method in methods:
+        if method not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {method} (expected one of {', '.join(COMPRESSIONS)})")
+    if "brotli" in methods:
+        try:
+            import brotli  # noqa: F401
+        except ImportError:
+            print("brotli not installed; skipping .br output")
+            methods.remove("brotli")
+    return methods
+
+
+def write_compressed(path: str | Path, data: bytes, methods) -> list[Path]:
+    """Precompressed siblings (<name>.gz, <name>.br) for static hosts that serve them directly."""
+    path = Path(path)
+    written = []
+    for method in methods:
+        if method == "gzip":
+            out = path.with_name(path.name + ".gz")
+            out.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+        elif method == "brotli":
+            import brotli
+
+            out = path.with_name(path.name + ".br")
+            out.write_bytes(brotli.compress(data, quality=11))
+        else:
+            raise ValueError(f"Unknown compression: {method}")
+        written.append(out)
+    return written
+
+
+def parse_seconds(data: bytes, repeats: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        json.loads(data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def size_report(paths) -> list[dict]:
+    """Byte size of every written file and, for plain JSON, its best-of-5 json.loads time."""
+    report = []
+    for path in paths:
+        path = Path(path)
+        entry = {"path": str(path), "bytes": path.stat().st_size}
+        if path.suffix == ".json":
+            entry["parse_ms"] = parse_seconds(path.read_bytes()) * 1000
+        report.append(entry)
+    return report
+
+
+def print_report(report: list[dict]) -> None:
+    print(f"{'file':<56} {'bytes':>10} {'parse_ms':>9}")
+    for entry in report:
+        parse = f"{entry['parse_ms']:>9.2f}" if "parse_ms" in entry else f"{'':>9}"
+        print(f"{entry['path']:<56} {entry['bytes']:>10} {parse}")
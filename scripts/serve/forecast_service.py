@@ -0,0 +1,321 @@
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+from forecast_payload import (
+    PAYLOAD_FORMATS,
+    SUMMARY_TOP_K_DEFAULT,
+    columnar_payload,
+    dumps,
+    forecast_summary,
+    hour_summary,
+    row_payload,
+)
+from generate_forecast import (
+    BASELINE_BIN_DEFAULT,
+    BASELINE_DEFAULT,
+    BASELINE_META_DEFAULT,
+    FEATURES_DEFAULT,
+    HORIZON_DEFAULT,
+    INTERVALS_DEFAULT,
+    REGISTRY_DEFAULT,
+    TIMEZONE_DEFAULT,
+    add_backend_arg,
+    add_weather_args,
+    baseline_matrix,
+    interval_bounds,
+    interval_summary,
+    load_serving_baseline,
+    load_weather,
+    next_top_of_hour,
+    predict_grid,
+    resolve_model,
+    to_counts,
+    weather_client_from_args,
+)
+from nowcast import NOWCAST_DEFAULT, NowcastState, apply_nowcast
+from zone_lookup import ZONE_LOOKUP_DEFAULT, zone_boroughs
+
+
+class ForecastState:
+    """Model, baseline and zone list stay resident; the forecast grid is rebuilt once per hour or model change.
+
+    Prediction, nowcast, intervals and payloads go through the same helpers as generate_forecast.py,
+    so /forecast matches forecast_latest.json for the same model and hour.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.lock = threading.Lock()
+        baseline, self.global_mean, self.zone_ids, self.baseline_source = load_serving_baseline(
+            args.baseline_path, args.baseline_meta, args.features_path, args.baseline_bin
+        )
+        self.baseline = baseline_matrix(baseline, self.zone_ids, self.global_mean)
+        self.intervals = None
+        if args.intervals and Path(args.intervals).exists():
+            from intervals import load_intervals
+
+            self.intervals = load_intervals(args.intervals)
+        self.boroughs = None
+        if args.summary_top_k > 0:
+            try:
+                self.boroughs = zone_boroughs(args.zone_lookup)
+            except FileNotFoundError as exc:
+                print(f"{exc}; summary has no borough totals")
+        self.weather_client, self.weather_points = weather_client_from_args(args)
+        self.registry_mtime = self._registry_mtime()
+        self._load_model()
+        self.forecast: dict | None = None
+
+    def _registry_mtime(self) -> float:
+        path = Path(self.args.registry)
+        return path.stat().st_mtime if path.exists() else 0.0
+
+    def _load_model(self) -> None:
+        start = time.perf_counter()
+        model, backend, run_id, model_path = resolve_model(
+            self.args.model_path,
+            self.args.registry,
+            self.args.compiled_model,
+            self.args.shard_router,
+            backend=self.args.backend,
+        )
+        with self.lock:
+            self.model, self.backend, self.run_id, self.model_path = model, backend, run_id, model_path
+            self.forecast = None
+        print(f"model loaded: {model_path} ({backend}, run {run_id}) in {time.perf_counter() - start:.3f}s")
+
+    def maybe_reload(self) -> bool:
+        mtime = self._registry_mtime()
+        if mtime == self.registry_mtime:
+            return False
+        from model_registry import resolve_stage
+
+        try:
+            entry = resolve_stage(registry_path=self.args.registry)
+            if entry is None or entry["run_id"] == self.run_id or self.args.model_path or self.args.shard_router:
+                self.registry_mtime = mtime
+                return False
+            self._load_model()
+        except Exception as exc:
+            # The mtime is only recorded after a good load, so the next poll retries (e.g. once a
+            # half-written model directory is complete); until then the old model keeps serving.
+            print(f"reload failed, still serving run {self.run_id}: {exc}")
+            return False
+        self.registry_mtime = mtime
+        return True
+
+    def current(self) -> dict:
+        start_hour = next_top_of_hour(datetime.now(ZoneInfo(self.args.timezone)))
+        forecast = self.forecast
+        if forecast is not None and forecast["start_hour"] == start_hour:
+            return forecast
+        with self.lock:
+            if self.forecast is None or self.forecast["start_hour"] != start_hour:
+                self.forecast = self._compute(start_hour)
+            return self.forecast
+
+    def _compute(self, start_hour: datetime) -> dict:
+        start = time.perf_counter()
+        args = self.args
+        weather, weather_info = load_weather(
+            start_hour,
+            args.horizon_hours,
+            args.timezone,
+            dummy=args.dummy_weather,
+            client=self.weather_client,
+            points=self.weather_points,
+            frame=False,
+        )
+        zone_ids = self.zone_ids
+        pred_log = predict_grid(self.model, zone_ids, weather, self.baseline, self.global_mean)
+        nowcast_meta = None
+        # The state file is rewritten by nowcast.py every hour, so it is re-read for each new forecast.
+        if args.nowcast_state and Path(args.nowcast_state).exists():
+            pred_log, nowcast_meta = apply_nowcast(
+                pred_log, zone_ids, weather["hour"][0], NowcastState.load(args.nowcast_state)
+            )
+        n_zones, n_hours = pred_log.shape
+        # Zone-major [zone, hour]: every endpoint is a slice of this matrix.
+        matrix = to_counts(pred_log)
+        bounds = None
+        if self.intervals is not None:
+            bounds = interval_bounds(self.intervals, zone_ids, weather["hour"], pred_log)
+        summary = None
+        if args.summary_top_k > 0:
+            summary = forecast_summary(zone_ids, matrix, self.boroughs, args.summary_top_k)
+        hours = [ts.isoformat() for ts in weather["hour"]]
+        header = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "timezone": args.timezone,
+            "horizon_hours": args.horizon_hours,
+            "zone_count": int(n_zones),
+            "prediction_count": int(n_zones * n_hours),
+            "model_path": self.model_path,
+            "model_backend": self.backend,
+            "model_run_id": self.run_id,
+            "weather_source": weather_info["source"],
+            "weather_stale": weather_info["stale"],
+            "baseline_source": self.baseline_source,
+            "intervals": interval_summary(self.intervals) if self.intervals is not None else None,
+            "nowcast": nowcast_meta,
+        }
+        build_payload = row_payload if args.format == "rows" else columnar_payload
+
+        def body(extra: dict, hour_idx: slice, zone_idx: slice, part_summary=None) -> bytes:
+            part_bounds = None if bounds is None else (bounds[0][zone_idx, hour_idx], bounds[1][zone_idx, hour_idx])
+            payload = build_payload(
+                {**header, **extra},
+                hours[hour_idx],
+                zone_ids[zone_idx],
+                matrix[zone_idx, hour_idx],
+                part_bounds,
+                part_summary,
+            )
+            return dumps(payload, args.format)
+
+        everything = slice(None)
+        forecast = {
+            "start_hour": start_hour,
+            "hours": hours,
+            "hour_pos": {h: i for i, h in enumerate(hours)},
+            # Pre-render every response body once; requests are then dictionary lookups.
+            "full_body": body({}, everything, everything, summary),
+            "hour_bodies": [
+                body(
+                    {"hour": hours[h]},
+                    slice(h, h + 1),
+                    everything,
+                    hour_summary(summary, h) if summary is not None else None,
+                )
+                for h in range(n_hours)
+            ],
+            "zone_bodies": {
+                int(zone): body({"PULocationID": int(zone)}, everything, slice(z, z + 1))
+                for z, zone in enumerate(zone_ids)
+            },
+        }
+        print(f"forecast computed for {hours[0]} in {time.perf_counter() - start:.3f}s")
+        return forecast
+
+    def hour(self, key: str) -> bytes | None:
+        forecast = self.current()
+        h = int(key) if key.isdigit() else forecast["hour_pos"].get(key)
+        if h is None or not 0 <= h < len(forecast["hours"]):
+            return None
+        return forecast["hour_bodies"][h]
+
+    def zone(self, zone_id: int) -> bytes | None:
+        return self.current()["zone_bodies"].get(zone_id)
+
+
+def make_handler(state: ForecastState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _send(self, status: int, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, obj) -> None:
+            self._send(status, json.dumps(obj).encode())
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            query = parse_qs(url.query)
+            try:
+                if parts == ["health"]:
+                    self._json(200, {"model_run_id": state.run_id, "model_backend": state.backend})
+                elif parts == ["forecast"]:
+                    self._send(200, state.current()["full_body"])
+                elif parts[:2] == ["forecast", "hour"] and (len(parts) == 3 or "hour" in query):
+                    body = state.hour(parts[2] if len(parts) == 3 else query["hour"][0])
+                    if body:
+                        self._send(200, body)
+                    else:
+                        self._json(404, {"error": "unknown hour"})
+                elif parts[:2] == ["forecast", "zone"] and len(parts) == 3 and parts[2].isdigit():
+                    body = state.zone(int(parts[2]))
+                    if body:
+                        self._send(200, body)
+                    else:
+                        self._json(404, {"error": "unknown zone"})
+                else:
+                    self._json(404, {"error": "not found"})
+            except Exception as exc:  # keep the service up; report the failure to the caller
+                self._json(500, {"error": str(exc)})
+
+        def log_message(self, format: str, *args) -> None:
+            if state.args.access_log:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def reload_loop(state: ForecastState, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            state.maybe_reload()
+        except Exception as exc:
+            print("reload failed:", exc)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Long-running local forecast HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model-path", default="", help="Pin a model (disables registry hot-reload).")
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT)
+    parser.add_argument("--compiled-model", default="")
+    parser.add_argument("--shard-router", default="", help="Pin a sharded model (disables registry hot-reload).")
+    # A resident process pays the LightGBM import once, so the compiled evaluator is never the default.
+    add_backend_arg(parser)
+    parser.add_argument("--features-path", default=FEATURES_DEFAULT)
+    parser.add_argument("--baseline-bin", default=BASELINE_BIN_DEFAULT)
+    parser.add_argument("--baseline-path", default=BASELINE_DEFAULT)
+    parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT)
+    parser.add_argument("--intervals", default=INTERVALS_DEFAULT)
+    parser.add_argument("--horizon-hours", type=int, default=HORIZON_DEFAULT)
+    parser.add_argument("--timezone", default=TIMEZONE_DEFAULT)
+    add_weather_args(parser)
+    parser.add_argument("--format", choices=PAYLOAD_FORMATS, default="columnar", help="Same formats as generate_forecast.py.")
+    parser.add_argument("--summary-top-k", type=int, default=SUMMARY_TOP_K_DEFAULT)
+    parser.add_argument("--zone-lookup", default=ZONE_LOOKUP_DEFAULT)
+    parser.add_argument(
+        "--nowcast-state",
+        default=NOWCAST_DEFAULT,
+        help="Residual state from nowcast.py, re-read for every new forecast hour. Pass an empty string to disable.",
+    )
+    parser.add_argument("--reload-interval", type=float, default=5.0, help="Registry poll interval (s).")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    state = ForecastState(args)
+    state.current()
+    stop = threading.Event()
+    threading.Thread(target=reload_loop, args=(state, args.reload_interval, stop), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"serving on http://{args.host}:{args.port} (/forecast, /forecast/hour/<i|iso>, /forecast/zone/<id>)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
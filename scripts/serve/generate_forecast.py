@@ -1,19 +1,54 @@
+from __future__ import annotations
+
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import argparse
 import json
+import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-from urllib.request import urlopen
+from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
 import numpy as np
-import pandas as pd
-import lightgbm as lgb
+
+from forecast_payload import (
+    COMPRESSIONS,
+    PAYLOAD_FORMATS,
+    SUMMARY_TOP_K_DEFAULT,
+    columnar_payload,
+    dumps,
+    forecast_summary,
+    print_report,
+    resolve_compressions,
+    row_payload,
+    size_report,
+    write_compressed,
+    write_hour_shards,
+)
+from contributions import BATCH_ROWS_DEFAULT, BUDGET_MS_DEFAULT
+from forecast_archive import ARCHIVE_DEFAULT
+from instrumentation import HEAVY_MODULES, Tracer, add_trace_args, stage
+from nowcast import NOWCAST_DEFAULT
+from prediction_cache import WEATHER_COLS
+from weather_client import BOROUGH_POINTS, OPEN_METEO_URL, WEATHER_CACHE_DEFAULT, WeatherClient, fetch_weather
+from zone_lookup import ZONE_LOOKUP_DEFAULT, zone_boroughs
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_IMPORT_S = time.perf_counter() - _IMPORT_START
 
 
 MODEL_DEFAULT = "models/LGBM/lightgbm_week_hour_20260210_132138.txt"
+REGISTRY_DEFAULT = "models/registry.json"
+BACKENDS = ("lightgbm", "compiled")
+INTERVALS_DEFAULT = "data/serving/interval_table.npz"
+PREDICTION_CACHE_DEFAULT = "data/cache/prediction_cache.npz"
 FEATURES_DEFAULT = "data/processed/features_hourly.parquet"
+BASELINE_BIN_DEFAULT = "data/serving/baseline_week_hour.bin"
 BASELINE_DEFAULT = "data/serving/baseline_week_hour_mean.csv"
 BASELINE_META_DEFAULT = "data/serving/baseline_meta.json"
 TIMEZONE_DEFAULT = "America/New_York"
@@ -36,76 +71,75 @@ FEATURE_COLS = [
 ]
 
 CAT_COLS = ["PULocationID", "week_hour", "month", "week_of_year"]
+WEEK_HOURS = 168
+# Fixed category domains so codes never depend on which hours fall inside the horizon.
+CATEGORY_DOMAINS = {
+    "week_hour": range(WEEK_HOURS),
+    "month": range(1, 13),
+    "week_of_year": range(1, 54),
+}
+
+
+def load_model(model_path: str, compiled_model_dir: str = ""):
+    if compiled_model_dir and Path(compiled_model_dir).exists():
+        from compiled_model import load_compiled
+
+        return load_compiled(compiled_model_dir), "compiled"
+
+    import lightgbm as lgb
+
+    return lgb.Booster(model_file=model_path), "lightgbm"
 
 
 def next_top_of_hour(local_now: datetime) -> datetime:
     return local_now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
 
 
-def fetch_open_meteo_hourly(
-    latitude: float,
-    longitude: float,
-    timezone_name: str,
-    start_hour: datetime,
-    horizon_hours: int,
-) -> pd.DataFrame:
-    params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "hourly": "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m",
-        "forecast_days": 3,
-        "timezone": timezone_name,
-    }
-    url = "https://api.open-meteo.com/v1/forecast?" + urlencode(params)
-    with urlopen(url, timeout=30) as resp:
-        payload = json.loads(resp.read().decode("utf-8"))
-
-    hourly = payload.get("hourly", {})
-    if not hourly:
-        raise ValueError("Open-Meteo response missing 'hourly'.")
-
-    if "time" not in hourly:
-        raise ValueError("Open-Meteo response missing hourly.time.")
-
-    df = pd.DataFrame(
-        {
-            "hour": pd.to_datetime(hourly["time"]),
-            "temperature": hourly["temperature_2m"],
-            "relative_humidity": hourly["relative_humidity_2m"],
-            "precipitation": hourly["precipitation"],
-            "wind_speed": hourly["wind_speed_10m"],
-        }
+def absolute_hours(start_hour: datetime, horizon_hours: int) -> np.ndarray:
+    """Consecutive elapsed hours from start_hour as tz-aware datetimes; DST days have 23 or 25 of them."""
+    start_utc = start_hour.astimezone(timezone.utc)
+    return np.array(
+        [(start_utc + timedelta(hours=i)).astimezone(start_hour.tzinfo) for i in range(horizon_hours)], dtype=object
     )
-    # Open-Meteo times are local to the requested timezone when timezone is provided.
-    df["hour"] = pd.to_datetime(df["hour"]).dt.tz_localize(ZoneInfo(timezone_name))
-    df = df.sort_values("hour")
-    df = df[df["hour"] >= start_hour].head(horizon_hours).reset_index(drop=True)
-    if len(df) < horizon_hours:
-        raise ValueError(
-            f"Open-Meteo returned only {len(df)} hourly rows from {start_hour}, expected {horizon_hours}."
-        )
-    return df
 
 
-def make_dummy_weather(start_hour: datetime, horizon_hours: int) -> pd.DataFrame:
-    hours = pd.date_range(start=start_hour, periods=horizon_hours, freq="h")
+def dummy_weather_columns(start_hour: datetime, horizon_hours: int) -> dict[str, np.ndarray]:
     t = np.arange(horizon_hours)
     temp = 8 + 6 * np.sin(2 * np.pi * (t - 5) / 24)
     rh = 65 + 20 * np.cos(2 * np.pi * (t - 2) / 24)
     wind = 14 + 3 * np.sin(2 * np.pi * (t + 3) / 24)
     prcp = np.where((t % 24 >= 14) & (t % 24 <= 17), 0.2, 0.0)
-    return pd.DataFrame(
-        {
-            "hour": hours,
-            "temperature": temp,
-            "relative_humidity": np.clip(rh, 20, 100),
-            "precipitation": prcp,
-            "wind_speed": np.clip(wind, 0, None),
-        }
-    )
+    return {
+        "hour": absolute_hours(start_hour, horizon_hours),
+        "temperature": temp,
+        "relative_humidity": np.clip(rh, 20, 100),
+        "precipitation": prcp,
+        "wind_speed": np.clip(wind, 0, None),
+    }
+
+
+def weather_frame(weather: dict[str, np.ndarray]) -> pd.DataFrame:
+    import pandas as pd
+
+    frame = pd.DataFrame({col: weather[col] for col in ["hour"] + WEATHER_COLS})
+    frame["hour"] = pd.to_datetime(list(weather["hour"]))
+    return frame
+
+
+def make_dummy_weather(start_hour: datetime, horizon_hours: int) -> pd.DataFrame:
+    return weather_frame(dummy_weather_columns(start_hour, horizon_hours))
+
+
+def take_hours(weather, idx: np.ndarray):
+    """Subset of the forecast hours, for weather held as a DataFrame or as a dict of columns."""
+    if hasattr(weather, "iloc"):
+        return weather.iloc[idx].reset_index(drop=True)
+    return {col: np.asarray(values)[idx] for col, values in weather.items()}
 
 
 def build_baseline_lookup(features_df: pd.DataFrame) -> tuple[pd.DataFrame, float]:
+    import pandas as pd
+
     df = features_df.copy()
     df["hour"] = pd.to_datetime(df["hour"], errors="coerce")
     df = df.dropna(subset=["hour"])
@@ -121,143 +155,629 @@ def build_baseline_lookup(features_df: pd.DataFrame) -> tuple[pd.DataFrame, floa
     return baseline, global_mean
 
 
+def calendar_features(hours) -> dict[str, np.ndarray]:
+    """Per-hour calendar columns; computed once per forecast hour, not once per zone-hour row.
+
+    hours is any sequence of datetimes (a datetime Series, DatetimeIndex or object array); plain
+    datetime accessors keep the serving path free of pandas.
+    """
+    parts = np.array(
+        [(h.hour, h.weekday(), h.month, h.timetuple().tm_yday, h.isocalendar()[1]) for h in hours],
+        dtype=np.int64,
+    ).reshape(-1, 5)
+    hour_of_day, day_of_week = parts[:, 0], parts[:, 1]
+    return {
+        "hour_of_day": hour_of_day,
+        "day_of_week": day_of_week,
+        "month": parts[:, 2],
+        "day_of_year": parts[:, 3],
+        "week_of_year": parts[:, 4],
+        "week_hour": day_of_week * 24 + hour_of_day,
+        "is_weekend": (day_of_week >= 5).astype(int),
+        "is_holiday": np.zeros(len(parts), dtype=int),
+    }
+
+
+def baseline_matrix(
+    baseline_lookup: pd.DataFrame | np.ndarray, zone_ids: np.ndarray, baseline_global_mean: float
+) -> np.ndarray:
+    """Dense [zone, week_hour] baseline aligned with zone_ids; missing cells hold the global mean."""
+    if isinstance(baseline_lookup, np.ndarray):
+        return baseline_lookup
+    import pandas as pd
+
+    matrix = np.full((len(zone_ids), WEEK_HOURS), baseline_global_mean, dtype=np.float64)
+    zone_pos = pd.Index(zone_ids).get_indexer(baseline_lookup["PULocationID"])
+    week_hour = baseline_lookup["week_hour"].to_numpy(dtype=np.int64)
+    values = baseline_lookup["baseline_week_hour_mean"].to_numpy(dtype=np.float64)
+    keep = (zone_pos >= 0) & (week_hour >= 0) & (week_hour < WEEK_HOURS) & ~np.isnan(values)
+    matrix[zone_pos[keep], week_hour[keep]] = values[keep]
+    return matrix
+
+
+def inference_columns(
+    zone_ids: np.ndarray,
+    weather,
+    baseline_lookup: pd.DataFrame | np.ndarray,
+    baseline_global_mean: float,
+) -> dict[str, np.ndarray]:
+    """Zone-major (zone x hour) feature grid as raw-valued arrays, built by index gathers instead of joins.
+
+    weather is a DataFrame or a dict of columns with an "hour" column; baseline_lookup may be the long
+    (PULocationID, week_hour) table or a precomputed baseline_matrix for the same zone_ids.
+    """
+    zone_ids = np.asarray(zone_ids)
+    baseline = baseline_matrix(baseline_lookup, zone_ids, baseline_global_mean)
+    cal = calendar_features(weather["hour"])
+    n_zones, n_hours = len(zone_ids), len(cal["week_hour"])
+    zone_idx = np.repeat(np.arange(n_zones), n_hours)
+    hour_idx = np.tile(np.arange(n_hours), n_zones)
+
+    columns = {"PULocationID": zone_ids[zone_idx]}
+    for col, values in cal.items():
+        columns[col] = values[hour_idx]
+    for col in WEATHER_COLS:
+        columns[col] = np.asarray(weather[col])[hour_idx]
+    columns["is_rain"] = (columns["precipitation"] > 0).astype(int)
+    columns["baseline_week_hour_mean"] = baseline[zone_idx, cal["week_hour"][hour_idx]]
+    return columns
+
+
 def build_inference_frame(
     zone_ids: np.ndarray,
     weather_df: pd.DataFrame,
-    baseline_lookup: pd.DataFrame,
+    baseline_lookup: pd.DataFrame | np.ndarray,
     baseline_global_mean: float,
 ) -> pd.DataFrame:
-    hours = weather_df[["hour"]].copy()
-    hours["hour"] = pd.to_datetime(hours["hour"])
-    hours["hour_of_day"] = hours["hour"].dt.hour
-    hours["day_of_week"] = hours["hour"].dt.dayofweek
-    hours["month"] = hours["hour"].dt.month.astype(int)
-    hours["day_of_year"] = hours["hour"].dt.dayofyear.astype(int)
-    hours["week_of_year"] = hours["hour"].dt.isocalendar().week.astype(int)
-    hours["week_hour"] = hours["day_of_week"] * 24 + hours["hour_of_day"]
-    hours["is_weekend"] = (hours["day_of_week"] >= 5).astype(int)
-    hours["is_holiday"] = 0
-
-    zones = pd.DataFrame({"PULocationID": zone_ids})
-    zones["_k"] = 1
-    hours["_k"] = 1
-    df = zones.merge(hours, on="_k", how="inner").drop(columns=["_k"])
-    df = df.merge(weather_df, on="hour", how="left")
-    df["is_rain"] = (df["precipitation"] > 0).astype(int)
-    df = df.merge(baseline_lookup, on=["PULocationID", "week_hour"], how="left")
-    df["baseline_week_hour_mean"] = df["baseline_week_hour_mean"].fillna(baseline_global_mean)
-
-    for col in CAT_COLS:
-        df[col] = df[col].astype("category")
-    return df
+    """inference_columns as a DataFrame with fixed-domain categoricals, the layout LightGBM was trained on."""
+    import pandas as pd
+
+    columns = inference_columns(zone_ids, weather_df, baseline_lookup, baseline_global_mean)
+    zone_ids = np.asarray(zone_ids)
+    hours = pd.to_datetime(weather_df["hour"])
+    n_zones, n_hours = len(zone_ids), len(hours)
+
+    frame = {"PULocationID": pd.Categorical.from_codes(np.repeat(np.arange(n_zones), n_hours), categories=zone_ids)}
+    frame["hour"] = hours.array.take(np.tile(np.arange(n_hours), n_zones))
+    for col, values in columns.items():
+        if col == "PULocationID":
+            continue
+        if col in CATEGORY_DOMAINS:
+            domain = CATEGORY_DOMAINS[col]
+            frame[col] = pd.Categorical.from_codes(values - domain.start, categories=domain)
+        else:
+            frame[col] = values
+    return pd.DataFrame(frame)
+
+
+def predict_grid(model, zone_ids: np.ndarray, weather, baseline, baseline_global_mean: float):
+    """Raw (log1p) predictions as a [zone, hour] matrix."""
+    n_hours = len(weather["hour"])
+    if hasattr(model, "encode"):
+        # Compiled trees map raw category values themselves, so the grid never becomes a DataFrame.
+        X = inference_columns(zone_ids, weather, baseline, baseline_global_mean)
+    else:
+        X = build_inference_frame(zone_ids, weather, baseline, baseline_global_mean)[FEATURE_COLS]
+    return model.predict(X).reshape(len(zone_ids), n_hours)
+
+
+def model_source(
+    model_path: str = "",
+    registry_path: str = REGISTRY_DEFAULT,
+    compiled_model_dir: str = "",
+    shard_router: str = "",
+    backend: str | None = None,
+) -> tuple[str | None, str, str]:
+    """Returns (run_id, model_path, compiled_model_dir) that resolve_model would load, without loading it.
+
+    compiled_model_dir is empty unless the compiled backend applies; a sharded model's path is its router.
+    """
+    backend = backend or ("compiled" if compiled_model_dir else "lightgbm")
+    if shard_router:
+        return None, shard_router, ""
+
+    run_id = None
+    if not model_path:
+        from model_registry import resolve_stage
+
+        entry = resolve_stage(registry_path=registry_path) if Path(registry_path).exists() else None
+        if entry is not None:
+            model_path = entry["model_path"]
+            if backend == "compiled":
+                compiled_model_dir = compiled_model_dir or entry.get("compiled_path", "")
+            run_id = entry["run_id"]
+        else:
+            model_path = MODEL_DEFAULT
+    return run_id, model_path, compiled_model_dir if backend == "compiled" else ""
+
+
+def resolve_model(
+    model_path: str = "",
+    registry_path: str = REGISTRY_DEFAULT,
+    compiled_model_dir: str = "",
+    shard_router: str = "",
+    backend: str | None = None,
+):
+    """Returns (model, backend, run_id, model_path); the registry's production model wins when no path is given.
+
+    LightGBM is the default backend: the compiled evaluator loads faster but predicts several times
+    slower on large models, so it is only used when asked for (backend="compiled" or an explicit
+    compiled_model_dir). The registry's compiled_path is then used when no directory is given.
+    """
+    run_id, model_path, compiled_model_dir = model_source(
+        model_path, registry_path, compiled_model_dir, shard_router, backend
+    )
+    if shard_router:
+        from sharded_model import load_sharded
+
+        return load_sharded(shard_router), "sharded", None, shard_router
+    model, backend = load_model(model_path, compiled_model_dir)
+    return model, backend, run_id, model_path
+
+
+def load_serving_baseline(
+    baseline_path: str = BASELINE_DEFAULT,
+    baseline_meta: str = BASELINE_META_DEFAULT,
+    features_path: str = FEATURES_DEFAULT,
+    baseline_bin: str = BASELINE_BIN_DEFAULT,
+) -> tuple[pd.DataFrame | np.ndarray, float, np.ndarray, str]:
+    """Returns (baseline, global_mean, zone_ids, source); baseline is a dense matrix when the binary artifact exists."""
+    if baseline_bin and Path(baseline_bin).exists():
+        from baseline_artifact import load_baseline
+
+        baseline = load_baseline(baseline_bin)
+        zone_ids = np.asarray(baseline.zone_ids, dtype=int)
+        return baseline.matrix(), baseline.global_mean, zone_ids, "serving_baseline_bin"
+
+    import pandas as pd
+
+    baseline_path = Path(baseline_path)
+    baseline_meta_path = Path(baseline_meta)
+
+    if baseline_path.exists() and baseline_meta_path.exists():
+        baseline_lookup = pd.read_csv(baseline_path)
+        meta = json.loads(baseline_meta_path.read_text())
+        baseline_global_mean = float(meta["baseline_global_mean"])
+        zone_ids = np.array(meta["zone_ids"], dtype=int)
+        return baseline_lookup, baseline_global_mean, zone_ids, "serving_baseline"
+
+    try:
+        features_df = pd.read_parquet(features_path, columns=["hour", "PULocationID", "trip_count"])
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            "Missing features parquet and serving baseline artifacts. "
+            "Provide data/serving/baseline_week_hour.bin or baseline_week_hour_mean.csv and baseline_meta.json."
+        )
+    zone_ids = np.sort(features_df["PULocationID"].unique())
+    if len(zone_ids) == 0:
+        raise ValueError("No zones found in features file.")
+
+    baseline_source = features_df.copy()
+    baseline_source["hour"] = pd.to_datetime(baseline_source["hour"])
+    baseline_source["hour_of_day"] = baseline_source["hour"].dt.hour
+    baseline_source["day_of_week"] = baseline_source["hour"].dt.dayofweek
+    baseline_source["week_hour"] = baseline_source["day_of_week"] * 24 + baseline_source["hour_of_day"]
+    baseline_lookup, baseline_global_mean = build_baseline_lookup(baseline_source)
+    return baseline_lookup, baseline_global_mean, zone_ids, "features"
+
+
+def load_weather(
+    start_hour: datetime,
+    horizon_hours: int,
+    timezone_name: str = TIMEZONE_DEFAULT,
+    latitude: float = 40.7128,
+    longitude: float = -74.0060,
+    dummy: bool = False,
+    client=None,
+    points: dict[str, tuple[float, float]] | None = None,
+    frame: bool = True,
+) -> tuple[pd.DataFrame | dict[str, np.ndarray], dict]:
+    """Returns (weather, info); info["stale"] marks a fallback to an expired cached response.
+
+    weather is a DataFrame, or with frame=False the plain dict of columns (no pandas import).
+    """
+    if dummy:
+        weather, info = dummy_weather_columns(start_hour, horizon_hours), {"source": "dummy", "stale": False}
+    else:
+        client = client or WeatherClient()
+        points = points or {"NYC": (latitude, longitude)}
+        weather, info = fetch_weather(client, points, timezone_name, start_hour, horizon_hours)
+    return (weather_frame(weather) if frame else weather), info
+
+
+def weather_client_from_args(args: argparse.Namespace):
+    """WeatherClient and point set from the shared --weather-* CLI flags."""
+    client = WeatherClient(
+        base_url=args.weather_url,
+        cache_dir=args.weather_cache or None,
+        ttl_s=args.weather_ttl,
+        max_workers=args.weather_workers,
+    )
+    points = BOROUGH_POINTS if args.weather_points == "boroughs" else {"NYC": (args.latitude, args.longitude)}
+    return client, points
+
+
+def add_backend_arg(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default=None,
+        help="lightgbm (default) or compiled: NumPy tree arrays, pandas/LightGBM-free cold start but "
+        "slower predict on large models; uses --compiled-model or the registry entry's compiled_path.",
+    )
+
+
+def add_weather_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latitude", type=float, default=40.7128, help="Open-Meteo latitude.")
+    parser.add_argument("--longitude", type=float, default=-74.0060, help="Open-Meteo longitude.")
+    parser.add_argument(
+        "--weather-points",
+        choices=["city", "boroughs"],
+        default="city",
+        help="city: one --latitude/--longitude point; boroughs: one point per borough, averaged.",
+    )
+    parser.add_argument("--weather-url", default=OPEN_METEO_URL, help="Open-Meteo-compatible forecast endpoint.")
+    parser.add_argument(
+        "--weather-cache",
+        default=WEATHER_CACHE_DEFAULT,
+        help="Response cache directory (empty string disables caching and stale fallback).",
+    )
+    parser.add_argument("--weather-ttl", type=float, default=1800, help="Seconds a cached response is served as fresh.")
+    parser.add_argument("--weather-workers", type=int, default=4, help="Max concurrent point requests.")
+    parser.add_argument(
+        "--dummy-weather",
+        action="store_true",
+        help="Use synthetic weather and skip Open-Meteo call.",
+    )
+
+
+def to_counts(y_pred_log: np.ndarray) -> np.ndarray:
+    return np.clip(np.rint(np.expm1(y_pred_log)), 0, None).astype(int)
+
+
+def interval_bounds(table, zone_ids: np.ndarray, hours, pred_log: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(p10, p90) count matrices [zone, hour] around the log1p forecast."""
+    n_zones, n_hours = pred_log.shape
+    week_hour = calendar_features(hours)["week_hour"]
+    lo, hi = table.bounds(np.repeat(zone_ids, n_hours), pred_log.ravel(), np.tile(week_hour, n_zones))
+    return np.rint(lo).astype(int).reshape(n_zones, n_hours), np.rint(hi).astype(int).reshape(n_zones, n_hours)
+
+
+def interval_summary(table) -> dict:
+    return {
+        "quantiles": list(table.quantiles),
+        "bucket": table.bucket,
+        "holdout_coverage": table.meta.get("holdout_coverage", {}).get("overall"),
+    }
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate 48-hour zone forecasts.")
     parser.add_argument("--out", required=True, help="Output JSON path.")
-    parser.add_argument("--model-path", default=MODEL_DEFAULT, help="LightGBM model path.")
+    parser.add_argument(
+        "--model-path",
+        default="",
+        help="LightGBM model path (default: production model from the registry, else MODEL_DEFAULT).",
+    )
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT, help="Model registry index.")
+    parser.add_argument(
+        "--compiled-model",
+        default="",
+        help="Compiled tree arrays from compiled_model.py; implies --backend compiled.",
+    )
+    add_backend_arg(parser)
+    parser.add_argument(
+        "--shard-router",
+        default="",
+        help="router.json from lightgbm_sharded.py; routes each zone to its shard model.",
+    )
     parser.add_argument("--features-path", default=FEATURES_DEFAULT, help="Optional features parquet for baseline.")
+    parser.add_argument(
+        "--baseline-bin",
+        default=BASELINE_BIN_DEFAULT,
+        help="Binary serving baseline from build_serving_baseline.py; preferred over the CSV when present.",
+    )
     parser.add_argument("--baseline-path", default=BASELINE_DEFAULT, help="Serving baseline CSV.")
     parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT, help="Serving baseline meta JSON.")
+    parser.add_argument(
+        "--intervals",
+        default=INTERVALS_DEFAULT,
+        help="Residual-quantile table from intervals.py; adds p10/p90 when the file exists.",
+    )
     parser.add_argument("--horizon-hours", type=int, default=HORIZON_DEFAULT, help="Forecast horizon.")
     parser.add_argument("--timezone", default=TIMEZONE_DEFAULT, help="Timezone, e.g. America/New_York.")
-    parser.add_argument("--latitude", type=float, default=40.7128, help="Open-Meteo latitude.")
-    parser.add_argument("--longitude", type=float, default=-74.0060, help="Open-Meteo longitude.")
+    add_weather_args(parser)
     parser.add_argument(
-        "--dummy-weather",
+        "--format",
+        choices=PAYLOAD_FORMATS,
+        default="columnar",
+        help="columnar: hours + zones + zones x hours matrix; rows: legacy one object per zone-hour.",
+    )
+    parser.add_argument("--hour-shards", default="", help="Also write one JSON file per hour into this directory.")
+    parser.add_argument(
+        "--compress",
+        default="",
+        help=f"Comma-separated precompressed variants to write next to each file ({', '.join(COMPRESSIONS)}).",
+    )
+    parser.add_argument("--report", action="store_true", help="Print payload byte sizes and JSON parse times.")
+    parser.add_argument(
+        "--summary-top-k",
+        type=int,
+        default=SUMMARY_TOP_K_DEFAULT,
+        help="Zones per hour in the payload's precomputed ranking (0: no summary block).",
+    )
+    parser.add_argument(
+        "--zone-lookup",
+        default=ZONE_LOOKUP_DEFAULT,
+        help="Zone -> borough CSV for the summary's borough totals; skipped when missing.",
+    )
+    parser.add_argument(
+        "--prediction-cache",
+        default=PREDICTION_CACHE_DEFAULT,
+        help="Per-hour prediction cache; only new hours and hours whose weather moved are re-predicted. "
+        "Pass an empty string to disable.",
+    )
+    parser.add_argument(
+        "--cache-tolerance",
+        default="",
+        help="Per-input reuse tolerance, e.g. temperature=0.5,relative_humidity=3,precipitation=0.1,wind_speed=1.5.",
+    )
+    parser.add_argument(
+        "--contrib-top-k",
+        type=int,
+        default=0,
+        help="Write the top-k LightGBM feature contributions per zone-hour to <out>_contrib.json (0: off).",
+    )
+    parser.add_argument(
+        "--contrib-budget-ms",
+        type=float,
+        default=BUDGET_MS_DEFAULT,
+        help="Time budget for the whole contributions stage (booster load and feature frame included); "
+        "rows past it (lowest predictions first) are left unexplained.",
+    )
+    parser.add_argument("--contrib-threads", type=int, default=0, help="Threads for contributions (0: all CPUs).")
+    parser.add_argument("--contrib-batch-rows", type=int, default=BATCH_ROWS_DEFAULT)
+    parser.add_argument(
+        "--archive-dir",
+        default=ARCHIVE_DEFAULT,
+        help="Keep a compact copy of every forecast for accuracy_monitor.py. Pass an empty string to disable.",
+    )
+    parser.add_argument(
+        "--archive-keep-days",
+        type=float,
+        default=0,
+        help="Delete archived forecasts older than this many days (0: keep all). Leave room for the "
+        "TLC publication lag, or accuracy_monitor.py never scores them.",
+    )
+    parser.add_argument(
+        "--nowcast-state",
+        default=NOWCAST_DEFAULT,
+        help="Residual state from nowcast.py; applied when the file exists. Pass an empty string to disable.",
+    )
+    parser.add_argument(
+        "--profile-startup",
         action="store_true",
-        help="Use synthetic weather and skip Open-Meteo call.",
+        help="Print the stage table (time, memory and which heavy modules each stage imported) "
+        "even with --no-trace-summary.",
     )
+    add_trace_args(parser)
     args = parser.parse_args()
-
-    model = lgb.Booster(model_file=args.model_path)
-
-    baseline_path = Path(args.baseline_path)
-    baseline_meta_path = Path(args.baseline_meta)
-
-    if baseline_path.exists() and baseline_meta_path.exists():
-        baseline_lookup = pd.read_csv(args.baseline_path)
-        meta = json.loads(baseline_meta_path.read_text())
-        baseline_global_mean = float(meta["baseline_global_mean"])
-        zone_ids = np.array(meta["zone_ids"], dtype=int)
-        baseline_source_name = "serving_baseline"
-    else:
-        try:
-            features_df = pd.read_parquet(
-                args.features_path, columns=["hour", "PULocationID", "trip_count"]
+    tracer = Tracer.from_args("generate_forecast", args)
+    if args.profile_startup:
+        tracer.summary = True
+    # Imports ran before the tracer existed; they are recorded as the first stage.
+    tracer.add_stage("module imports", _IMPORT_S, [m for m in HEAVY_MODULES if m in sys.modules])
+    with tracer:
+        with stage("load model") as st:
+            model, model_backend, model_run_id, model_path = resolve_model(
+                args.model_path, args.registry, args.compiled_model, args.shard_router, args.backend
             )
-            zone_ids = np.sort(features_df["PULocationID"].unique())
-            if len(zone_ids) == 0:
-                raise ValueError("No zones found in features file.")
-
-            baseline_source = features_df.copy()
-            baseline_source["hour"] = pd.to_datetime(baseline_source["hour"])
-            baseline_source["hour_of_day"] = baseline_source["hour"].dt.hour
-            baseline_source["day_of_week"] = baseline_source["hour"].dt.dayofweek
-            baseline_source["week_hour"] = (
-                baseline_source["day_of_week"] * 24 + baseline_source["hour_of_day"]
+            st.extra["backend"] = model_backend
+
+        with stage("load baseline"):
+            baseline_lookup, baseline_global_mean, zone_ids, baseline_source_name = load_serving_baseline(
+                args.baseline_path, args.baseline_meta, args.features_path, args.baseline_bin
             )
-            baseline_lookup, baseline_global_mean = build_baseline_lookup(baseline_source)
-            baseline_source_name = "features"
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                "Missing features parquet and serving baseline artifacts. "
-                "Provide data/serving/baseline_week_hour_mean.csv and baseline_meta.json."
+
+        with stage("load weather"):
+            tz = ZoneInfo(args.timezone)
+            start_hour = next_top_of_hour(datetime.now(tz))
+            client, points = weather_client_from_args(args)
+            # Plain weather columns: with the compiled model and binary baseline nothing below imports pandas.
+            weather, weather_info = load_weather(
+                start_hour,
+                args.horizon_hours,
+                args.timezone,
+                dummy=args.dummy_weather,
+                client=client,
+                points=points,
+                frame=False,
             )
 
-    tz = ZoneInfo(args.timezone)
-    start_hour = next_top_of_hour(datetime.now(tz))
+        with stage("predict") as st:
+            n_zones, n_hours = len(zone_ids), len(weather["hour"])
+            hours = [ts.isoformat() for ts in weather["hour"]]
+            baseline = baseline_matrix(baseline_lookup, zone_ids, baseline_global_mean)
+            cache_stats = None
+            if args.prediction_cache:
+                from prediction_cache import PredictionCache, cache_key, parse_tolerance
+
+                # The compiled backend serves its array directory, so that is hashed along with the text model.
+                served_paths = [model_path] + ([model.model_dir] if hasattr(model, "model_dir") else [])
+                cache = PredictionCache.load(
+                    args.prediction_cache, cache_key(served_paths, baseline, zone_ids), n_zones
+                )
+                weather_values = np.column_stack([weather[col] for col in WEATHER_COLS]).astype(np.float64)
+                cols, cache_stats = cache.lookup(hours, weather_values, parse_tolerance(args.cache_tolerance))
+                pred_log = np.empty((n_zones, n_hours), dtype=np.float64)
+                hit = cols >= 0
+                pred_log[:, hit] = cache.pred_log[:, cols[hit]]
+                miss = np.flatnonzero(~hit)
+                if miss.size:
+                    miss_weather = take_hours(weather, miss)
+                    pred_log[:, miss] = predict_grid(model, zone_ids, miss_weather, baseline, baseline_global_mean)
+                cache.refreshed(hours, weather_values, pred_log, cols).save(args.prediction_cache)
+                print(
+                    f"prediction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                    f"({cache_stats['new_hours']} new hours, {cache_stats['weather_changed']} weather changed)"
+                )
+            else:
+                pred_log = predict_grid(model, zone_ids, weather, baseline, baseline_global_mean)
+            st.rows_out = pred_log.size
+
+        model_matrix = None
+        nowcast_meta = None
+        if args.nowcast_state and Path(args.nowcast_state).exists():
+            from nowcast import NowcastState, apply_nowcast
+
+            with stage("nowcast", rows_in=n_zones * n_hours):
+                # Applied after the prediction cache, which keeps raw model output only.
+                corrected, nowcast_meta = apply_nowcast(
+                    pred_log, zone_ids, weather["hour"][0], NowcastState.load(args.nowcast_state)
+                )
+                if nowcast_meta["applied"]:
+                    model_matrix = to_counts(pred_log)
+                    pred_log = corrected
+            print("nowcast:", nowcast_meta)
+
+        # Zone-major [zone, hour]: every output format is a view of this matrix.
+        matrix = to_counts(pred_log)
+        y_pred_log = pred_log.ravel()
+
+        bounds = None
+        interval_meta = None
+        if args.intervals and Path(args.intervals).exists():
+            from intervals import load_intervals
+
+            with stage("intervals"):
+                table = load_intervals(args.intervals)
+                bounds = interval_bounds(table, zone_ids, weather["hour"], pred_log)
+                interval_meta = interval_summary(table)
+
+        contrib_meta = None
+        if args.contrib_top_k > 0:
+            from contributions import (
+                contrib_payload,
+                contribution_boosters,
+                top_contributions,
+                unexplained,
+                write_contributions,
+            )
 
-    if args.dummy_weather:
-        weather_df = make_dummy_weather(start_hour, args.horizon_hours)
-        weather_source = "dummy"
-    else:
-        try:
-            weather_df = fetch_open_meteo_hourly(
-                latitude=args.latitude,
-                longitude=args.longitude,
-                timezone_name=args.timezone,
-                start_hour=start_hour,
-                horizon_hours=args.horizon_hours,
+            with stage("contributions", rows_in=n_zones * n_hours) as st:
+                # The budget covers the whole stage: loading the source booster and building the frame
+                # (LightGBM and pandas imports included) are paid from it before any row is explained.
+                start = time.perf_counter()
+                budget_s = args.contrib_budget_ms / 1000
+                booster, contrib_source = contribution_boosters(model, model_path)
+                if time.perf_counter() - start < budget_s:
+                    X = build_inference_frame(zone_ids, weather_frame(weather), baseline, baseline_global_mean)
+                    result = top_contributions(
+                        booster,
+                        X[FEATURE_COLS],
+                        y_pred_log,
+                        k=args.contrib_top_k,
+                        batch_rows=args.contrib_batch_rows,
+                        threads=args.contrib_threads,
+                        budget_s=budget_s,
+                        started=start,
+                    )
+                else:
+                    result = unexplained(len(y_pred_log), args.contrib_top_k, args.contrib_threads)
+                contrib_header = {
+                    "generated_at": datetime.now(timezone.utc).isoformat(),
+                    "model_path": model_path,
+                    "model_run_id": model_run_id,
+                    "contrib_source": contrib_source,
+                }
+                path = write_contributions(
+                    args.out, contrib_payload(contrib_header, hours, zone_ids, FEATURE_COLS, result)
+                )
+                contrib_meta = {
+                    "path": path.name,
+                    "k": args.contrib_top_k,
+                    "rows_explained": result["rows_explained"],
+                    "truncated": result["truncated"],
+                    "seconds": round(time.perf_counter() - start, 3),
+                }
+                st.rows_out = result["rows_explained"]
+            print(
+                f"contributions: {result['rows_explained']}/{n_zones * n_hours} rows in {contrib_meta['seconds']:.2f}s "
+                f"({result['threads']} threads, budget {args.contrib_budget_ms:.0f} ms) -> {path}"
             )
-            weather_source = "open-meteo"
-        except (HTTPError, URLError, TimeoutError, ValueError) as exc:
-            raise RuntimeError(f"Failed to fetch Open-Meteo forecast: {exc}") from exc
-
-    inf_df = build_inference_frame(zone_ids, weather_df, baseline_lookup, baseline_global_mean)
-    X = inf_df[FEATURE_COLS]
-    y_pred_log = model.predict(X)
-    y_pred = np.expm1(y_pred_log)
-    inf_df["prediction"] = np.clip(np.rint(y_pred), 0, None).astype(int)
-
-    predictions = [
-        {
-            "hour": ts.isoformat(),
-            "PULocationID": int(zone),
-            "prediction": int(pred),
-        }
-        for ts, zone, pred in zip(inf_df["hour"], inf_df["PULocationID"], inf_df["prediction"])
-    ]
-
-    payload = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "timezone": args.timezone,
-        "horizon_hours": args.horizon_hours,
-        "zone_count": int(len(zone_ids)),
-        "prediction_count": int(len(predictions)),
-        "model_path": args.model_path,
-        "weather_source": weather_source,
-        "baseline_source": baseline_source_name,
-        "predictions": predictions,
-    }
 
-    out_path = Path(args.out)
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(payload, indent=2))
-    print("saved:", out_path)
-    print("zones:", len(zone_ids))
-    print("rows:", len(predictions))
-    print("hours:", weather_df["hour"].min(), "to", weather_df["hour"].max())
+        summary = None
+        if args.summary_top_k > 0:
+            with stage("summary", rows_in=n_zones * n_hours):
+                try:
+                    boroughs = zone_boroughs(args.zone_lookup)
+                except FileNotFoundError as exc:
+                    print(f"{exc}; summary has no borough totals")
+                    boroughs = None
+                summary = forecast_summary(zone_ids, matrix, boroughs, args.summary_top_k)
+
+        with stage("write payload"):
+            header = {
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+                "timezone": args.timezone,
+                "horizon_hours": args.horizon_hours,
+                "zone_count": int(n_zones),
+                "prediction_count": int(n_zones * n_hours),
+                "model_path": model_path,
+                "model_backend": model_backend,
+                "model_run_id": model_run_id,
+                "weather_source": weather_info["source"],
+                "weather_stale": weather_info["stale"],
+                "baseline_source": baseline_source_name,
+                "intervals": interval_meta,
+                "prediction_cache": cache_stats,
+                "contributions": contrib_meta,
+                "nowcast": nowcast_meta,
+            }
+            build_payload = row_payload if args.format == "rows" else columnar_payload
+            data = dumps(build_payload(header, hours, zone_ids, matrix, bounds, summary), args.format)
+
+            out_path = Path(args.out)
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_bytes(data)
+            written = [out_path]
+            compress = resolve_compressions(args.compress)
+            written += write_compressed(out_path, data, compress)
+            print("saved:", out_path, f"({args.format})")
+            print("zones:", n_zones)
+            print("rows:", n_zones * n_hours)
+            print("hours:", weather["hour"][0], "to", weather["hour"][-1])
+
+        with stage("archive / shards / report"):
+            if args.archive_dir:
+                from forecast_archive import archive_forecast
+
+                archive_path = archive_forecast(
+                    args.archive_dir,
+                    header,
+                    weather["hour"],
+                    zone_ids,
+                    matrix,
+                    model_matrix,
+                    keep_days=args.archive_keep_days,
+                )
+                print("archived:", archive_path)
+
+            shard_paths = []
+            if args.hour_shards:
+                shard_paths = write_hour_shards(
+                    args.hour_shards, header, hours, zone_ids, matrix, bounds, summary
+                )
+                for path in shard_paths:
+                    write_compressed(path, path.read_bytes(), compress)
+                print("saved:", len(shard_paths) - 1, "hour shards in", args.hour_shards)
+
+            if args.report:
+                report = size_report(written + shard_paths[:2])
+                print_report(report)
+                if shard_paths:
+                    shard_bytes = [p.stat().st_size for p in shard_paths[1:]]
+                    print(f"hour shards: {len(shard_bytes)} files, mean {np.mean(shard_bytes):.0f} bytes")
 
 
 if __name__ == "__main__":
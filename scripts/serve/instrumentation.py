@@ -0,0 +1,268 @@
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+
+
+TRACE_DIR_DEFAULT = "data/traces"
+TRACE_ENV = "RIDECAST_TRACE_DIR"
+# Modules named in a stage's record when that stage is the one that imported them.
+HEAVY_MODULES = [
+    "pandas",
+    "pyarrow",
+    "lightgbm",
+    "xgboost",
+    "sklearn",
+    "scipy",
+    "matplotlib",
+    "shap",
+    "urllib.request",
+    "concurrent.futures",
+]
+
+_active: "Tracer | None" = None
+
+
+def _proc_status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high-water mark (Linux >= 4.0) so a stage sees its own peak."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kb() -> int:
+    hwm = _proc_status_kb("VmHWM")
+    if hwm is not None:
+        return hwm
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _cpu_s() -> float:
+    """CPU seconds of this process plus reaped child processes (worker pools)."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class Stage:
+    """One timed block; set rows_in / rows_out inside the block when the counts are known."""
+
+    def __init__(self, name: str, path: str, rows_in: int | None = None):
+        self.name = name
+        self.path = path
+        self.rows_in = rows_in
+        self.rows_out: int | None = None
+        self.extra: dict = {}
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.peak_rss_mb: float | None = None
+        self.imported: list[str] = []
+        self.status = "ok"
+
+    def record(self) -> dict:
+        out = {
+            "stage": self.path,
+            "wall_s": round(self.wall_s, 6),
+            "cpu_s": round(self.cpu_s, 6),
+            "peak_rss_mb": self.peak_rss_mb,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "status": self.status,
+        }
+        if self.imported:
+            out["imported"] = self.imported
+        if self.extra:
+            out.update(self.extra)
+        return out
+
+
+class Tracer:
+    """Per-run stage recorder: appends one JSON line per finished stage and prints a summary table.
+
+    Stages nest; each reports its own wall time, CPU time (including reaped worker processes),
+    peak RSS reached inside the block and optional row counts. Use as a context manager around
+    the script body; module-level stage() / traced() attach to the active tracer and are no-ops
+    when there is none, so shared helpers can be instrumented unconditionally.
+    """
+
+    def __init__(self, script: str, trace_path: str | Path | None = None, summary: bool = True):
+        self.script = script
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.summary = summary
+        self.run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{os.urandom(3).hex()}"
+        self.stages: list[Stage] = []
+        # [stage, peak before its reset, largest peak among finished child stages]
+        self._stack: list[list] = []
+        self._started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._cpu_start = _cpu_s()
+        self._peak_kb = _peak_rss_kb()
+        self._can_reset = _reset_peak_rss()
+        self._previous: Tracer | None = None
+
+    @classmethod
+    def from_args(cls, script: str, args) -> "Tracer":
+        """Tracer configured by add_trace_args flags; --trace "" disables the JSONL file."""
+        trace_dir = args.trace if args.trace is not None else os.environ.get(TRACE_ENV, TRACE_DIR_DEFAULT)
+        trace_path = Path(trace_dir) / f"{script}.jsonl" if trace_dir else None
+        return cls(script, trace_path, summary=not args.no_trace_summary)
+
+    @classmethod
+    def for_script(cls, script: str) -> "Tracer":
+        """Tracer for scripts without a CLI: writes under ${RIDECAST_TRACE_DIR} or the default directory."""
+        trace_dir = os.environ.get(TRACE_ENV, TRACE_DIR_DEFAULT)
+        return cls(script, Path(trace_dir) / f"{script}.jsonl" if trace_dir else None)
+
+    def activate(self) -> "Tracer":
+        """Make this the tracer stage() reports to; top-level scripts call finish() themselves."""
+        global _active
+        self._previous, _active = _active, self
+        return self
+
+    def __enter__(self) -> "Tracer":
+        return self.activate()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        global _active
+        _active = self._previous
+        self.finish("error" if exc_type else "ok")
+
+    def _write(self, record: dict) -> None:
+        if self.trace_path is None:
+            return
+        self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.trace_path.open("a") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None):
+        parent = self._stack[-1][0].path + "/" if self._stack else ""
+        st = Stage(name, parent + name, rows_in)
+        # Peak RSS is per stage: the high-water mark is reset on entry, and a finished stage hands
+        # its peak (and the enclosing stage's peak before the reset) up to the enclosing stage.
+        self._stack.append([st, _peak_rss_kb(), 0])
+        if self._can_reset:
+            _reset_peak_rss()
+        modules = set(sys.modules)
+        start, cpu_start = time.perf_counter(), _cpu_s()
+        try:
+            yield st
+        except BaseException:
+            st.status = "error"
+            raise
+        finally:
+            st.wall_s = time.perf_counter() - start
+            st.cpu_s = _cpu_s() - cpu_start
+            _, before, child_peak = self._stack.pop()
+            peak = max(_peak_rss_kb(), child_peak)
+            st.peak_rss_mb = round(peak / 1024, 1)
+            st.imported = [m for m in HEAVY_MODULES if m in sys.modules and m not in modules]
+            if self._stack:
+                self._stack[-1][2] = max(self._stack[-1][2], before, peak)
+            # clear_refs also resets ru_maxrss, so the whole-run peak is tracked here.
+            self._peak_kb = max(self._peak_kb, before, peak)
+            self.stages.append(st)
+            self._write({"type": "stage", "run_id": self.run_id, "script": self.script, **st.record()})
+
+    def add_stage(self, name: str, wall_s: float, imported: list[str] | None = None) -> Stage:
+        """Record a block timed before the tracer existed, e.g. a script's own module imports."""
+        st = Stage(name, name)
+        st.wall_s = wall_s
+        st.imported = imported or []
+        self.stages.append(st)
+        self._write({"type": "stage", "run_id": self.run_id, "script": self.script, **st.record()})
+        return st
+
+    def finish(self, status: str = "ok") -> None:
+        record = {
+            "type": "run",
+            "run_id": self.run_id,
+            "script": self.script,
+            "started_at": self._started_at.isoformat(),
+            "wall_s": round(time.perf_counter() - self._start, 6),
+            "cpu_s": round(_cpu_s() - self._cpu_start, 6),
+            "peak_rss_mb": round(max(self._peak_kb, _peak_rss_kb()) / 1024, 1),
+            "status": status,
+            "argv": sys.argv[1:],
+        }
+        self._write(record)
+        if self.summary:
+            self.print_summary(record)
+
+    def print_summary(self, run: dict) -> None:
+        print(f"stage timings ({self.script}, run {self.run_id}):")
+        print(f"  {'stage':<34} {'wall_s':>8} {'cpu_s':>8} {'peak_MB':>8} {'rows_in':>11} {'rows_out':>11}")
+        for st in self.stages:
+            rows_in = f"{st.rows_in:,}" if st.rows_in is not None else ""
+            rows_out = f"{st.rows_out:,}" if st.rows_out is not None else ""
+            peak = f"{st.peak_rss_mb:.1f}" if st.peak_rss_mb is not None else ""
+            imported = f"  imports {', '.join(st.imported)}" if st.imported else ""
+            print(
+                f"  {st.path[:34]:<34} {st.wall_s:>8.3f} {st.cpu_s:>8.3f} {peak:>8} "
+                f"{rows_in:>11} {rows_out:>11}{imported}"
+            )
+        print(f"  {'total':<34} {run['wall_s']:>8.3f} {run['cpu_s']:>8.3f} {run['peak_rss_mb']:>8.1f}")
+        if self.trace_path is not None:
+            print("trace:", self.trace_path)
+
+
+@contextmanager
+def stage(name: str, rows_in: int | None = None):
+    """Stage on the active tracer; a plain record nobody reads when no tracer is active."""
+    if _active is None:
+        yield Stage(name, name, rows_in)
+        return
+    with _active.stage(name, rows_in) as st:
+        yield st
+
+
+def traced(name: str | None = None, rows=len):
+    """Decorator form of stage(); rows(result) fills rows_out (pass rows=None to skip)."""
+
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(label) as st:
+                result = fn(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        st.rows_out = int(rows(result))
+                    except TypeError:
+                        pass
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def add_trace_args(parser) -> None:
+    parser.add_argument(
+        "--trace",
+        default=None,
+        help=f"Directory for the JSON-lines stage trace (<script>.jsonl; default ${TRACE_ENV} or {TRACE_DIR_DEFAULT}). "
+        "Pass an empty string to disable.",
+    )
+    parser.add_argument("--no-trace-summary", action="store_true", help="Skip the stage timing table at exit.")
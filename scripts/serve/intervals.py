@@ -0,0 +1,204 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+INTERVALS_DEFAULT = "data/serving/interval_table.npz"
+QUANTILES = (0.1, 0.9)
+N_TIERS = 4
+MIN_BUCKET_SAMPLES = 30
+WEEK_HOURS = 168
+
+
+class IntervalTable:
+    """Empirical log-space residual quantiles per zone x bucket, applied by array indexing."""
+
+    def __init__(
+        self,
+        zone_ids: np.ndarray,
+        table: np.ndarray,
+        bucket: str,
+        tier_edges: np.ndarray,
+        quantiles: tuple[float, float] = QUANTILES,
+        meta: dict | None = None,
+    ):
+        self.zone_ids = np.asarray(zone_ids, dtype=np.int64)
+        self.table = np.asarray(table, dtype=np.float32)
+        self.bucket = bucket
+        self.tier_edges = np.asarray(tier_edges, dtype=np.float64)
+        self.quantiles = tuple(quantiles)
+        self.meta = meta or {}
+        self._order = np.argsort(self.zone_ids)
+
+    def bucket_index(self, pred_log: np.ndarray, week_hour: np.ndarray) -> np.ndarray:
+        if self.bucket == "zone_week_hour":
+            return np.asarray(week_hour, dtype=np.int64)
+        return np.searchsorted(self.tier_edges, pred_log, side="right")
+
+    def zone_index(self, zones: np.ndarray) -> np.ndarray:
+        zones = np.asarray(zones, dtype=np.int64)
+        sorted_ids = self.zone_ids[self._order]
+        pos = np.clip(np.searchsorted(sorted_ids, zones), 0, len(sorted_ids) - 1)
+        idx = self._order[pos]
+        # Unknown zones use the last row, which holds the pooled (all-zone) quantiles.
+        return np.where(sorted_ids[pos] == zones, idx, len(self.zone_ids))
+
+    def bounds_log(self, zones: np.ndarray, pred_log: np.ndarray, week_hour: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        q = self.table[self.zone_index(zones), self.bucket_index(pred_log, week_hour)]
+        return pred_log + q[:, 0], pred_log + q[:, 1]
+
+    def bounds(self, zones: np.ndarray, pred_log: np.ndarray, week_hour: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        lo, hi = self.bounds_log(zones, pred_log, week_hour)
+        return np.clip(np.expm1(lo), 0, None), np.clip(np.expm1(hi), 0, None)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            zone_ids=self.zone_ids,
+            table=self.table,
+            tier_edges=self.tier_edges,
+            quantiles=np.array(self.quantiles),
+            meta=np.array(json.dumps({**self.meta, "bucket": self.bucket})),
+        )
+
+
+def load_intervals(path: str | Path = INTERVALS_DEFAULT) -> IntervalTable:
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        return IntervalTable(
+            data["zone_ids"],
+            data["table"],
+            meta["bucket"],
+            data["tier_edges"],
+            tuple(data["quantiles"].tolist()),
+            meta,
+        )
+
+
+def build_table(
+    zones: np.ndarray,
+    week_hour: np.ndarray,
+    pred_log: np.ndarray,
+    residual_log: np.ndarray,
+    bucket: str = "zone_tier",
+    n_tiers: int = N_TIERS,
+    quantiles: tuple[float, float] = QUANTILES,
+    min_samples: int = MIN_BUCKET_SAMPLES,
+) -> IntervalTable:
+    zone_ids = np.unique(zones.astype(np.int64))
+    if bucket == "zone_week_hour":
+        tier_edges = np.zeros(0)
+        n_buckets = WEEK_HOURS
+    else:
+        tier_edges = np.quantile(pred_log, np.linspace(0, 1, n_tiers + 1)[1:-1])
+        n_buckets = n_tiers
+    shell = IntervalTable(zone_ids, np.zeros((len(zone_ids) + 1, n_buckets, 2)), bucket, tier_edges, quantiles)
+    z_idx = shell.zone_index(zones)
+    b_idx = shell.bucket_index(pred_log, week_hour)
+
+    # One sort by (zone, bucket) so every cell's residuals are a contiguous slice.
+    cell = z_idx * n_buckets + b_idx
+    order = np.lexsort((residual_log, cell))
+    cell_sorted = cell[order]
+    res_sorted = residual_log[order]
+    starts = np.searchsorted(cell_sorted, np.arange(len(zone_ids) * n_buckets))
+    ends = np.searchsorted(cell_sorted, np.arange(len(zone_ids) * n_buckets), side="right")
+
+    pooled = np.quantile(residual_log, quantiles)
+    table = np.empty((len(zone_ids) + 1, n_buckets, 2), dtype=np.float32)
+    table[-1] = pooled
+    for z in range(len(zone_ids)):
+        zone_res = residual_log[z_idx == z]
+        zone_q = np.quantile(zone_res, quantiles) if len(zone_res) >= min_samples else pooled
+        for b in range(n_buckets):
+            c = z * n_buckets + b
+            n = ends[c] - starts[c]
+            table[z, b] = np.quantile(res_sorted[starts[c] : ends[c]], quantiles) if n >= min_samples else zone_q
+    shell.table = table
+    return shell
+
+
+def coverage(table: IntervalTable, zones, week_hour, pred_log, y_log) -> dict[str, float]:
+    lo, hi = table.bounds_log(zones, pred_log, week_hour)
+    inside = (y_log >= lo) & (y_log <= hi)
+    report = {"overall": float(inside.mean())}
+    tiers = np.searchsorted(np.quantile(pred_log, [0.25, 0.5, 0.75]), pred_log, side="right")
+    for t in range(4):
+        mask = tiers == t
+        if mask.any():
+            report[f"volume_q{t + 1}"] = float(inside[mask].mean())
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build conformal residual-quantile tables for forecast intervals.")
+    parser.add_argument("--features-path", default="data/processed/features_hourly.parquet")
+    parser.add_argument("--model-path", default="", help="LightGBM model (default: registry production).")
+    parser.add_argument("--registry", default="models/registry.json")
+    parser.add_argument("--bucket", choices=["zone_tier", "zone_week_hour"], default="zone_tier")
+    parser.add_argument("--tiers", type=int, default=N_TIERS)
+    parser.add_argument("--min-samples", type=int, default=MIN_BUCKET_SAMPLES)
+    parser.add_argument("--out", default=INTERVALS_DEFAULT)
+    args = parser.parse_args()
+
+    import lightgbm as lgb
+    import pandas as pd
+
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training" / "tree_based_models"))
+    from lightgbm_week_hour import prepare_split
+
+    model_path = args.model_path
+    if not model_path:
+        from model_registry import resolve_stage
+
+        entry = resolve_stage(registry_path=args.registry)
+        if entry is None:
+            raise SystemExit("No --model-path and no production model in the registry.")
+        model_path = entry["model_path"]
+
+    df = pd.read_parquet(args.features_path)
+    hours = df["hour"]
+    cutoff = hours.max() - pd.Timedelta(days=28)
+    _, _, X_val, y_val = prepare_split(df, cutoff)
+    val_hours = hours[hours >= cutoff].to_numpy()
+    del df
+
+    booster = lgb.Booster(model_file=model_path)
+    pred_log = booster.predict(X_val)
+    y_log = np.log1p(y_val.to_numpy(dtype=np.float64))
+    zones = X_val["PULocationID"].astype(int).to_numpy()
+    week_hour = X_val["week_hour"].astype(int).to_numpy()
+    residual = y_log - pred_log
+
+    # Calibrate on the first half of the validation window, measure coverage on the second half.
+    mid = val_hours.min() + (val_hours.max() - val_hours.min()) / 2
+    calib = val_hours < mid
+    kwargs = dict(bucket=args.bucket, n_tiers=args.tiers, min_samples=args.min_samples)
+    held_out = build_table(zones[calib], week_hour[calib], pred_log[calib], residual[calib], **kwargs)
+    test = ~calib
+    cov = coverage(held_out, zones[test], week_hour[test], pred_log[test], y_log[test])
+
+    table = build_table(zones, week_hour, pred_log, residual, **kwargs)
+    target = QUANTILES[1] - QUANTILES[0]
+    table.meta = {
+        "model_path": str(model_path),
+        "target_coverage": target,
+        "holdout_coverage": cov,
+        "calibration_rows": int(len(residual)),
+    }
+    table.save(args.out)
+
+    print("target coverage:", f"{target:.2f}")
+    for name, value in cov.items():
+        print(f"coverage {name}: {value:.3f}")
+    print("table:", table.table.shape, f"{table.table.nbytes / 1024:.1f} KiB")
+    print("saved:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+SMAPE_EPS = 1e-8
+
+
+def abs_errors(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+    return np.abs(np.asarray(y_pred, dtype=np.float64) - np.asarray(y_true, dtype=np.float64))
+
+
+def smape_terms(y_true: np.ndarray, y_pred: np.ndarray) -> np.ndarray:
+    """Per-row 2|p - y| / (|p| + |y|); rows where both are zero contribute 0."""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    return 2 * np.abs(y_pred - y_true) / (np.abs(y_pred) + np.abs(y_true) + SMAPE_EPS)
+
+
+def mae(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    return float(np.mean(abs_errors(y_true, y_pred)))
+
+
+def smape(y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    """Symmetric MAPE as a fraction (0.25 = 25%), the convention every trainer reports."""
+    return float(np.mean(smape_terms(y_true, y_pred)))
+
+
+def grouped_errors(y_true: np.ndarray, y_pred: np.ndarray, codes: np.ndarray, n_groups: int) -> dict[str, np.ndarray]:
+    """n, MAE and sMAPE per group in one bincount pass each.
+
+    y_pred may be 2-D (models x rows) to score several models against the same actuals;
+    codes are dense 0..n_groups-1 ids (zone index, hour of day, horizon day, ...).
+    """
+    y_pred = np.atleast_2d(np.asarray(y_pred, dtype=np.float64))
+    codes = np.asarray(codes, dtype=np.int64)
+    n = np.bincount(codes, minlength=n_groups).astype(np.float64)
+    abs_err = abs_errors(y_true, y_pred)
+    terms = smape_terms(y_true, y_pred)
+    # Offsetting each model's codes by m * n_groups folds every model into one bincount.
+    offsets = (np.arange(len(y_pred)) * n_groups)[:, None]
+    flat = (codes[None, :] + offsets).ravel()
+    size = len(y_pred) * n_groups
+    abs_sum = np.bincount(flat, weights=abs_err.ravel(), minlength=size).reshape(len(y_pred), n_groups)
+    smape_sum = np.bincount(flat, weights=terms.ravel(), minlength=size).reshape(len(y_pred), n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {"n": n, "MAE": abs_sum / n, "sMAPE": smape_sum / n}
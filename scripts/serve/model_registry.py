@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+REGISTRY_DEFAULT = "models/registry.json"
+PRODUCTION = "production"
+
+
+def file_sha256(path: str | Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def atomic_write_text(path: str | Path, text: str) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def atomic_copy(src: str | Path, dst: str | Path) -> None:
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, prefix=f".{dst.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def load_registry(path: str | Path = REGISTRY_DEFAULT) -> dict:
+    path = Path(path)
+    if not path.exists():
+        return {"models": {}, "stages": {}}
+    return json.loads(path.read_text())
+
+
+def save_registry(registry: dict, path: str | Path = REGISTRY_DEFAULT) -> None:
+    atomic_write_text(path, json.dumps(registry, indent=2, sort_keys=True))
+
+
+def _relative(path: Path, root: Path) -> str:
+    try:
+        return str(path.resolve().relative_to(root.resolve()))
+    except ValueError:
+        return str(path.resolve())
+
+
+def resolve_path(entry_path: str, registry_path: str | Path = REGISTRY_DEFAULT) -> Path:
+    p = Path(entry_path)
+    return p if p.is_absolute() else Path(registry_path).parent / p
+
+
+def register_model(
+    model_path: str | Path,
+    run_id: str,
+    features: list[str],
+    metrics: dict[str, float],
+    data_hash: str = "",
+    registry_path: str | Path = REGISTRY_DEFAULT,
+    compile_model: bool = True,
+) -> dict:
+    """Record a trained LightGBM text model and store its compiled (memory-mappable) form next to it.
+
+    Serving only loads the compiled form with --backend compiled; LightGBM stays the default.
+    """
+    model_path = Path(model_path)
+    root = Path(registry_path).parent
+    entry = {
+        "run_id": run_id,
+        "model_path": _relative(model_path, root),
+        "content_hash": file_sha256(model_path),
+        "features": list(features),
+        "data_hash": data_hash,
+        "metrics": {k: float(v) for k, v in metrics.items()},
+        "registered_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+    if compile_model:
+        import lightgbm as lgb
+
+        from compiled_model import compile_booster, default_compiled_dir, save_compiled
+
+        compiled_dir = default_compiled_dir(model_path)
+        arrays, meta = compile_booster(lgb.Booster(model_file=str(model_path)))
+        meta["source_content_hash"] = entry["content_hash"]
+        save_compiled(arrays, meta, compiled_dir)
+        entry["compiled_path"] = _relative(compiled_dir, root)
+
+    registry = load_registry(registry_path)
+    registry["models"][run_id] = entry
+    save_registry(registry, registry_path)
+    return entry
+
+
+def promote(run_id: str, stage: str = PRODUCTION, registry_path: str | Path = REGISTRY_DEFAULT) -> dict:
+    registry = load_registry(registry_path)
+    if run_id not in registry["models"]:
+        raise KeyError(f"Unknown run_id {run_id!r} in {registry_path}")
+    entry = registry["models"][run_id]
+    model_path = resolve_path(entry["model_path"], registry_path)
+    if file_sha256(model_path) != entry["content_hash"]:
+        raise ValueError(f"Content hash mismatch for {model_path}; refusing to promote.")
+    registry["stages"][stage] = {
+        "run_id": run_id,
+        "promoted_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # Single os.replace of the index: readers see either the old or the new stage, never a mix.
+    save_registry(registry, registry_path)
+    return entry
+
+
+def resolve_stage(stage: str = PRODUCTION, registry_path: str | Path = REGISTRY_DEFAULT) -> dict | None:
+    registry = load_registry(registry_path)
+    pointer = registry.get("stages", {}).get(stage)
+    if not pointer:
+        return None
+    entry = dict(registry["models"][pointer["run_id"]])
+    entry["model_path"] = str(resolve_path(entry["model_path"], registry_path))
+    if entry.get("compiled_path"):
+        entry["compiled_path"] = str(resolve_path(entry["compiled_path"], registry_path))
+    return entry
+
+
+def parse_metrics_file(path: str | Path) -> dict[str, float]:
+    metrics: dict[str, float] = {}
+    for line in Path(path).read_text().splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            metrics[key.strip()] = float(value)
+    return metrics
+
+
+def measure_cold_load(entry: dict) -> dict[str, float]:
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+    import lightgbm as lgb
+
+    timings["lightgbm_import_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    lgb.Booster(model_file=entry["model_path"])
+    timings["text_load_s"] = time.perf_counter() - start
+    if entry.get("compiled_path"):
+        from compiled_model import load_compiled
+
+        start = time.perf_counter()
+        load_compiled(entry["compiled_path"])
+        timings["compiled_load_s"] = time.perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Model registry: register, promote and inspect models.")
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    reg = sub.add_parser("register", help="Register an existing LightGBM text model.")
+    reg.add_argument("--model-path", required=True)
+    reg.add_argument("--run-id", default="", help="Default: parsed from the model filename.")
+    reg.add_argument("--metrics-path", default="", help="Metrics txt written by the trainer.")
+    reg.add_argument("--features-path", default="", help="Features parquet to hash as the data version.")
+    reg.add_argument("--no-compile", action="store_true")
+    reg.add_argument("--promote", action="store_true", help="Promote to production after registering.")
+
+    pro = sub.add_parser("promote", help="Atomically point a stage at a registered run.")
+    pro.add_argument("run_id")
+    pro.add_argument("--stage", default=PRODUCTION)
+
+    show = sub.add_parser("show", help="Print the model behind a stage.")
+    show.add_argument("--stage", default=PRODUCTION)
+    show.add_argument("--time-load", action="store_true", help="Measure cold model load time.")
+    args = parser.parse_args()
+
+    if args.command == "register":
+        import lightgbm as lgb
+
+        model_path = Path(args.model_path)
+        run_id = args.run_id or model_path.stem.replace("lightgbm_week_hour_", "")
+        metrics = parse_metrics_file(args.metrics_path) if args.metrics_path else {}
+        data_hash = file_sha256(args.features_path) if args.features_path else ""
+        features = lgb.Booster(model_file=str(model_path)).feature_name()
+        entry = register_model(
+            model_path,
+            run_id,
+            features,
+            metrics,
+            data_hash=data_hash,
+            registry_path=args.registry,
+            compile_model=not args.no_compile,
+        )
+        print("registered:", run_id, entry["content_hash"][:12])
+        if args.promote:
+            promote(run_id, PRODUCTION, args.registry)
+            print("promoted:", run_id, "->", PRODUCTION)
+    elif args.command == "promote":
+        promote(args.run_id, args.stage, args.registry)
+        print("promoted:", args.run_id, "->", args.stage)
+    elif args.command == "show":
+        entry = resolve_stage(args.stage, args.registry)
+        if entry is None:
+            raise SystemExit(f"No model promoted to {args.stage!r} in {args.registry}")
+        print(json.dumps(entry, indent=2))
+        if args.time_load:
+            for name, seconds in measure_cold_load(entry).items():
+                print(f"{name}: {seconds:.4f}")
+
+
+if __name__ == "__main__":
+    main()
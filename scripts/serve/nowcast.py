@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from forecast_archive import ARCHIVE_DEFAULT, ARCHIVE_PREFIX, MAX_HORIZON_HOURS, archive_start
+from instrumentation import Tracer, add_trace_args, stage
+
+
+NOWCAST_DEFAULT = "data/serving/nowcast_state.npz"
+ACTUALS_DEFAULT = "data/processed/tlc_hourly_zone_live.parquet"
+# Weight of the newest hour's residual in the exponentially weighted state.
+ALPHA_DEFAULT = 0.3
+# Share of the correction kept per hour ahead: 0.9 leaves ~35% at 10 hours and ~1% at 48.
+DECAY_DEFAULT = 0.9
+# One hour's log-space residual is clipped to +-1 (~2.7x) so a feed glitch cannot swing a zone.
+RESIDUAL_CLIP = 1.0
+WARMUP_HOURS = 24
+# State older than this says nothing about the next forecast; generate_forecast then skips it.
+MAX_STALE_HOURS = 12
+# Metadata key stream_tlc.py writes its state under; hours past its watermark can still change.
+STREAM_STATE_KEY = b"stream_tlc"
+
+
+class NowcastState:
+    """Per-zone exponentially weighted log1p residual (actual - model) as of `last_hour` (naive local)."""
+
+    def __init__(self, zone_ids: np.ndarray, residual: np.ndarray, last_hour: np.datetime64 | None, meta: dict):
+        self.zone_ids = np.asarray(zone_ids, dtype=np.int64)
+        self.residual = np.asarray(residual, dtype=np.float64)
+        self.last_hour = last_hour
+        self.meta = meta
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NowcastState | None":
+        path = Path(path)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            last_hour = data["last_hour"][()] if data["last_hour"].size else None
+            return cls(data["zone_ids"], data["residual"], last_hour, meta)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    zone_ids=self.zone_ids.astype(np.int32),
+                    residual=self.residual,
+                    last_hour=np.array([] if self.last_hour is None else self.last_hour, dtype="datetime64[s]"),
+                    meta=np.array(json.dumps(self.meta)),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+
+def apply_nowcast(
+    pred_log: np.ndarray, zone_ids: np.ndarray, first_hour: datetime, state: NowcastState
+) -> tuple[np.ndarray, dict]:
+    """Shift the [zone, hour] log1p forecast by each zone's residual, fading with hours ahead.
+
+    The forecast hour h hours after the last observed hour gets residual * decay**h. The cost is one
+    broadcast multiply-add over zones x horizon. The model is not re-run.
+    """
+    if state.last_hour is None:
+        return pred_log, {"applied": False, "reason": "empty state"}
+    lag = int((np.datetime64(first_hour.replace(tzinfo=None), "s") - state.last_hour) // np.timedelta64(1, "h"))
+    meta = {"last_observed_hour": str(state.last_hour), "lag_hours": lag}
+    if lag < 1 or lag > MAX_STALE_HOURS:
+        return pred_log, {**meta, "applied": False, "reason": "stale" if lag > MAX_STALE_HOURS else "overlaps"}
+    residual = np.zeros(len(zone_ids))
+    pos = {z: i for i, z in enumerate(state.zone_ids.tolist())}
+    rows = np.array([pos.get(int(z), -1) for z in zone_ids])
+    residual[rows >= 0] = state.residual[rows[rows >= 0]]
+    decay = float(state.meta.get("decay", DECAY_DEFAULT))
+    weights = decay ** (lag + np.arange(pred_log.shape[1]))
+    correction = residual[:, None] * weights[None, :]
+    return pred_log + correction, {
+        **meta,
+        "applied": True,
+        "decay": decay,
+        "zones": int((rows >= 0).sum()),
+        "mean_abs_correction_h1": round(float(np.abs(correction[:, 0]).mean()), 4),
+    }
+
+
+def final_hours_before(actuals_path: str | Path):
+    """Stream watermark of the actuals table (hours before it are closed), or None for a batch table."""
+    import pyarrow.parquet as pq
+
+    metadata = pq.read_schema(actuals_path).metadata or {}
+    if STREAM_STATE_KEY not in metadata:
+        return None
+    watermark = json.loads(metadata[STREAM_STATE_KEY]).get("watermark")
+    return np.datetime64(watermark, "s") if watermark else None
+
+
+def model_predictions(archive_dir: str | Path, hours: np.ndarray, zone_ids: np.ndarray) -> np.ndarray:
+    """[zone, hour] model counts for `hours`, from the freshest archived forecast covering each hour.
+
+    Archives keep the raw model output next to the served (corrected) one, so residuals never
+    measure the nowcast's own adjustment. Cells no archive covers stay NaN.
+    """
+    pred = np.full((len(zone_ids), len(hours)), np.nan)
+    pos = {z: i for i, z in enumerate(zone_ids.tolist())}
+    first, last = hours.min(), hours.max()
+    for path in sorted(Path(archive_dir).glob(f"{ARCHIVE_PREFIX}*.npz")):
+        try:
+            start = np.datetime64(archive_start(path), "s")
+        except ValueError:
+            continue
+        # Sorted by start, so later (fresher) archives overwrite earlier ones.
+        if start > last:
+            break
+        # Chosen by file name first, as accuracy_monitor.pending_archives does: the cost stays
+        # bounded by the archives that can reach `hours`, not by the whole history.
+        if start + np.timedelta64(MAX_HORIZON_HOURS, "h") <= first:
+            continue
+        with np.load(path) as data:
+            archive_hours = data["hours"].astype("datetime64[s]")
+            if archive_hours[-1] < first:
+                continue
+            values = data["model_predictions"] if "model_predictions" in data else data["predictions"]
+            cols = np.searchsorted(hours, archive_hours)
+            hit = (cols < len(hours)) & (hours[np.minimum(cols, len(hours) - 1)] == archive_hours)
+            rows = np.array([pos.get(int(z), -1) for z in data["zone_ids"]])
+            ok = rows >= 0
+            pred[np.ix_(rows[ok], cols[hit])] = values[np.ix_(ok, hit)]
+    return pred
+
+
+def update_state(
+    state: NowcastState | None,
+    actuals_path: str | Path,
+    archive_dir: str | Path,
+    alpha: float = ALPHA_DEFAULT,
+    decay: float = DECAY_DEFAULT,
+) -> tuple[NowcastState, int]:
+    """Fold every closed hour after state.last_hour into the residual state; returns (state, hours folded)."""
+    import pandas as pd
+
+    closed_before = final_hours_before(actuals_path)
+    filters = []
+    if state is not None and state.last_hour is not None:
+        filters.append(("hour", ">", pd.Timestamp(state.last_hour)))
+    if closed_before is not None:
+        filters.append(("hour", "<", pd.Timestamp(closed_before)))
+    df = pd.read_parquet(actuals_path, columns=["hour", "PULocationID", "trip_count"], filters=filters or None)
+    if state is None or state.last_hour is None:
+        # Cold start: seed from the trailing warmup window only.
+        if len(df):
+            df = df[df["hour"] > df["hour"].max() - pd.Timedelta(hours=WARMUP_HOURS)]
+    if state is None:
+        zone_ids = np.sort(df["PULocationID"].unique()).astype(np.int64)
+        state = NowcastState(zone_ids, np.zeros(len(zone_ids)), None, {})
+    if df.empty:
+        return state, 0
+
+    hours = np.sort(df["hour"].unique()).astype("datetime64[s]")
+    pos = {z: i for i, z in enumerate(state.zone_ids.tolist())}
+    # Zones with no row in an hour had zero trips, the same convention accuracy_monitor.py uses.
+    actual = np.zeros((len(state.zone_ids), len(hours)))
+    rows = df["PULocationID"].map(pos)
+    known = rows.notna().to_numpy()
+    cols = np.searchsorted(hours, df["hour"].to_numpy().astype("datetime64[s]"))
+    np.add.at(actual, (rows[known].to_numpy(dtype=np.int64), cols[known]), df["trip_count"].to_numpy()[known])
+    pred = model_predictions(archive_dir, hours, state.zone_ids)
+
+    residual = state.residual.copy()
+    last = state.last_hour
+    folded = 0
+    for h, hour in enumerate(hours):
+        # Hours with no observation in between still fade the state, as they would the correction.
+        if last is not None:
+            residual *= decay ** max(int((hour - last) // np.timedelta64(1, "h")) - 1, 0)
+        have = np.isfinite(pred[:, h])
+        if have.any():
+            err = np.clip(np.log1p(actual[have, h]) - np.log1p(np.maximum(pred[have, h], 0)), -RESIDUAL_CLIP, RESIDUAL_CLIP)
+            residual[have] = (1 - alpha) * residual[have] + alpha * err
+            folded += 1
+        last = hour
+    meta = {
+        **state.meta,
+        "alpha": alpha,
+        "decay": decay,
+        "actuals": str(actuals_path),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "hours_folded": state.meta.get("hours_folded", 0) + folded,
+    }
+    return NowcastState(state.zone_ids, residual, last, meta), folded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Update the per-zone nowcast residual state from the latest actuals.")
+    parser.add_argument("--state", default=NOWCAST_DEFAULT)
+    parser.add_argument(
+        "--actuals",
+        default=ACTUALS_DEFAULT,
+        help="Hourly zone counts; with stream_tlc.py's table only hours before its watermark are used.",
+    )
+    parser.add_argument("--archive-dir", default=ARCHIVE_DEFAULT, help="Forecast archive from generate_forecast.py.")
+    parser.add_argument("--alpha", type=float, default=ALPHA_DEFAULT, help="Weight of each new hour's residual.")
+    parser.add_argument("--decay", type=float, default=DECAY_DEFAULT, help="Correction kept per hour ahead.")
+    parser.add_argument("--reset", action="store_true", help="Discard the saved state and warm up again.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("nowcast", args):
+        state = None if args.reset else NowcastState.load(args.state)
+        with stage("update") as st:
+            state, folded = update_state(state, args.actuals, args.archive_dir, args.alpha, args.decay)
+            st.rows_out = folded
+        if not folded:
+            print("no new closed hours with archived forecasts; state unchanged")
+            return
+        state.save(args.state)
+        print(f"folded {folded} hour(s); last observed hour {state.last_hour}")
+        print(
+            f"residual (log1p): mean {state.residual.mean():+.3f}, "
+            f"|mean| {np.abs(state.residual).mean():.3f}, zones {len(state.zone_ids)}"
+        )
+        print("saved:", args.state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+PREDICTION_CACHE_DEFAULT = "data/cache/prediction_cache.npz"
+WEATHER_COLS = ["temperature", "relative_humidity", "precipitation", "wind_speed"]
+# Absolute change per weather input that still reuses a cached hour (deg C, %, mm, km/h).
+DEFAULT_TOLERANCE = {"temperature": 0.5, "relative_humidity": 3.0, "precipitation": 0.1, "wind_speed": 1.5}
+
+
+def parse_tolerance(spec: str) -> np.ndarray:
+    """'temperature=0.5,wind_speed=2' -> tolerance vector aligned with WEATHER_COLS (unset keys use defaults)."""
+    tol = dict(DEFAULT_TOLERANCE)
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        name, value = item.split("=")
+        if name not in tol:
+            raise ValueError(f"Unknown weather column in tolerance: {name}")
+        tol[name] = float(value)
+    return np.array([tol[c] for c in WEATHER_COLS], dtype=np.float64)
+
+
+def model_content_hash(path: str | Path) -> str:
+    """Hash of the bytes a model path serves, so a model rebuilt in place at the same path gets a new key.
+
+    A file is hashed as is; a sharded router JSON also covers every shard model it names; a directory
+    (compiled arrays + meta) covers every file under it.
+    """
+    from model_registry import file_sha256
+
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_dir():
+        for member in sorted(p for p in path.rglob("*") if p.is_file()):
+            digest.update(member.relative_to(path).as_posix().encode())
+            digest.update(file_sha256(member).encode())
+    elif path.is_file():
+        digest.update(file_sha256(path).encode())
+        if path.suffix == ".json":
+            router = json.loads(path.read_text())
+            for name, shard in sorted(router.get("shards", {}).items()):
+                digest.update(name.encode())
+                digest.update(file_sha256(path.parent / shard["model_path"]).encode())
+    else:
+        raise FileNotFoundError(f"Model path not found: {path}")
+    return digest.hexdigest()
+
+
+def cache_key(model_paths, baseline: np.ndarray, zone_ids: np.ndarray) -> str:
+    """Everything besides weather and the hour that feeds the grid: model bytes, baseline values, zone list.
+
+    model_paths is one path or several (e.g. a text model and the compiled directory actually served).
+    """
+    if isinstance(model_paths, (str, Path)):
+        model_paths = [model_paths]
+    digest = hashlib.sha256()
+    for path in model_paths:
+        digest.update(model_content_hash(path).encode())
+    digest.update(np.ascontiguousarray(baseline, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(zone_ids, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Raw (log-space) predictions per forecast hour, with the weather they were computed from."""
+
+    def __init__(self, key: str, hours: list[str], weather: np.ndarray, pred_log: np.ndarray):
+        self.key = key
+        self.hours = list(hours)
+        self.weather = np.asarray(weather, dtype=np.float64).reshape(len(self.hours), len(WEATHER_COLS))
+        self.pred_log = np.asarray(pred_log, dtype=np.float64)
+        self._pos = {h: i for i, h in enumerate(self.hours)}
+
+    @classmethod
+    def empty(cls, key: str, n_zones: int) -> "PredictionCache":
+        return cls(key, [], np.zeros((0, len(WEATHER_COLS))), np.zeros((n_zones, 0)))
+
+    @classmethod
+    def load(cls, path: str | Path, key: str, n_zones: int) -> "PredictionCache":
+        """A missing file, another model/baseline, or an unreadable file all start from an empty cache."""
+        path = Path(path)
+        if not path.exists():
+            return cls.empty(key, n_zones)
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta["key"] != key or data["pred_log"].shape[0] != n_zones:
+                    return cls.empty(key, n_zones)
+                return cls(key, meta["hours"], data["weather"], data["pred_log"])
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"prediction cache unreadable ({exc}); starting empty")
+            return cls.empty(key, n_zones)
+
+    def lookup(self, hours: list[str], weather: np.ndarray, tolerance: np.ndarray) -> tuple[np.ndarray, dict]:
+        """Cache column per requested hour (-1 = recompute) and hit/miss counts."""
+        cols = np.array([self._pos.get(h, -1) for h in hours], dtype=np.int64)
+        known = cols >= 0
+        n_changed = 0
+        if known.any():
+            old = self.weather[cols[known]]
+            new = np.asarray(weather, dtype=np.float64)[known]
+            rain = WEATHER_COLS.index("precipitation")
+            changed = (np.abs(new - old) > tolerance).any(axis=1) | ((new[:, rain] > 0) != (old[:, rain] > 0))
+            stale = np.flatnonzero(known)[changed]
+            cols[stale] = -1
+            n_changed = int(changed.sum())
+        hits = int((cols >= 0).sum())
+        stats = {
+            "hits": hits,
+            "misses": len(hours) - hits,
+            "new_hours": int((~known).sum()),
+            "weather_changed": n_changed,
+        }
+        return cols, stats
+
+    def refreshed(self, hours: list[str], weather: np.ndarray, pred_log: np.ndarray, cols: np.ndarray) -> "PredictionCache":
+        """Cache for this horizon: hits keep the weather they were predicted with, so drift cannot accumulate."""
+        weather = np.array(weather, dtype=np.float64)
+        hit = cols >= 0
+        weather[hit] = self.weather[cols[hit]]
+        return PredictionCache(self.key, hours, weather, pred_log)
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    weather=self.weather,
+                    pred_log=self.pred_log,
+                    meta=np.array(json.dumps({"key": self.key, "hours": self.hours})),
+                )
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
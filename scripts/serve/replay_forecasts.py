@@ -0,0 +1,255 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from generate_forecast import (
+    BASELINE_BIN_DEFAULT,
+    BASELINE_DEFAULT,
+    BASELINE_META_DEFAULT,
+    FEATURES_DEFAULT,
+    HORIZON_DEFAULT,
+    INTERVALS_DEFAULT,
+    REGISTRY_DEFAULT,
+    add_backend_arg,
+    baseline_matrix,
+    calendar_features,
+    load_serving_baseline,
+    model_source,
+    predict_grid,
+    resolve_model,
+    to_counts,
+)
+from instrumentation import Tracer, add_trace_args, stage
+from model_registry import atomic_write_text
+from prediction_cache import WEATHER_COLS
+
+
+REPLAY_DEFAULT = "data/replay"
+CHUNK_HOURS = 24 * 28
+
+_worker: dict = {}
+
+
+def load_historical_weather(features_path: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """Observed hourly weather from the feature store on [start, end); interior gaps are forward-filled."""
+    df = pd.read_parquet(
+        features_path,
+        columns=["hour"] + WEATHER_COLS,
+        filters=[("hour", ">=", start), ("hour", "<", end)],
+    )
+    weather = df.drop_duplicates("hour").set_index("hour").sort_index()
+    if weather.empty:
+        raise ValueError(f"No weather in {features_path} between {start} and {end}.")
+    full = pd.date_range(weather.index.min(), weather.index.max(), freq="h")
+    missing = len(full) - len(weather)
+    if missing:
+        print(f"weather: forward-filling {missing} missing hours")
+    return weather.reindex(full).ffill().rename_axis("hour").reset_index()
+
+
+def _init_worker(model_args: dict, baseline_args: dict, threads: int) -> None:
+    # Spawned workers have not loaded OpenMP yet; cap its threads so workers do not oversubscribe cores.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    model, _, _, _ = resolve_model(**model_args)
+    baseline, global_mean, zone_ids, _ = load_serving_baseline(**baseline_args)
+    _worker.update(
+        model=model,
+        zone_ids=zone_ids,
+        global_mean=global_mean,
+        baseline=baseline_matrix(baseline, zone_ids, global_mean),
+    )
+
+
+def predict_chunk(weather_chunk: pd.DataFrame) -> np.ndarray:
+    """Raw predictions [zone, hour] for a block of target hours."""
+    w = _worker
+    return predict_grid(w["model"], w["zone_ids"], weather_chunk.reset_index(drop=True), w["baseline"], w["global_mean"])
+
+
+def write_origin_day(
+    out_dir: str,
+    day: str,
+    origins: np.ndarray,
+    hours: np.ndarray,
+    zone_ids: np.ndarray,
+    counts: np.ndarray,
+    bounds: tuple[np.ndarray, np.ndarray] | None,
+    horizon: int,
+) -> int:
+    """One partition: every origin of the day x zone x hours_ahead; counts/hours start at the first origin + 1h."""
+    n_origins, n_zones = len(origins), len(zone_ids)
+    # window[o, z, k] = target hour (origin o + k + 1); origins are consecutive hours.
+    offsets = np.arange(n_origins)[:, None] + np.arange(horizon)[None, :]
+    origin_idx = np.repeat(np.arange(n_origins), n_zones * horizon)
+    target_idx = np.tile(offsets[:, None, :], (1, n_zones, 1)).ravel()
+    zone_idx = np.tile(np.repeat(np.arange(n_zones), horizon), n_origins)
+    df = pd.DataFrame(
+        {
+            "origin": origins[origin_idx],
+            "hour": hours[target_idx],
+            "hours_ahead": np.tile(np.arange(1, horizon + 1, dtype=np.int16), n_origins * n_zones),
+            "PULocationID": zone_ids[zone_idx].astype(np.int32),
+            "prediction": counts[zone_idx, target_idx].astype(np.int32),
+        }
+    )
+    if bounds is not None:
+        df["p10"] = bounds[0][zone_idx, target_idx].astype(np.int32)
+        df["p90"] = bounds[1][zone_idx, target_idx].astype(np.int32)
+    part_dir = Path(out_dir) / f"origin_date={day}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    tmp = part_dir / ".part-0.parquet.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, part_dir / "part-0.parquet")
+    return len(df)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay hourly forecast origins over history into a partitioned store.")
+    parser.add_argument("--start", required=True, help="First forecast origin (local time), e.g. 2024-01-01.")
+    parser.add_argument("--end", required=True, help="Origins up to (excluding) this time.")
+    parser.add_argument("--horizon-hours", type=int, default=HORIZON_DEFAULT)
+    parser.add_argument("--out-dir", default=REPLAY_DEFAULT)
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-hours", type=int, default=CHUNK_HOURS, help="Target hours per predict batch.")
+    parser.add_argument("--features-path", default=FEATURES_DEFAULT, help="Feature store with observed weather.")
+    parser.add_argument("--model-path", default="")
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT)
+    parser.add_argument("--compiled-model", default="")
+    add_backend_arg(parser)
+    parser.add_argument("--shard-router", default="")
+    parser.add_argument("--baseline-bin", default=BASELINE_BIN_DEFAULT)
+    parser.add_argument("--baseline-path", default=BASELINE_DEFAULT)
+    parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT)
+    parser.add_argument("--intervals", default=INTERVALS_DEFAULT, help="Adds p10/p90 when the file exists.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("replay_forecasts", args):
+        horizon = args.horizon_hours
+        origins = pd.date_range(args.start, args.end, freq="h", inclusive="left")
+        with stage("load weather") as st:
+            weather = load_historical_weather(
+                args.features_path, origins[0] + pd.Timedelta(hours=1), origins[-1] + pd.Timedelta(hours=horizon + 1)
+            )
+            st.rows_out = len(weather)
+        # Origins need a full horizon of observed weather after them.
+        first, last = weather["hour"].iloc[0], weather["hour"].iloc[-1]
+        keep = (origins + pd.Timedelta(hours=1) >= first) & (origins + pd.Timedelta(hours=horizon) <= last)
+        if not keep.all():
+            print(f"dropping {int((~keep).sum())} origins without {horizon}h of weather in the feature store")
+        origins = origins[keep]
+        if len(origins) == 0:
+            raise SystemExit("No origins with a full horizon of historical weather.")
+        weather = weather[
+            (weather["hour"] > origins[0]) & (weather["hour"] <= origins[-1] + pd.Timedelta(hours=horizon))
+        ].reset_index(drop=True)
+
+        model_args = {
+            "model_path": args.model_path,
+            "registry_path": args.registry,
+            "compiled_model_dir": args.compiled_model,
+            "shard_router": args.shard_router,
+            "backend": args.backend,
+        }
+        baseline_args = {
+            "baseline_path": args.baseline_path,
+            "baseline_meta": args.baseline_meta,
+            "features_path": args.features_path,
+            "baseline_bin": args.baseline_bin,
+        }
+        _, _, zone_ids, _ = load_serving_baseline(**baseline_args)
+        # Only the workers load the model. They get the resolved paths, so a promotion mid-run
+        # cannot give them a different model from the one the manifest names.
+        model_run_id, model_path, compiled_model_dir = model_source(**model_args)
+        model_args.update(model_path=model_path, compiled_model_dir=compiled_model_dir)
+        workers = args.workers or os.cpu_count() or 1
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        # Features do not depend on the origin, so each target hour is predicted once for all the
+        # origins whose horizon covers it; origins are then sliding windows over the target axis.
+        start = time.perf_counter()
+        chunks = [weather.iloc[i : i + args.chunk_hours] for i in range(0, len(weather), args.chunk_hours)]
+        ctx = mp.get_context("spawn")
+        with stage("predict", rows_in=len(weather)) as st, ProcessPoolExecutor(
+            workers, mp_context=ctx, initializer=_init_worker, initargs=(model_args, baseline_args, threads)
+        ) as pool:
+            pred_log = np.concatenate(list(pool.map(predict_chunk, chunks)), axis=1)
+            st.rows_out = pred_log.size
+        predict_s = time.perf_counter() - start
+        counts = to_counts(pred_log)
+
+        bounds = None
+        if args.intervals and Path(args.intervals).exists():
+            from intervals import load_intervals
+
+            table = load_intervals(args.intervals)
+            week_hour = calendar_features(weather["hour"])["week_hour"]
+            n_zones, n_hours = pred_log.shape
+            lo, hi = table.bounds(np.repeat(zone_ids, n_hours), pred_log.ravel(), np.tile(week_hour, n_zones))
+            bounds = (np.rint(lo).astype(int).reshape(n_zones, n_hours), np.rint(hi).astype(int).reshape(n_zones, n_hours))
+
+        start = time.perf_counter()
+        out_dir = Path(args.out_dir)
+        hours = weather["hour"].to_numpy()
+        origin_values = origins.to_numpy()
+        days = pd.Series(np.arange(len(origins)), index=origins).groupby(origins.date)
+        total_rows = 0
+        with stage("write partitions") as st, ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+            futures = []
+            for day, idx in days:
+                # Target index of origin o's first hour (o + 1h) is o's position in origins.
+                i0, i1 = int(idx.iloc[0]), int(idx.iloc[-1]) + 1
+                window = slice(i0, i1 + horizon - 1)
+                day_bounds = (bounds[0][:, window], bounds[1][:, window]) if bounds is not None else None
+                futures.append(
+                    pool.submit(
+                        write_origin_day,
+                        str(out_dir),
+                        str(day),
+                        origin_values[i0:i1],
+                        hours[window],
+                        zone_ids,
+                        counts[:, window],
+                        day_bounds,
+                        horizon,
+                    )
+                )
+            total_rows = sum(f.result() for f in futures)
+            st.rows_out = total_rows
+        write_s = time.perf_counter() - start
+
+        manifest = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "model_path": model_path,
+            "model_run_id": model_run_id,
+            "origins": [str(origins[0]), str(origins[-1])],
+            "origin_count": int(len(origins)),
+            "horizon_hours": horizon,
+            "zone_count": int(len(zone_ids)),
+            "target_hours_predicted": int(len(weather)),
+            "rows": int(total_rows),
+            "weather_source": f"feature store ({args.features_path})",
+            "intervals": bounds is not None,
+            "workers": workers,
+            "predict_s": predict_s,
+            "write_s": write_s,
+        }
+        atomic_write_text(out_dir / "_manifest.json", json.dumps(manifest, indent=2))
+        print(
+            f"origins: {len(origins)}  target hours predicted: {len(weather)}  "
+            f"({len(origins) * horizon / len(weather):.0f}x fewer than per-origin)"
+        )
+        print(f"predict: {predict_s:.1f}s  write: {write_s:.1f}s  rows: {total_rows:,}  partitions: {len(days)}")
+        print("saved:", out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+class ShardedModel:
+    """Routes each row to its zone's shard model and stitches predictions back in input order."""
+
+    def __init__(self, router: dict, models: dict[str, object]):
+        self.router = router
+        self.models = models
+        self.zone_to_shard = {int(z): s for z, s in router["zone_to_shard"].items()}
+        self.default_shard = router["default_shard"]
+
+    def route(self, zones: np.ndarray) -> np.ndarray:
+        return np.array([self.zone_to_shard.get(int(z), self.default_shard) for z in zones], dtype=object)
+
+    def predict(self, X) -> np.ndarray:
+        zones = np.asarray(X["PULocationID"], dtype=np.float64).astype(np.int64)
+        shards = self.route(zones)
+        out = np.empty(len(zones), dtype=np.float64)
+        for shard in np.unique(shards):
+            idx = np.flatnonzero(shards == shard)
+            rows = X.iloc[idx] if hasattr(X, "iloc") else {k: np.asarray(v)[idx] for k, v in X.items()}
+            out[idx] = self.models[shard].predict(rows)
+        return out
+
+
+def load_sharded(router_path: str | Path) -> ShardedModel:
+    router_path = Path(router_path)
+    router = json.loads(router_path.read_text())
+    import lightgbm as lgb
+
+    models = {
+        name: lgb.Booster(model_file=str(router_path.parent / shard["model_path"]))
+        for name, shard in router["shards"].items()
+    }
+    return ShardedModel(router, models)
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_CACHE_DEFAULT = "data/cache/weather"
+HOURLY_VARS = "temperature_2m,relative_humidity_2m,precipitation,wind_speed_10m"
+CACHE_TTL_S = 30 * 60
+MAX_STALE_S = 48 * 3600
+MAX_WORKERS = 4
+FETCH_ERRORS = (HTTPError, URLError, TimeoutError, OSError, ValueError)
+
+CITY_POINT = {"NYC": (40.7128, -74.0060)}
+# Rough borough centroids; one Open-Meteo grid cell each.
+BOROUGH_POINTS = {
+    "Manhattan": (40.7831, -73.9712),
+    "Brooklyn": (40.6782, -73.9442),
+    "Queens": (40.7282, -73.7949),
+    "Bronx": (40.8448, -73.8648),
+    "Staten Island": (40.5795, -74.1502),
+}
+
+
+class WeatherClient:
+    """Open-Meteo hourly forecasts with an on-disk TTL cache and last-good fallback.
+
+    Every response is cached per (point, timezone). A cache entry younger than ttl_s that covers
+    the requested days is served without a request; when a request fails, such an entry up to
+    max_stale_s old is served and flagged stale instead of failing the job.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OPEN_METEO_URL,
+        cache_dir: str | Path | None = WEATHER_CACHE_DEFAULT,
+        ttl_s: float = CACHE_TTL_S,
+        max_stale_s: float = MAX_STALE_S,
+        timeout_s: float = 30,
+        retries: int = 1,
+        max_workers: int = MAX_WORKERS,
+    ):
+        self.base_url = base_url
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.ttl_s = ttl_s
+        self.max_stale_s = max_stale_s
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.max_workers = max_workers
+
+    def _cache_path(self, params: dict) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        # forecast_days stays out of the key: a shorter request is answered by a longer cached one,
+        # so a run just after midnight still finds the entry written the hour before.
+        keyed = {k: v for k, v in params.items() if k != "forecast_days"}
+        key = hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()[:16]
+        return self.cache_dir / f"open_meteo_{key}.json"
+
+    def _read_cache(self, path: Path | None) -> dict | None:
+        if path is None or not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, path: Path | None, entry: dict) -> None:
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _request(self, params: dict) -> dict:
+        # urllib.request pulls in http.client, email and ssl; only pay for it on a cache miss.
+        from urllib.request import urlopen
+
+        url = self.base_url + "?" + urlencode(params)
+        last_exc: Exception | None = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(2**attempt, 10))
+            try:
+                with urlopen(url, timeout=self.timeout_s) as resp:
+                    payload = json.loads(resp.read().decode("utf-8"))
+                if "hourly" not in payload or "time" not in payload["hourly"]:
+                    raise ValueError("Open-Meteo response missing hourly.time.")
+                return payload
+            except FETCH_ERRORS as exc:
+                last_exc = exc
+        raise last_exc
+
+    def fetch(self, latitude: float, longitude: float, timezone_name: str, forecast_days: int = 3) -> tuple[dict, dict]:
+        """Returns (payload, info); info has source (network|cache|stale-cache), stale and age_s."""
+        params = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "hourly": HOURLY_VARS,
+            "forecast_days": forecast_days,
+            "timezone": timezone_name,
+        }
+        path = self._cache_path(params)
+        cached = self._read_cache(path)
+        if cached is not None and cached["params"].get("forecast_days", 0) < forecast_days:
+            cached = None
+        now = time.time()
+        if cached is not None and now - cached["fetched_at"] < self.ttl_s:
+            return cached["payload"], {"source": "cache", "stale": False, "age_s": now - cached["fetched_at"]}
+        try:
+            payload = self._request(params)
+        except FETCH_ERRORS as exc:
+            if cached is not None and now - cached["fetched_at"] < self.max_stale_s:
+                age = now - cached["fetched_at"]
+                print(f"Open-Meteo fetch failed ({exc}); using cached response from {age / 3600:.1f}h ago")
+                return cached["payload"], {"source": "stale-cache", "stale": True, "age_s": age, "error": str(exc)}
+            raise RuntimeError(f"Failed to fetch Open-Meteo forecast: {exc}") from exc
+        self._write_cache(path, {"fetched_at": now, "params": params, "payload": payload})
+        return payload, {"source": "network", "stale": False, "age_s": 0.0}
+
+    def fetch_points(
+        self, points: dict[str, tuple[float, float]], timezone_name: str, forecast_days: int = 3
+    ) -> dict[str, tuple[dict, dict]]:
+        """Concurrent fetch, at most max_workers requests in flight; any point failing without cache raises."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(points)))) as pool:
+            futures = {
+                name: pool.submit(self.fetch, lat, lon, timezone_name, forecast_days)
+                for name, (lat, lon) in points.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+
+def forecast_days_for(horizon_hours: int) -> int:
+    """Open-Meteo days start at local midnight; cover a start as late as 23:00 plus the horizon (API max 16).
+
+    The count does not depend on the start hour, so every run of a job asks for the same days.
+    """
+    return min(16, math.ceil((23 + horizon_hours) / 24) + 1)
+
+
+def hourly_columns(payload: dict, timezone_name: str, start_hour: datetime, horizon_hours: int) -> dict[str, np.ndarray]:
+    """Weather columns for horizon_hours from start_hour; "hour" holds tz-aware datetimes (object array)."""
+    hourly = payload.get("hourly", {})
+    if not hourly:
+        raise ValueError("Open-Meteo response missing 'hourly'.")
+
+    if "time" not in hourly:
+        raise ValueError("Open-Meteo response missing hourly.time.")
+
+    # Open-Meteo times are local to the requested timezone when timezone is provided.
+    tz = ZoneInfo(timezone_name)
+    hours = np.array([datetime.fromisoformat(t).replace(tzinfo=tz) for t in hourly["time"]], dtype=object)
+    order = np.argsort(hours, kind="stable")
+    keep = order[hours[order] >= start_hour][:horizon_hours]
+    if len(keep) < horizon_hours:
+        raise ValueError(
+            f"Open-Meteo returned only {len(keep)} hourly rows from {start_hour}, expected {horizon_hours}."
+        )
+    return {
+        "hour": hours[keep],
+        "temperature": np.asarray(hourly["temperature_2m"], dtype=np.float64)[keep],
+        "relative_humidity": np.asarray(hourly["relative_humidity_2m"], dtype=np.float64)[keep],
+        "precipitation": np.asarray(hourly["precipitation"], dtype=np.float64)[keep],
+        "wind_speed": np.asarray(hourly["wind_speed_10m"], dtype=np.float64)[keep],
+    }
+
+
+def combine_points(frames: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """Citywide inputs as the mean across points (the model takes one weather vector per hour)."""
+    if len(frames) == 1:
+        return frames[0]
+    combined = {"hour": frames[0]["hour"]}
+    for col in frames[0]:
+        if col != "hour":
+            combined[col] = np.mean([f[col] for f in frames], axis=0)
+    return combined
+
+
+def fetch_weather(
+    client: WeatherClient,
+    points: dict[str, tuple[float, float]],
+    timezone_name: str,
+    start_hour: datetime,
+    horizon_hours: int,
+) -> tuple[dict[str, np.ndarray], dict]:
+    """Hourly weather columns over all points plus a summary of where it came from."""
+    results = client.fetch_points(points, timezone_name, forecast_days_for(horizon_hours))
+    try:
+        frames = [hourly_columns(payload, timezone_name, start_hour, horizon_hours) for payload, _ in results.values()]
+    except ValueError as exc:
+        raise RuntimeError(f"Failed to fetch Open-Meteo forecast: {exc}") from exc
+    infos = [info for _, info in results.values()]
+    stale = any(info["stale"] for info in infos)
+    sources = {info["source"] for info in infos}
+    info = {
+        "source": "open-meteo" + ("" if sources == {"network"} else f" ({'/'.join(sorted(sources))})"),
+        "stale": stale,
+        "max_age_s": round(max(info["age_s"] for info in infos), 1),
+        "points": list(points),
+    }
+    return combine_points(frames), info
@@ -0,0 +1,225 @@
+import argparse
+import itertools
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from generate_forecast import (
+    BASELINE_BIN_DEFAULT,
+    BASELINE_DEFAULT,
+    BASELINE_META_DEFAULT,
+    FEATURE_COLS,
+    FEATURES_DEFAULT,
+    HORIZON_DEFAULT,
+    REGISTRY_DEFAULT,
+    TIMEZONE_DEFAULT,
+    add_backend_arg,
+    add_weather_args,
+    baseline_matrix,
+    build_inference_frame,
+    load_serving_baseline,
+    load_weather,
+    next_top_of_hour,
+    resolve_model,
+    to_counts,
+    weather_client_from_args,
+)
+from prediction_cache import WEATHER_COLS
+
+
+BOUNDS = {"relative_humidity": (0.0, 100.0), "precipitation": (0.0, None), "wind_speed": (0.0, None)}
+
+
+def apply_scenario(weather_df: pd.DataFrame, spec: dict) -> pd.DataFrame:
+    """Perturbed copy of the base weather.
+
+    spec keys: shift_hours (negative = weather arrives earlier), add / scale / set ({column: value}),
+    and an optional hours [start, end) window (horizon indices) limiting add / scale / set.
+    """
+    out = weather_df.copy()
+    shift = int(spec.get("shift_hours", 0))
+    if shift:
+        # Hour h sees the weather forecast for hour h - shift; the edge hour is held.
+        idx = np.clip(np.arange(len(out)) - shift, 0, len(out) - 1)
+        for col in WEATHER_COLS:
+            out[col] = weather_df[col].to_numpy()[idx]
+    window = slice(*spec["hours"]) if "hours" in spec else slice(None)
+    for col, value in spec.get("add", {}).items():
+        out.loc[out.index[window], col] = out[col].to_numpy()[window] + value
+    for col, value in spec.get("scale", {}).items():
+        out.loc[out.index[window], col] = out[col].to_numpy()[window] * value
+    for col, value in spec.get("set", {}).items():
+        out.loc[out.index[window], col] = value
+    for col, (lo, hi) in BOUNDS.items():
+        out[col] = out[col].clip(lo, hi)
+    return out
+
+
+def sweep_scenarios(axes: list[str]) -> list[dict]:
+    """--sweep shift=-6,0 --sweep precipitation=0,5 -> Cartesian product of shift_hours / additive deltas."""
+    if not axes:
+        return []
+    names, values = [], []
+    for axis in axes:
+        name, raw = axis.split("=")
+        if name != "shift" and name not in WEATHER_COLS:
+            raise ValueError(f"Unknown sweep axis: {name}")
+        names.append(name)
+        values.append([float(v) for v in raw.split(",")])
+    scenarios = []
+    for combo in itertools.product(*values):
+        spec = {"add": {}}
+        label = []
+        for name, value in zip(names, combo):
+            if name == "shift":
+                spec["shift_hours"] = int(value)
+            elif value:
+                spec["add"][name] = value
+            label.append(f"{name}{value:+g}")
+        spec["name"] = " ".join(label)
+        scenarios.append(spec)
+    return scenarios
+
+
+def predict_scenarios(model, zone_ids, weather_frames: list[pd.DataFrame], baseline, global_mean: float):
+    """One batched predict over every distinct (hour, weather) column across all scenarios.
+
+    Returns raw predictions as [scenario, zone, hour] and the number of grid columns predicted.
+    Only unchanged columns are shared, so the cost is linear in the columns a sweep perturbs: every
+    full-horizon scenario costs about one base forecast. Trees cannot be shared either, because
+    nearly every tree in the trained models splits on a weather feature.
+    """
+    n_hours = len(weather_frames[0])
+    stacked = pd.concat(weather_frames, ignore_index=True)
+    weather = stacked[WEATHER_COLS].to_numpy(dtype=np.float64)
+    # Windowed scenarios leave most hours untouched; identical (hour, weather) columns are predicted once.
+    key = np.column_stack([np.tile(np.arange(n_hours), len(weather_frames)), weather])
+    _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    unique_weather = stacked.iloc[first].reset_index(drop=True)
+    inf_df = build_inference_frame(zone_ids, unique_weather, baseline, global_mean)
+    pred = model.predict(inf_df[FEATURE_COLS]).reshape(len(zone_ids), len(first))
+    grid = pred[:, inverse.ravel()].reshape(len(zone_ids), len(weather_frames), n_hours)
+    return grid.transpose(1, 0, 2), len(first)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Batched weather what-if scenarios against the base forecast. Unchanged hours are predicted "
+        "once; each full-horizon scenario costs about one base forecast."
+    )
+    parser.add_argument("--out", default="data/reports/weather_scenarios.json")
+    parser.add_argument("--scenarios", default="", help="JSON list of scenario specs (see apply_scenario).")
+    parser.add_argument(
+        "--sweep",
+        action="append",
+        default=[],
+        help="Scenario grid axis, repeatable: shift=-6,-3,0 or <weather column>=<additive deltas>.",
+    )
+    parser.add_argument("--top-zones", type=int, default=5, help="Zones with the largest |delta| per scenario.")
+    parser.add_argument("--matrices", default="", help="Optional .npz with full [scenario, zone, hour] counts.")
+    parser.add_argument("--model-path", default="")
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT)
+    parser.add_argument("--compiled-model", default="")
+    add_backend_arg(parser)
+    parser.add_argument("--features-path", default=FEATURES_DEFAULT)
+    parser.add_argument("--baseline-bin", default=BASELINE_BIN_DEFAULT)
+    parser.add_argument("--baseline-path", default=BASELINE_DEFAULT)
+    parser.add_argument("--baseline-meta", default=BASELINE_META_DEFAULT)
+    parser.add_argument("--horizon-hours", type=int, default=HORIZON_DEFAULT)
+    parser.add_argument("--timezone", default=TIMEZONE_DEFAULT)
+    add_weather_args(parser)
+    args = parser.parse_args()
+
+    scenarios = json.loads(Path(args.scenarios).read_text()) if args.scenarios else []
+    scenarios += sweep_scenarios(args.sweep)
+    if not scenarios:
+        raise SystemExit("No scenarios: pass --scenarios and/or --sweep.")
+    for i, spec in enumerate(scenarios):
+        spec.setdefault("name", f"scenario_{i}")
+
+    model, backend, run_id, model_path = resolve_model(
+        args.model_path, args.registry, args.compiled_model, backend=args.backend
+    )
+    baseline, global_mean, zone_ids, _ = load_serving_baseline(
+        args.baseline_path, args.baseline_meta, args.features_path, args.baseline_bin
+    )
+    baseline = baseline_matrix(baseline, zone_ids, global_mean)
+    start_hour = next_top_of_hour(datetime.now(ZoneInfo(args.timezone)))
+    client, points = weather_client_from_args(args)
+    weather_df, weather_info = load_weather(
+        start_hour, args.horizon_hours, args.timezone, dummy=args.dummy_weather, client=client, points=points
+    )
+
+    start = time.perf_counter()
+    base_log, _ = predict_scenarios(model, zone_ids, [weather_df], baseline, global_mean)
+    base_s = time.perf_counter() - start
+
+    frames = [apply_scenario(weather_df, spec) for spec in scenarios]
+    start = time.perf_counter()
+    scen_log, n_columns = predict_scenarios(model, zone_ids, frames, baseline, global_mean)
+    batch_s = time.perf_counter() - start
+
+    base = to_counts(base_log[0])
+    counts = to_counts(scen_log)
+    delta = counts - base[None]
+    base_total = int(base.sum())
+    hours = [ts.isoformat() for ts in weather_df["hour"]]
+    results = []
+    for s, spec in enumerate(scenarios):
+        zone_delta = delta[s].sum(axis=1)
+        top = np.argsort(-np.abs(zone_delta), kind="stable")[: args.top_zones]
+        results.append(
+            {
+                "name": spec["name"],
+                "spec": {k: v for k, v in spec.items() if k != "name"},
+                "total": int(counts[s].sum()),
+                "delta_total": int(delta[s].sum()),
+                "delta_pct": float(delta[s].sum() / max(base_total, 1) * 100),
+                "delta_by_hour": delta[s].sum(axis=0).tolist(),
+                "top_zones": [{"PULocationID": int(zone_ids[z]), "delta": int(zone_delta[z])} for z in top],
+            }
+        )
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "model_path": model_path,
+        "model_backend": backend,
+        "model_run_id": run_id,
+        "weather_source": weather_info["source"],
+        "hours": hours,
+        "base_total": base_total,
+        "base_by_hour": base.sum(axis=0).tolist(),
+        "timing": {
+            "base_predict_s": base_s,
+            "scenarios_predict_s": batch_s,
+            "scenario_count": len(scenarios),
+            "grid_columns_predicted": n_columns,
+            "grid_columns_requested": len(scenarios) * len(hours),
+        },
+        "scenarios": results,
+    }
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2))
+    if args.matrices:
+        np.savez_compressed(args.matrices, base=base, counts=counts, zone_ids=zone_ids, hours=np.array(hours))
+
+    print(f"{'scenario':<40} {'total':>9} {'delta':>8} {'pct':>7}")
+    print(f"{'base':<40} {base_total:>9}")
+    for r in results:
+        print(f"{r['name'][:40]:<40} {r['total']:>9} {r['delta_total']:>+8} {r['delta_pct']:>+6.2f}%")
+    print(
+        f"base predict: {base_s:.3f}s  {len(scenarios)} scenarios: {batch_s:.3f}s "
+        f"({batch_s / base_s:.1f}x base; {n_columns}/{len(scenarios) * len(hours)} hour columns predicted)"
+    )
+    print("cost is linear in perturbed hour columns: each full-horizon scenario is about one base forecast")
+    print("saved:", out_path)
+
+
+if __name__ == "__main__":
+    main()
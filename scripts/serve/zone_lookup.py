@@ -0,0 +1,41 @@
+import csv
+import json
+from pathlib import Path
+
+
+ZONE_LOOKUP_DEFAULT = "data/serving/zone_lookup.csv"
+ZONES_GEOJSON_DEFAULT = "frontend/public/data/taxi_zones.geojson"
+UNKNOWN_BOROUGH = "Unknown"
+
+
+def load_zone_lookup(path: str | Path = ZONE_LOOKUP_DEFAULT) -> dict[int, dict[str, str]]:
+    """Zone attributes keyed by PULocationID, from the lookup CSV or the taxi-zones GeoJSON."""
+    path = Path(path)
+    if not path.exists() and path == Path(ZONE_LOOKUP_DEFAULT):
+        path = Path(ZONES_GEOJSON_DEFAULT)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Zone lookup not found: {path}. Run scripts/data_processing/convert_taxi_zones_geojson.py."
+        )
+
+    if path.suffix.lower() in (".geojson", ".json"):
+        rows = [f["properties"] for f in json.loads(path.read_text())["features"]]
+    else:
+        with path.open(newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    lookup: dict[int, dict[str, str]] = {}
+    for row in rows:
+        zone = row.get("PULocationID", row.get("LocationID"))
+        if zone in (None, ""):
+            continue
+        lookup[int(float(zone))] = {
+            "borough": row.get("borough") or UNKNOWN_BOROUGH,
+            "zone": row.get("zone") or "",
+            "service_zone": row.get("service_zone") or "",
+        }
+    return lookup
+
+
+def zone_boroughs(path: str | Path = ZONE_LOOKUP_DEFAULT) -> dict[int, str]:
+    return {zone: attrs["borough"] for zone, attrs in load_zone_lookup(path).items()}
@@ -1,5 +1,11 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
-import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "serve"))
+
+from metrics import mae, smape  # noqa: E402
 
 df = pd.read_parquet("data/processed/features_hourly.parquet")
 df = df.sort_values(["PULocationID", "hour"])
@@ -11,10 +17,7 @@ df = df.dropna(subset=["baseline_pred"])
 y_actual = df["trip_count"].to_numpy()
 y_pred = df["baseline_pred"].to_numpy()
 
-mae = np.mean(np.abs(y_actual - y_pred))
-smape = np.mean(2 * np.abs(y_pred - y_actual) / (np.abs(y_pred) + np.abs(y_actual) + 1e-8))
-
-print("MAE:", mae)
-print("sMAPE:", smape)
+print("MAE:", mae(y_actual, y_pred))
+print("sMAPE:", smape(y_actual, y_pred))
 
 
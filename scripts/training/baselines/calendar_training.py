@@ -1,6 +1,12 @@
-import numpy as np
+import sys
+from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "serve"))
+
+from metrics import mae, smape  # noqa: E402
+
 df = pd.read_parquet("data/processed/features_hourly.parquet")
 
 df["hour_of_week"] = (df["day_of_week"] * 24 ) + df["hour_of_day"]
@@ -38,13 +44,8 @@ print("Missing pred rate after fallback:", missing_after)
 y_true = val_with_preds["trip_count"].to_numpy()
 y_pred = val_with_preds["pred"].to_numpy()
 
-mae = np.mean(np.abs(y_true - y_pred))
-smape = np.mean(
-    2.0 * np.abs(y_pred - y_true) / (np.abs(y_true) + np.abs(y_pred) + 1e-8)
-)
-
-print("Calendar baseline MAE:", mae)
-print("Calendar baseline sMAPE:", smape)
+print("Calendar baseline MAE:", mae(y_true, y_pred))
+print("Calendar baseline sMAPE:", smape(y_true, y_pred))
 
 
 
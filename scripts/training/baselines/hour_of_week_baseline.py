@@ -1,5 +1,11 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
-import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "serve"))
+
+from metrics import mae, smape  # noqa: E402
 
 df = pd.read_parquet("data/processed/features_hourly.parquet")
 
@@ -24,7 +30,5 @@ val = val.merge(
 y_true = val["trip_count_x"]
 y_pred = val["trip_count_y"]
 
-mae = np.mean(np.abs(y_true - y_pred))
-smape = np.mean(2 * np.abs(y_pred - y_true) / (np.abs(y_pred) + np.abs(y_true) + 1e-8))
-print("MAE:", mae)
-print("sMAPE:", smape)
+print("MAE:", mae(y_true, y_pred))
+print("sMAPE:", smape(y_true, y_pred))
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "serve"))
+sys.path.insert(0, str(ROOT / "training" / "tree_based_models"))
+sys.path.insert(0, str(ROOT / "training" / "linear_models"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+from metrics import grouped_errors  # noqa: E402
+
+
+FEATURES_PATH = "data/processed/features_hourly.parquet"
+OUT_DEFAULT = "data/reports/model_benchmarks.csv"
+SLICES_DEFAULT = "data/reports/model_benchmark_slices.csv"
+TIMINGS_DEFAULT = "data/reports/model_benchmark_timings.csv"
+VAL_DAYS = 28
+WEEK_HOURS = 168
+
+
+def load_split(features_path: str, val_days: int = VAL_DAYS) -> tuple[dict[str, np.ndarray], int]:
+    """Every feature column as a plain array, sorted (hour, zone) so train rows come first.
+
+    Adds the columns the baselines and metric slices share: week_hour, zone_code (dense zone index),
+    lag_168 (same zone, same hour last week) and horizon_day (validation day 0..val_days-1).
+    Returns (arrays, n_train).
+    """
+    df = pd.read_parquet(features_path).sort_values(["hour", "PULocationID"], kind="stable")
+    arrays = {col: df[col].to_numpy() for col in df.columns}
+    del df
+    hours = arrays["hour"]
+    cutoff = hours.max() - np.timedelta64(val_days, "D")
+    n_train = int(np.searchsorted(hours, cutoff, side="left"))
+
+    arrays["week_hour"] = (arrays["day_of_week"] * 24 + arrays["hour_of_day"]).astype(np.int16)
+    zone_ids, zone_code = np.unique(arrays["PULocationID"], return_inverse=True)
+    arrays["zone_code"] = zone_code.ravel().astype(np.int32)
+    hour_index = ((hours - hours.min()) // np.timedelta64(1, "h")).astype(np.int64)
+    # Dense [zone, hour] grid so the weekly lag is one gather instead of a per-zone shift.
+    grid = np.full((len(zone_ids), int(hour_index.max()) + 1), np.nan)
+    grid[arrays["zone_code"], hour_index] = arrays["trip_count"]
+    lag_index = hour_index - WEEK_HOURS
+    lag = np.full(len(hour_index), np.nan)
+    ok = lag_index >= 0
+    lag[ok] = grid[arrays["zone_code"][ok], lag_index[ok]]
+    arrays["lag_168"] = lag
+    arrays["horizon_day"] = np.maximum((hours - cutoff) // np.timedelta64(1, "D"), 0).astype(np.int16)
+    return arrays, n_train
+
+
+class SharedArrays:
+    """Named numpy arrays backed by shared memory; workers attach by spec instead of reloading parquet."""
+
+    def __init__(self, blocks: dict[str, shared_memory.SharedMemory], spec: dict[str, tuple[str, str, tuple]]):
+        self.blocks = blocks
+        self.spec = spec
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+            for name, (_, dtype, shape) in spec.items()
+        }
+
+    @classmethod
+    def create(cls, arrays: dict[str, np.ndarray]) -> "SharedArrays":
+        blocks, spec = {}, {}
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+            blocks[name] = block
+            spec[name] = (block.name, values.dtype.str, values.shape)
+        return cls(blocks, spec)
+
+    @classmethod
+    def attach(cls, spec: dict[str, tuple[str, str, tuple]]) -> "SharedArrays":
+        blocks = {}
+        for name, (block_name, _, _) in spec.items():
+            # Spawned workers share the parent's resource tracker, so the parent's unlink() is the one cleanup.
+            blocks[name] = shared_memory.SharedMemory(name=block_name)
+        return cls(blocks, spec)
+
+    def close(self) -> None:
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+
+    def unlink(self) -> None:
+        self.close()
+        for block in self.blocks.values():
+            block.unlink()
+
+
+def split_frame(arrays: dict[str, np.ndarray], rows: slice) -> pd.DataFrame:
+    cols = [c for c in arrays if c not in ("predictions", "week_hour", "zone_code", "lag_168", "horizon_day")]
+    return pd.DataFrame({c: arrays[c][rows] for c in cols})
+
+
+def hour_of_week_mean(arrays: dict[str, np.ndarray], n_train: int) -> np.ndarray:
+    """Train mean per (zone, week_hour), falling back to the zone mean, then the global mean."""
+    zone = arrays["zone_code"]
+    n_zones = int(zone.max()) + 1
+    cell = zone[:n_train].astype(np.int64) * WEEK_HOURS + arrays["week_hour"][:n_train]
+    y = arrays["trip_count"][:n_train].astype(np.float64)
+    sums = np.bincount(cell, weights=y, minlength=n_zones * WEEK_HOURS)
+    counts = np.bincount(cell, minlength=n_zones * WEEK_HOURS)
+    zone_sums = np.bincount(zone[:n_train], weights=y, minlength=n_zones)
+    zone_counts = np.bincount(zone[:n_train], minlength=n_zones)
+    zone_mean = np.where(zone_counts > 0, zone_sums / np.maximum(zone_counts, 1), y.mean())
+    val_cell = zone[n_train:].astype(np.int64) * WEEK_HOURS + arrays["week_hour"][n_train:]
+    return np.where(
+        counts[val_cell] > 0, sums[val_cell] / np.maximum(counts[val_cell], 1), zone_mean[zone[n_train:]]
+    )
+
+
+def seasonal_naive(arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> np.ndarray:
+    # Same hour last week; hours without a week of history use the hour-of-week mean.
+    lag = arrays["lag_168"][n_train:]
+    return np.where(np.isnan(lag), hour_of_week_mean(arrays, n_train), lag)
+
+
+def hour_of_week(arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> np.ndarray:
+    return hour_of_week_mean(arrays, n_train)
+
+
+def ridge(arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> np.ndarray:
+    from ridge_regression import build_model, feature_vals
+
+    model = build_model()
+    model.fit(split_frame(arrays, slice(0, n_train))[feature_vals], arrays["trip_count"][:n_train])
+    return model.predict(split_frame(arrays, slice(n_train, None))[feature_vals])
+
+
+def _tree_split(arrays: dict[str, np.ndarray], n_train: int):
+    from lightgbm_week_hour import prepare_split
+
+    cutoff = pd.Timestamp(arrays["hour"][n_train])
+    return prepare_split(split_frame(arrays, slice(None)), cutoff)
+
+
+def lightgbm(arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> np.ndarray:
+    from lightgbm_week_hour import fit_model
+
+    _, y_pred = fit_model(*_tree_split(arrays, n_train), **overrides)
+    return y_pred
+
+
+def xgboost(arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> np.ndarray:
+    from xgboost_week_hour import align_categories, fit_model
+
+    X_train, y_train, X_val, y_val = _tree_split(arrays, n_train)
+    _, y_pred = fit_model(X_train, y_train, align_categories(X_train, X_val), y_val, **overrides)
+    return y_pred
+
+
+# Benchmark label -> fn(arrays, n_train, overrides) returning validation predictions in row order.
+MODELS = {
+    "Seasonal naive (t-168)": seasonal_naive,
+    "Hour-of-week mean": hour_of_week,
+    "Ridge": ridge,
+    "LightGBM": lightgbm,
+    "XGBoost": xgboost,
+}
+TREE_MODELS = {"LightGBM", "XGBoost"}
+
+
+def fit_one(name: str, row: int, arrays: dict[str, np.ndarray], n_train: int, overrides: dict) -> dict:
+    """Fit and predict one model; its predictions land in row `row` of the predictions block."""
+    start = time.perf_counter()
+    y_pred = MODELS[name](arrays, n_train, overrides if name in TREE_MODELS else {})
+    seconds = time.perf_counter() - start
+    arrays["predictions"][row] = np.asarray(y_pred, dtype=np.float64)
+    return {"model": name, "seconds": seconds, "pid": os.getpid()}
+
+
+def run_model(name: str, row: int, spec: dict, n_train: int, overrides: dict) -> dict:
+    """Worker entry point: attach to the parent's split instead of reading parquet again."""
+    shared = SharedArrays.attach(spec)
+    try:
+        return fit_one(name, row, shared.arrays, n_train, overrides)
+    finally:
+        shared.close()
+
+
+def slice_rows(name: str, errors: dict[str, np.ndarray], keys, models: list[str]) -> list[dict]:
+    rows = []
+    for m, model in enumerate(models):
+        for g, key in enumerate(keys):
+            if errors["n"][g]:
+                rows.append(
+                    {
+                        "model": model,
+                        "slice": name,
+                        "key": key,
+                        "n": int(errors["n"][g]),
+                        "MAE": float(errors["MAE"][m, g]),
+                        "sMAPE": float(errors["sMAPE"][m, g]),
+                    }
+                )
+    return rows
+
+
+def write_csv(path: str | Path, rows: list[dict]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print("saved:", path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score every baseline and model on one shared train/validation split.")
+    parser.add_argument("--features-path", default=FEATURES_PATH)
+    parser.add_argument("--val-days", type=int, default=VAL_DAYS, help="Trailing days held out for validation.")
+    parser.add_argument("--models", default=",".join(MODELS), help="Comma-separated subset of the registered models.")
+    parser.add_argument("--jobs", type=int, default=1, help="Models fitted in parallel processes (1: in-process).")
+    parser.add_argument(
+        "--n-estimators",
+        type=int,
+        default=0,
+        help="Cap boosting rounds for LightGBM/XGBoost (0: each trainer's default).",
+    )
+    parser.add_argument("--out", default=OUT_DEFAULT)
+    parser.add_argument("--slices-out", default=SLICES_DEFAULT)
+    parser.add_argument("--timings-out", default=TIMINGS_DEFAULT)
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    unknown = [m for m in models if m not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown model(s): {', '.join(unknown)} (registered: {', '.join(MODELS)})")
+    overrides = {"n_estimators": args.n_estimators} if args.n_estimators else {}
+
+    with Tracer.from_args("evaluate_models", args):
+        with stage("load split") as st:
+            start = time.perf_counter()
+            arrays, n_train = load_split(args.features_path, args.val_days)
+            n_val = len(arrays["hour"]) - n_train
+            arrays["predictions"] = np.full((len(models), n_val), np.nan)
+            load_s = time.perf_counter() - start
+            st.rows_out = len(arrays["hour"])
+        print(f"split: {n_train:,} train rows, {n_val:,} validation rows ({load_s:.1f}s)")
+
+        shared = SharedArrays.create(arrays)
+        del arrays
+        try:
+            with stage("fit models") as st:
+                if args.jobs > 1:
+                    ctx = mp.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=ctx) as pool:
+                        futures = [
+                            pool.submit(run_model, name, row, shared.spec, n_train, overrides)
+                            for row, name in enumerate(models)
+                        ]
+                        results = [f.result() for f in futures]
+                else:
+                    results = [
+                        fit_one(name, row, shared.arrays, n_train, overrides) for row, name in enumerate(models)
+                    ]
+                st.rows_in = n_train
+
+            with stage("score", rows_in=n_val * len(models)):
+                arrays = shared.arrays
+                y_true = arrays["trip_count"][n_train:]
+                predictions = arrays["predictions"]
+                overall = grouped_errors(y_true, predictions, np.zeros(n_val, dtype=np.int64), 1)
+                zone_ids = np.unique(arrays["PULocationID"]).tolist()
+                # The same kernel, keyed three ways; every model is scored in the same bincount pass.
+                slices = []
+                for name, codes, keys in (
+                    ("zone", arrays["zone_code"], zone_ids),
+                    ("hour_of_day", arrays["hour_of_day"], list(range(24))),
+                    ("horizon_day", arrays["horizon_day"], list(range(args.val_days + 1))),
+                ):
+                    errors = grouped_errors(y_true, predictions, codes[n_train:], len(keys))
+                    slices += slice_rows(name, errors, keys, models)
+        finally:
+            shared.unlink()
+
+        timings = {r["model"]: r["seconds"] for r in results}
+        benchmarks = [
+            {"Model": name, "MAE": float(overall["MAE"][m, 0]), "sMAPE": float(overall["sMAPE"][m, 0])}
+            for m, name in enumerate(models)
+        ]
+        print(f"{'model':<24} {'MAE':>8} {'sMAPE':>7} {'seconds':>8}")
+        for row in benchmarks:
+            print(f"{row['Model']:<24} {row['MAE']:>8.3f} {row['sMAPE']:>7.4f} {timings[row['Model']]:>8.1f}")
+
+        write_csv(args.out, benchmarks)
+        write_csv(args.slices_out, slices)
+        write_csv(
+            args.timings_out,
+            [
+                {
+                    "model": name,
+                    "seconds": round(timings[name], 3),
+                    "train_rows": n_train,
+                    "val_rows": n_val,
+                    "load_split_s": round(load_s, 3),
+                    "jobs": args.jobs,
+                }
+                for name in models
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "serve"))
+
+from instrumentation import Tracer, add_trace_args, stage  # noqa: E402
+from lightgbm_week_hour import FEATURES_PATH, MODEL_PARAMS, fit_model, prepare_split  # noqa: E402
+from metrics import mae, smape  # noqa: E402
+from zone_lookup import ZONE_LOOKUP_DEFAULT, zone_boroughs  # noqa: E402
+
+
+OTHER_SHARD = "Other"
+
+
+def borough_shards(zone_ids: list[int], lookup_path: str, min_zones: int) -> dict[int, str]:
+    boroughs = zone_boroughs(lookup_path)
+    assignment = {z: boroughs.get(z, OTHER_SHARD) for z in zone_ids}
+    sizes = pd.Series(assignment).value_counts()
+    # EWR / unknown zones are too small to train alone; pool them into the smallest regular shard.
+    small = set(sizes[sizes < min_zones].index)
+    regular = sizes[sizes >= min_zones]
+    target = regular.index[-1] if len(regular) else OTHER_SHARD
+    return {z: (target if s in small else s) for z, s in assignment.items()}
+
+
+def volume_tier_shards(zone_means: pd.Series, n_tiers: int) -> dict[int, str]:
+    ranks = zone_means.rank(method="first", pct=True)
+    tiers = np.minimum((ranks * n_tiers).apply(np.ceil).astype(int), n_tiers)
+    return {int(z): f"tier_{int(t)}" for z, t in tiers.items()}
+
+
+def train_shard(
+    features_path: str,
+    shard: str,
+    zones: list[int],
+    cutoff: pd.Timestamp,
+    overrides: dict,
+    out_dir: str,
+) -> dict:
+    start = time.perf_counter()
+    df = pd.read_parquet(features_path, filters=[("PULocationID", "in", zones)])
+    X_train, y_train, X_val, y_val = prepare_split(df, cutoff)
+    del df
+    booster, y_pred = fit_model(X_train, y_train, X_val, y_val, **overrides)
+
+    model_path = Path(out_dir) / f"shard_{shard.replace(' ', '_').lower()}.txt"
+    booster.save_model(str(model_path))
+    return {
+        "shard": shard,
+        "zones": zones,
+        "model_path": model_path.name,
+        "train_rows": int(len(X_train)),
+        "train_s": time.perf_counter() - start,
+        "y_val": y_val.to_numpy(dtype=np.float64),
+        "y_pred": y_pred,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train LightGBM models sharded by borough or volume tier.")
+    parser.add_argument("--features-path", default=FEATURES_PATH)
+    parser.add_argument("--shard-by", choices=["borough", "volume_tier"], default="borough")
+    parser.add_argument("--zone-lookup", default=ZONE_LOOKUP_DEFAULT, help="Zone lookup CSV or taxi-zones GeoJSON.")
+    parser.add_argument("--tiers", type=int, default=3, help="Volume tiers when --shard-by volume_tier.")
+    parser.add_argument("--min-zones", type=int, default=10, help="Smaller borough shards are pooled.")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel processes (default: one per shard).")
+    parser.add_argument("--n-estimators", type=int, default=MODEL_PARAMS["n_estimators"])
+    parser.add_argument("--compare-global", action="store_true", help="Also train the single global model.")
+    parser.add_argument("--out-dir", default="models/sharded")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("lightgbm_sharded", args):
+        with stage("scan zones") as st:
+            base = pd.read_parquet(args.features_path, columns=["hour", "PULocationID", "trip_count"])
+            st.rows_out = len(base)
+        cutoff = base["hour"].max() - pd.Timedelta(days=28)
+        zone_ids = sorted(int(z) for z in base["PULocationID"].unique())
+        if args.shard_by == "borough":
+            zone_to_shard = borough_shards(zone_ids, args.zone_lookup, args.min_zones)
+        else:
+            zone_means = base[base["hour"] < cutoff].groupby("PULocationID")["trip_count"].mean()
+            zone_to_shard = volume_tier_shards(zone_means.reindex(zone_ids, fill_value=0.0), args.tiers)
+        del base
+
+        shards: dict[str, list[int]] = {}
+        for zone, shard in zone_to_shard.items():
+            shards.setdefault(shard, []).append(zone)
+
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_dir = Path(args.out_dir) / f"{args.shard_by}_{run_id}"
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        workers = args.workers or len(shards)
+        n_threads = max(1, (os.cpu_count() or 1) // workers)
+        overrides = {"n_estimators": args.n_estimators, "n_jobs": n_threads, "verbose": -1}
+        print("shards:", {k: len(v) for k, v in shards.items()}, "workers:", workers, "threads/worker:", n_threads)
+
+        start = time.perf_counter()
+        # Spawned workers: no OpenMP state is inherited from the parent.
+        with stage("train shards") as st, ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(train_shard, args.features_path, shard, zones, cutoff, overrides, str(out_dir))
+                for shard, zones in sorted(shards.items(), key=lambda kv: -len(kv[1]))
+            ]
+            results = [f.result() for f in futures]
+            st.rows_in = sum(r["train_rows"] for r in results)
+        sharded_wall_s = time.perf_counter() - start
+
+        y_val = np.concatenate([r["y_val"] for r in results])
+        y_pred = np.concatenate([r["y_pred"] for r in results])
+        report = {
+            "run_id": run_id,
+            "shard_by": args.shard_by,
+            "sharded_wall_s": sharded_wall_s,
+            "sharded_MAE": mae(y_val, y_pred),
+            "sharded_sMAPE": smape(y_val, y_pred),
+            "shards": {},
+        }
+        print(f"{'shard':<16} {'zones':>5} {'rows':>10} {'train_s':>8} {'MAE':>8} {'sMAPE':>7}")
+        for r in results:
+            shard_mae = mae(r["y_val"], r["y_pred"])
+            shard_smape = smape(r["y_val"], r["y_pred"])
+            report["shards"][r["shard"]] = {
+                "zones": len(r["zones"]),
+                "train_rows": r["train_rows"],
+                "train_s": r["train_s"],
+                "MAE": shard_mae,
+                "sMAPE": shard_smape,
+            }
+            print(
+                f"{r['shard']:<16} {len(r['zones']):>5} {r['train_rows']:>10} "
+                f"{r['train_s']:>8.1f} {shard_mae:>8.3f} {shard_smape:>7.4f}"
+            )
+        print(
+            f"sharded: wall {sharded_wall_s:.1f}s  MAE {report['sharded_MAE']:.3f}  "
+            f"sMAPE {report['sharded_sMAPE']:.4f}"
+        )
+
+        if args.compare_global:
+            start = time.perf_counter()
+            with stage("read features (global)") as st:
+                df = pd.read_parquet(args.features_path)
+                st.rows_out = len(df)
+            X_train, y_train, X_val, y_val_global = prepare_split(df, cutoff)
+            del df
+            _, y_pred_global = fit_model(
+                X_train, y_train, X_val, y_val_global, n_estimators=args.n_estimators, verbose=-1
+            )
+            report["global_wall_s"] = time.perf_counter() - start
+            report["global_MAE"] = mae(y_val_global.to_numpy(), y_pred_global)
+            report["global_sMAPE"] = smape(y_val_global.to_numpy(), y_pred_global)
+            print(
+                f"global:  wall {report['global_wall_s']:.1f}s  MAE {report['global_MAE']:.3f}  "
+                f"sMAPE {report['global_sMAPE']:.4f}"
+            )
+
+        router = {
+            "run_id": run_id,
+            "shard_by": args.shard_by,
+            "default_shard": max(shards, key=lambda s: len(shards[s])),
+            "zone_to_shard": {str(z): s for z, s in sorted(zone_to_shard.items())},
+            "shards": {r["shard"]: {"model_path": r["model_path"], "zones": r["zones"]} for r in results},
+        }
+        router_path = out_dir / "router.json"
+        router_path.write_text(json.dumps(router, indent=2))
+        report_path = out_dir / "report.json"
+        report_path.write_text(json.dumps(report, indent=2))
+        print("saved:", router_path)
+        print("saved:", report_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,18 @@
+import argparse
+import sys
 import pandas as pd
 import numpy as np
 import lightgbm as lgb
 from pathlib import Path
 from datetime import datetime
 
-# Load features
-df = pd.read_parquet("data/processed/features_hourly.parquet")
-
-# Week-hour feature (0-167)
-df["week_hour"] = df["day_of_week"] * 24 + df["hour_of_day"]
-df["month"] = df["month"].astype(int)
-df["day_of_year"] = df["day_of_year"].astype(int)
-df["week_of_year"] = df["week_of_year"].astype(int)
-
-# Train/val split: last 28 days as validation
-cutoff = df["hour"].max() - pd.Timedelta(days=28)
-train = df[df["hour"] < cutoff]
-val = df[df["hour"] >= cutoff]
-
-# Baseline-as-feature: mean trips per zone x week_hour (train only)
-baseline = (
-    train.groupby(["PULocationID", "week_hour"], as_index=False)["trip_count"]
-    .mean()
-    .rename(columns={"trip_count": "baseline_week_hour_mean"})
-)
-train = train.merge(baseline, on=["PULocationID", "week_hour"], how="left")
-val = val.merge(baseline, on=["PULocationID", "week_hour"], how="left")
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "serve"))
+
+from model_registry import REGISTRY_DEFAULT, atomic_copy, file_sha256, promote, register_model  # noqa: E402
+from instrumentation import Tracer, add_trace_args, stage, traced  # noqa: E402
+from metrics import abs_errors, mae, smape, smape_terms  # noqa: E402
 
-# Fill any missing baseline values (should be rare) with global train mean
-global_mean = train["trip_count"].mean()
-train["baseline_week_hour_mean"] = train["baseline_week_hour_mean"].fillna(global_mean)
-val["baseline_week_hour_mean"] = val["baseline_week_hour_mean"].fillna(global_mean)
+FEATURES_PATH = "data/processed/features_hourly.parquet"
 
 feature_cols = [
     "PULocationID",
@@ -47,27 +29,9 @@ feature_cols = [
     "is_weekend",
     "is_holiday",
 ]
+cat_cols = ["PULocationID", "week_hour", "month", "week_of_year"]
 
-X_train = train[feature_cols].copy()
-y_train = train["trip_count"]
-X_val = val[feature_cols].copy()
-y_val = val["trip_count"]
-
- # Treat these as categorical for LightGBM
-X_train["PULocationID"] = X_train["PULocationID"].astype("category")
-X_train["week_hour"] = X_train["week_hour"].astype("category")
-X_train["month"] = X_train["month"].astype("category")
-X_train["week_of_year"] = X_train["week_of_year"].astype("category")
-X_val["PULocationID"] = X_val["PULocationID"].astype("category")
-X_val["week_hour"] = X_val["week_hour"].astype("category")
-X_val["month"] = X_val["month"].astype("category")
-X_val["week_of_year"] = X_val["week_of_year"].astype("category")
-
-# Log-transform target to stabilize variance
-y_train_log = np.log1p(y_train)
-y_val_log = np.log1p(y_val)
-
-model = lgb.LGBMRegressor(
+MODEL_PARAMS = dict(
     n_estimators=3000,
     learning_rate=0.03,
     num_leaves=255,
@@ -78,41 +42,215 @@ model = lgb.LGBMRegressor(
     objective="regression",
     random_state=0,
 )
+EARLY_STOPPING_ROUNDS = 100
+
+
+@traced("prepare split", rows=lambda split: len(split[0]) + len(split[2]))
+def prepare_split(
+    df: pd.DataFrame, cutoff: pd.Timestamp | None = None
+) -> tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series]:
+    # Week-hour feature (0-167)
+    df["week_hour"] = df["day_of_week"] * 24 + df["hour_of_day"]
+    df["month"] = df["month"].astype(int)
+    df["day_of_year"] = df["day_of_year"].astype(int)
+    df["week_of_year"] = df["week_of_year"].astype(int)
+
+    # Train/val split: last 28 days as validation
+    if cutoff is None:
+        cutoff = df["hour"].max() - pd.Timedelta(days=28)
+    train = df[df["hour"] < cutoff]
+    val = df[df["hour"] >= cutoff]
+
+    # Baseline-as-feature: mean trips per zone x week_hour (train only)
+    baseline = (
+        train.groupby(["PULocationID", "week_hour"], as_index=False)["trip_count"]
+        .mean()
+        .rename(columns={"trip_count": "baseline_week_hour_mean"})
+    )
+    train = train.merge(baseline, on=["PULocationID", "week_hour"], how="left")
+    val = val.merge(baseline, on=["PULocationID", "week_hour"], how="left")
+
+    # Fill any missing baseline values (should be rare) with global train mean
+    global_mean = train["trip_count"].mean()
+    train["baseline_week_hour_mean"] = train["baseline_week_hour_mean"].fillna(global_mean)
+    val["baseline_week_hour_mean"] = val["baseline_week_hour_mean"].fillna(global_mean)
+
+    X_train = train[feature_cols].copy()
+    y_train = train["trip_count"]
+    X_val = val[feature_cols].copy()
+    y_val = val["trip_count"]
+
+    # Treat these as categorical for LightGBM
+    for col in cat_cols:
+        X_train[col] = X_train[col].astype("category")
+        X_val[col] = X_val[col].astype("category")
+    return X_train, y_train, X_val, y_val
+
+
+@traced("fit", rows=None)
+def fit_model(
+    X_train: pd.DataFrame,
+    y_train: pd.Series,
+    X_val: pd.DataFrame,
+    y_val: pd.Series,
+    **overrides,
+) -> tuple[lgb.Booster, np.ndarray]:
+    # Log-transform target to stabilize variance
+    y_train_log = np.log1p(y_train)
+    y_val_log = np.log1p(y_val)
+
+    model = lgb.LGBMRegressor(**{**MODEL_PARAMS, **overrides})
+
+    model.fit(
+        X_train,
+        y_train_log,
+        eval_set=[(X_val, y_val_log)],
+        eval_metric="l1",
+        categorical_feature=cat_cols,
+        callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS)],
+    )
+
+    # Predict in log space, then invert
+    y_pred_log = model.predict(X_val)
+    return model.booster_, np.expm1(y_pred_log)
+
+
+def train_in_memory(features_path: str) -> tuple[lgb.Booster, float, float]:
+    # Load features
+    with stage("read features") as st:
+        df = pd.read_parquet(features_path)
+        st.rows_out = len(df)
+    X_train, y_train, X_val, y_val = prepare_split(df)
+    booster, y_pred = fit_model(X_train, y_train, X_val, y_val)
+
+    return booster, mae(y_val, y_pred), smape(y_val, y_pred)
+
+
+def train_low_memory(features_path: str) -> tuple[lgb.Booster, float, float]:
+    # Stream row groups through lgb.Sequence: only labels, the baseline table and the
+    # binned Dataset stay resident; raw feature rows are decoded one row group at a time.
+    from parquet_sequence import clear_cache, make_sequences, scan_split
+
+    with stage("scan split") as st:
+        split = scan_split(features_path, feature_cols, cat_cols)
+        st.rows_out = sum(split.train_rows) + sum(split.val_rows)
+    print("train_rows:", sum(split.train_rows), "val_rows:", sum(split.val_rows))
+
+    params = {
+        "objective": MODEL_PARAMS["objective"],
+        "learning_rate": MODEL_PARAMS["learning_rate"],
+        "num_leaves": MODEL_PARAMS["num_leaves"],
+        "min_data_in_leaf": MODEL_PARAMS["min_data_in_leaf"],
+        "bagging_fraction": MODEL_PARAMS["subsample"],
+        "bagging_freq": MODEL_PARAMS["subsample_freq"],
+        "feature_fraction": MODEL_PARAMS["colsample_bytree"],
+        "seed": MODEL_PARAMS["random_state"],
+        "metric": ["l2", "l1"],
+        "verbose": -1,
+    }
+    train_set = lgb.Dataset(
+        make_sequences(split, True, feature_cols, cat_cols),
+        label=split.y_train,
+        feature_name=feature_cols,
+        categorical_feature=[feature_cols.index(col) for col in cat_cols],
+        params=params,
+        free_raw_data=True,
+    )
+    val_set = lgb.Dataset(
+        make_sequences(split, False, feature_cols, cat_cols),
+        label=split.y_val,
+        reference=train_set,
+        free_raw_data=True,
+    )
+
+    with stage("fit", rows_in=sum(split.train_rows)):
+        booster = lgb.train(
+            params,
+            train_set,
+            num_boost_round=MODEL_PARAMS["n_estimators"],
+            valid_sets=[val_set],
+            callbacks=[lgb.early_stopping(stopping_rounds=EARLY_STOPPING_ROUNDS), lgb.log_evaluation(100)],
+        )
+    # Datasets were binned inside lgb.train (free_raw_data drops the sequences); release them too.
+    del train_set, val_set
+    clear_cache()
+
+    # Validation metrics, one row group at a time.
+    abs_err = 0.0
+    smape_sum = 0.0
+    n = 0
+    offset = 0
+    with stage("validate") as st:
+        for seq in make_sequences(split, False, feature_cols, cat_cols):
+            y_pred = np.expm1(booster.predict(seq.matrix(), num_iteration=booster.best_iteration))
+            y_val = np.expm1(split.y_val[offset : offset + len(seq)])
+            offset += len(seq)
+            abs_err += float(abs_errors(y_val, y_pred).sum())
+            smape_sum += float(smape_terms(y_val, y_pred).sum())
+            n += len(seq)
+        st.rows_in = n
+    clear_cache()
+
+    # Record train categories so DataFrame inputs with category dtype map to the same codes at serving.
+    booster.pandas_categorical = [split.categories[col].tolist() for col in cat_cols]
+    return booster, abs_err / n, smape_sum / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the LightGBM week-hour demand model.")
+    parser.add_argument("--features-path", default=FEATURES_PATH)
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        help="Stream parquet row groups into LightGBM instead of loading the full frame.",
+    )
+    parser.add_argument("--registry", default=REGISTRY_DEFAULT, help="Model registry index.")
+    parser.add_argument("--promote", action="store_true", help="Promote this run to production.")
+    add_trace_args(parser)
+    args = parser.parse_args()
+
+    with Tracer.from_args("lightgbm_week_hour", args):
+        if args.low_memory:
+            booster, mae, smape = train_low_memory(args.features_path)
+        else:
+            booster, mae, smape = train_in_memory(args.features_path)
+
+        print("MAE:", mae)
+        print("sMAPE:", smape)
+
+        # Save model + metrics
+        with stage("save and register"):
+            out_dir = Path("models")
+            out_dir.mkdir(parents=True, exist_ok=True)
+            run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            model_path = out_dir / f"lightgbm_week_hour_{run_id}.txt"
+            booster.save_model(str(model_path))
+            print("saved model:", model_path)
+
+            metrics_path = out_dir / f"lightgbm_week_hour_{run_id}_metrics.txt"
+            metrics_path.write_text(f"MAE: {mae}\nsMAPE: {smape}\n")
+            print("saved metrics:", metrics_path)
+
+            latest_model = out_dir / "lightgbm_week_hour_latest.txt"
+            latest_metrics = out_dir / "lightgbm_week_hour_latest_metrics.txt"
+            atomic_copy(model_path, latest_model)
+            atomic_copy(metrics_path, latest_metrics)
+            print("saved latest model:", latest_model)
+            print("saved latest metrics:", latest_metrics)
+
+            entry = register_model(
+                model_path,
+                run_id,
+                feature_cols,
+                {"MAE": mae, "sMAPE": smape},
+                data_hash=file_sha256(args.features_path),
+                registry_path=args.registry,
+            )
+            print("registered:", run_id, "compiled:", entry.get("compiled_path"))
+            if args.promote:
+                promote(run_id, registry_path=args.registry)
+                print("promoted:", run_id, "-> production")
 
-model.fit(
-    X_train,
-    y_train_log,
-    eval_set=[(X_val, y_val_log)],
-    eval_metric="l1",
-    categorical_feature=["PULocationID", "week_hour", "month", "week_of_year"],
-    callbacks=[lgb.early_stopping(stopping_rounds=100)],
-)
 
-# Predict in log space, then invert
-y_pred_log = model.predict(X_val)
-y_pred = np.expm1(y_pred_log)
-
-mae = np.mean(np.abs(y_val - y_pred))
-smape = np.mean(2 * np.abs(y_pred - y_val) / (np.abs(y_pred) + np.abs(y_val) + 1e-8))
-
-print("MAE:", mae)
-print("sMAPE:", smape)
-
-# Save model + metrics
-out_dir = Path("models")
-out_dir.mkdir(parents=True, exist_ok=True)
-run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-model_path = out_dir / f"lightgbm_week_hour_{run_id}.txt"
-model.booster_.save_model(str(model_path))
-print("saved model:", model_path)
-
-metrics_path = out_dir / f"lightgbm_week_hour_{run_id}_metrics.txt"
-metrics_path.write_text(f"MAE: {mae}\nsMAPE: {smape}\n")
-print("saved metrics:", metrics_path)
-
-latest_model = out_dir / "lightgbm_week_hour_latest.txt"
-latest_metrics = out_dir / "lightgbm_week_hour_latest_metrics.txt"
-latest_model.write_text(model_path.read_text())
-latest_metrics.write_text(metrics_path.read_text())
-print("saved latest model:", latest_model)
-print("saved latest metrics:", latest_metrics)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pyarrow.parquet as pq
+import lightgbm as lgb
+
+
+WEEK_HOURS = 168
+VAL_DAYS = 28
+
+# Columns needed to build the week-hour feature set from the features parquet.
+SOURCE_COLS = [
+    "hour",
+    "PULocationID",
+    "day_of_week",
+    "hour_of_day",
+    "month",
+    "day_of_year",
+    "week_of_year",
+    "temperature",
+    "wind_speed",
+    "relative_humidity",
+    "precipitation",
+    "is_rain",
+    "is_weekend",
+    "is_holiday",
+    "trip_count",
+]
+SPLIT_COLS = ["hour", "PULocationID", "day_of_week", "hour_of_day", "month", "week_of_year", "trip_count"]
+
+
+@dataclass
+class ParquetSplit:
+    """Everything the row-group sequences need, gathered in two column-pruned scans."""
+
+    path: Path
+    cutoff: np.datetime64
+    train_rows: list[int]
+    val_rows: list[int]
+    y_train: np.ndarray
+    y_val: np.ndarray
+    baseline: np.ndarray
+    global_mean: float
+    categories: dict[str, np.ndarray] = field(default_factory=dict)
+
+    def baseline_lookup(self, zone: np.ndarray, week_hour: np.ndarray) -> np.ndarray:
+        zone = zone.astype(np.int64)
+        in_range = (zone >= 0) & (zone < self.baseline.shape[0])
+        values = np.full(len(zone), np.nan)
+        values[in_range] = self.baseline[zone[in_range], week_hour[in_range]]
+        return np.where(np.isnan(values), self.global_mean, values)
+
+    def encode_category(self, name: str, values: np.ndarray) -> np.ndarray:
+        # Same codes pandas/LightGBM derive from the train slice: index into the sorted train values.
+        cats = self.categories[name]
+        pos = np.searchsorted(cats, values)
+        pos_clipped = np.minimum(pos, len(cats) - 1)
+        found = (pos < len(cats)) & (cats[pos_clipped] == values)
+        return np.where(found, pos_clipped, np.nan)
+
+
+def _read_row_group(pf: pq.ParquetFile, index: int, columns: list[str]) -> dict[str, np.ndarray]:
+    table = pf.read_row_group(index, columns=columns)
+    return {name: table.column(name).to_numpy() for name in columns}
+
+
+def scan_split(path: str | Path, feature_cols: list[str], cat_cols: list[str]) -> ParquetSplit:
+    path = Path(path)
+    pf = pq.ParquetFile(path)
+    n_groups = pf.num_row_groups
+
+    max_hour = None
+    for i in range(n_groups):
+        hours = pf.read_row_group(i, columns=["hour"]).column("hour").to_numpy()
+        if len(hours):
+            group_max = hours.max()
+            max_hour = group_max if max_hour is None else max(max_hour, group_max)
+    if max_hour is None:
+        raise ValueError(f"No rows in {path}")
+    cutoff = max_hour - np.timedelta64(VAL_DAYS, "D")
+
+    sums = np.zeros((0, WEEK_HOURS))
+    counts = np.zeros((0, WEEK_HOURS))
+    train_rows: list[int] = []
+    val_rows: list[int] = []
+    y_train: list[np.ndarray] = []
+    y_val: list[np.ndarray] = []
+    uniques: dict[str, np.ndarray] = {c: np.array([], dtype=np.int64) for c in cat_cols}
+    for i in range(n_groups):
+        cols = _read_row_group(pf, i, SPLIT_COLS)
+        is_train = cols["hour"] < cutoff
+        train_rows.append(int(is_train.sum()))
+        val_rows.append(int((~is_train).sum()))
+        y = np.log1p(cols["trip_count"].astype(np.float64))
+        y_train.append(y[is_train])
+        y_val.append(y[~is_train])
+
+        zone = cols["PULocationID"][is_train].astype(np.int64)
+        week_hour = (cols["day_of_week"] * 24 + cols["hour_of_day"])[is_train].astype(np.int64)
+        if len(zone):
+            n_zones = max(int(zone.max()) + 1, sums.shape[0])
+            if n_zones > sums.shape[0]:
+                sums = np.pad(sums, ((0, n_zones - sums.shape[0]), (0, 0)))
+                counts = np.pad(counts, ((0, n_zones - counts.shape[0]), (0, 0)))
+            flat = zone * WEEK_HOURS + week_hour
+            size = n_zones * WEEK_HOURS
+            sums += np.bincount(flat, weights=cols["trip_count"][is_train], minlength=size).reshape(n_zones, -1)
+            counts += np.bincount(flat, minlength=size).reshape(n_zones, -1)
+
+        derived = {"PULocationID": zone, "week_hour": week_hour}
+        for col in cat_cols:
+            values = derived[col] if col in derived else cols[col][is_train].astype(np.int64)
+            uniques[col] = np.union1d(uniques[col], values)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline = sums / counts
+    total = counts.sum()
+    global_mean = float(sums.sum() / total) if total else 0.0
+    return ParquetSplit(
+        path=path,
+        cutoff=cutoff,
+        train_rows=train_rows,
+        val_rows=val_rows,
+        y_train=np.concatenate(y_train),
+        y_val=np.concatenate(y_val),
+        baseline=baseline,
+        global_mean=global_mean,
+        categories=uniques,
+    )
+
+
+class _RowGroupCache:
+    """Single-slot cache so sampling and batched pushes decode each row group once per pass."""
+
+    key: tuple | None = None
+    matrix: np.ndarray | None = None
+
+    @classmethod
+    def clear(cls) -> None:
+        cls.key = None
+        cls.matrix = None
+
+
+def build_matrix(
+    split: ParquetSplit,
+    cols: dict[str, np.ndarray],
+    mask: np.ndarray,
+    feature_cols: list[str],
+    cat_cols: list[str],
+) -> np.ndarray:
+    week_hour = (cols["day_of_week"] * 24 + cols["hour_of_day"])[mask].astype(np.int64)
+    zone = cols["PULocationID"][mask]
+    derived = {
+        "week_hour": week_hour,
+        "baseline_week_hour_mean": split.baseline_lookup(zone, week_hour),
+    }
+    out = np.empty((int(mask.sum()), len(feature_cols)), dtype=np.float64)
+    for j, name in enumerate(feature_cols):
+        values = derived[name] if name in derived else cols[name][mask]
+        if name in cat_cols:
+            values = split.encode_category(name, values.astype(np.int64))
+        out[:, j] = values
+    return out
+
+
+class ParquetRowGroupSequence(lgb.Sequence):
+    """Feature rows of one parquet row group, restricted to the train or validation side of the cutoff."""
+
+    batch_size = 65536
+
+    def __init__(
+        self,
+        split: ParquetSplit,
+        row_group: int,
+        is_train: bool,
+        feature_cols: list[str],
+        cat_cols: list[str],
+    ):
+        self.split = split
+        self.row_group = row_group
+        self.is_train = is_train
+        self.feature_cols = feature_cols
+        self.cat_cols = cat_cols
+        rows = split.train_rows if is_train else split.val_rows
+        self.n_rows = rows[row_group]
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def matrix(self) -> np.ndarray:
+        key = (str(self.split.path), self.row_group, self.is_train)
+        if _RowGroupCache.key != key:
+            _RowGroupCache.clear()
+            pf = pq.ParquetFile(self.split.path)
+            cols = _read_row_group(pf, self.row_group, SOURCE_COLS)
+            is_train = cols["hour"] < self.split.cutoff
+            mask = is_train if self.is_train else ~is_train
+            _RowGroupCache.matrix = build_matrix(self.split, cols, mask, self.feature_cols, self.cat_cols)
+            _RowGroupCache.key = key
+        return _RowGroupCache.matrix
+
+    def __getitem__(self, idx):
+        return self.matrix()[idx]
+
+
+def make_sequences(
+    split: ParquetSplit, is_train: bool, feature_cols: list[str], cat_cols: list[str]
+) -> list[ParquetRowGroupSequence]:
+    rows = split.train_rows if is_train else split.val_rows
+    return [
+        ParquetRowGroupSequence(split, i, is_train, feature_cols, cat_cols)
+        for i, n in enumerate(rows)
+        if n > 0
+    ]
+
+
+def clear_cache() -> None:
+    _RowGroupCache.clear()
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Scripts import their siblings directly, as when run from the repository root.
+SCRIPTS = Path(__file__).resolve().parents[1] / "scripts"
+for sub in ("serve", "data_processing", "benchmarks"):
+    sys.path.insert(0, str(SCRIPTS / sub))
@@ -0,0 +1,115 @@
+import argparse
+import os
+
+import pandas as pd
+import pytest
+
+from stream_tlc import PICKUP_COLS, load_table, run_once
+
+LATENESS_HOURS = 6
+
+
+@pytest.fixture
+def feed(tmp_path):
+    """Local drop directory standing in for the trip feed, plus the args run_once expects."""
+    args = argparse.Namespace(
+        drop_dir=str(tmp_path / "drop"),
+        out=str(tmp_path / "live.parquet"),
+        pickup_col=PICKUP_COLS[0],
+        lateness_hours=LATENESS_HOURS,
+        max_files=1,
+        settle_seconds=0.0,
+    )
+    os.makedirs(args.drop_dir)
+    return args
+
+
+def drop(args, name: str, trips: list[tuple[str, int]]) -> None:
+    """Write one trip file; mtimes increase with each drop so files are ingested in drop order."""
+    path = os.path.join(args.drop_dir, name)
+    frame = pd.DataFrame(
+        {
+            PICKUP_COLS[0]: pd.to_datetime([t for t, _ in trips]).astype("datetime64[us]"),
+            "PULocationID": pd.Series([z for _, z in trips], dtype="int64"),
+        }
+    )
+    frame.to_parquet(path, index=False)
+    n = len(os.listdir(args.drop_dir))
+    os.utime(path, (1_000_000 + n, 1_000_000 + n))
+
+
+def counts(args) -> pd.DataFrame:
+    table, _ = load_table(args.out)
+    return table.to_pandas()
+
+
+def test_overlapping_batches_merge_without_duplicates(feed):
+    drop(feed, "a.parquet", [("2026-01-01 10:05", 1), ("2026-01-01 10:40", 1), ("2026-01-01 11:10", 2)])
+    # Same hours again, inside the lateness window: counts add up into the existing rows.
+    drop(feed, "b.parquet", [("2026-01-01 10:15", 1), ("2026-01-01 11:59", 2), ("2026-01-01 12:00", 2)])
+    assert run_once(feed) == 2
+
+    df = counts(feed)
+    assert not df.duplicated(["hour", "PULocationID"]).any()
+    got = {(str(h), z): c for h, z, c in df[["hour", "PULocationID", "trip_count"]].itertuples(index=False)}
+    assert got == {
+        ("2026-01-01 10:00:00", 1): 3,
+        ("2026-01-01 11:00:00", 2): 2,
+        ("2026-01-01 12:00:00", 2): 1,
+    }
+    _, state = load_table(feed.out)
+    assert state["batches"] == 2 and state["late_rows_dropped"] == 0
+
+
+def test_trips_before_watermark_are_dropped_and_counted(feed):
+    drop(feed, "a.parquet", [("2026-01-01 20:30", 1)])
+    # Watermark is now 14:00; the 13:xx trips are late, the 15:xx one is still inside the window.
+    drop(feed, "b.parquet", [("2026-01-01 13:10", 1), ("2026-01-01 13:50", 2), ("2026-01-01 15:00", 1)])
+    run_once(feed)
+
+    _, state = load_table(feed.out)
+    assert state["watermark"] == "2026-01-01T14:00:00"
+    assert state["late_rows_dropped"] == 2
+    df = counts(feed)
+    assert int(df["trip_count"].sum()) == 2
+    assert (df["hour"] >= pd.Timestamp(state["watermark"])).all()
+
+
+def test_rerun_does_not_ingest_files_again(feed):
+    drop(feed, "a.parquet", [("2026-01-01 10:05", 1), ("2026-01-01 10:06", 1)])
+    assert run_once(feed) == 1
+    before = counts(feed)
+
+    assert run_once(feed) == 0
+    pd.testing.assert_frame_equal(counts(feed), before)
+
+    drop(feed, "b.parquet", [("2026-01-01 10:07", 1)])
+    assert run_once(feed) == 1
+    assert int(counts(feed)["trip_count"].sum()) == 3
+    _, state = load_table(feed.out)
+    assert state["files"] == ["a.parquet", "b.parquet"]
+
+
+def test_empty_file_is_recorded_without_changing_counts(feed):
+    drop(feed, "a.parquet", [("2026-01-01 10:05", 1)])
+    drop(feed, "empty.parquet", [])
+    assert run_once(feed) == 2
+
+    df = counts(feed)
+    assert len(df) == 1 and int(df["trip_count"].sum()) == 1
+    _, state = load_table(feed.out)
+    assert "empty.parquet" in state["files"]
+    assert state["watermark"] == "2026-01-01T04:00:00"
+
+
+def test_watermark_never_moves_backward(feed):
+    hours = ["2026-01-02 00:00", "2026-01-01 22:00", "2026-01-01 19:00", "2026-01-02 03:00", "2026-01-01 21:30"]
+    watermarks = []
+    for i, hour in enumerate(hours):
+        drop(feed, f"{i}.parquet", [(hour, 1)])
+        run_once(feed)
+        _, state = load_table(feed.out)
+        watermarks.append(pd.Timestamp(state["watermark"]))
+
+    assert watermarks == sorted(watermarks)
+    assert watermarks[-1] == pd.Timestamp("2026-01-02 03:00") - pd.Timedelta(hours=LATENESS_HOURS)
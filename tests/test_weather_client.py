@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from open_meteo_stub import make_server
+from weather_client import BOROUGH_POINTS, CITY_POINT, WeatherClient, fetch_weather
+
+NYC = (40.7128, -74.0060)
+TZ = "America/New_York"
+
+
+@pytest.fixture
+def stub():
+    # A little latency so concurrent requests actually overlap in the pool test.
+    server = make_server(latency_ms=50, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/forecast"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client(stub, tmp_path, **kwargs) -> WeatherClient:
+    return WeatherClient(base_url=stub.url, cache_dir=tmp_path / "weather", retries=0, timeout_s=5, **kwargs)
+
+
+def test_fresh_fetch_fills_cache(stub, tmp_path):
+    payload, info = client(stub, tmp_path).fetch(*NYC, TZ)
+    assert info == {"source": "network", "stale": False, "age_s": 0.0}
+    assert len(payload["hourly"]["time"]) == 72
+    assert len(list((tmp_path / "weather").glob("open_meteo_*.json"))) == 1
+    assert stub.stub["served"] == 1
+
+
+def test_fetch_within_ttl_is_served_from_cache(stub, tmp_path):
+    weather = client(stub, tmp_path, ttl_s=600)
+    first, _ = weather.fetch(*NYC, TZ)
+    second, info = weather.fetch(*NYC, TZ)
+    assert info["source"] == "cache" and not info["stale"]
+    assert second == first
+    assert stub.stub["served"] == 1
+
+
+def test_outage_serves_cached_payload_flagged_stale(stub, tmp_path):
+    # ttl_s=0: the cached entry is expired at once, so the second call goes to the network.
+    weather = client(stub, tmp_path, ttl_s=0)
+    first, _ = weather.fetch(*NYC, TZ)
+    stub.stub["down"] = True
+    second, info = weather.fetch(*NYC, TZ)
+    assert info["source"] == "stale-cache" and info["stale"]
+    assert "503" in info["error"]
+    assert second == first
+    assert stub.stub["served"] == 2
+
+
+def test_outage_at_midnight_serves_entry_cached_the_hour_before(stub, tmp_path):
+    weather = client(stub, tmp_path, ttl_s=0)
+    midnight = datetime.now(ZoneInfo(TZ)).replace(hour=0, minute=0, second=0, microsecond=0)
+    weather_23, _ = fetch_weather(weather, CITY_POINT, TZ, midnight + timedelta(hours=23), 48)
+    stub.stub["down"] = True
+    weather_00, info = fetch_weather(weather, CITY_POINT, TZ, midnight + timedelta(hours=24), 48)
+    assert info["stale"] and info["source"] == "open-meteo (stale-cache)"
+    assert len(weather_00["hour"]) == 48
+    assert list(weather_00["hour"][:47]) == list(weather_23["hour"][1:])
+
+
+def test_outage_without_cache_raises(stub, tmp_path):
+    stub.stub["down"] = True
+    with pytest.raises(RuntimeError, match="Failed to fetch Open-Meteo forecast"):
+        client(stub, tmp_path).fetch(*NYC, TZ)
+
+
+def test_outage_past_max_stale_raises(stub, tmp_path):
+    weather = client(stub, tmp_path, ttl_s=0, max_stale_s=0)
+    weather.fetch(*NYC, TZ)
+    stub.stub["down"] = True
+    with pytest.raises(RuntimeError):
+        weather.fetch(*NYC, TZ)
+
+
+def test_multi_point_fetch_stays_within_pool_size(stub, tmp_path):
+    results = client(stub, tmp_path, max_workers=2).fetch_points(BOROUGH_POINTS, TZ)
+    assert set(results) == set(BOROUGH_POINTS)
+    assert all(info["source"] == "network" for _, info in results.values())
+    assert stub.stub["served"] == len(BOROUGH_POINTS)
+    assert stub.stub["max_in_flight"] <= 2